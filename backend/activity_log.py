@@ -0,0 +1,126 @@
+"""
+Activity Log Module
+Museum Management System
+
+Append-only pipeline for USER_ACTIVITY_LOG. Handlers call log_activity()
+after their own transaction commits; events are queued in memory and a
+background flusher inserts them with executemany every
+ACTIVITY_FLUSH_INTERVAL seconds (write_behind.py), so the request path
+no longer pays a commit for audit logging. The admin audit view reads
+the table and sees events within that interval. Rows older than
+ACTIVITY_LOG_RETENTION_DAYS are rolled into monthly archive tables
+(USER_ACTIVITY_LOG_YYYYMM) by the maintenance reaper.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from flask import jsonify, request
+
+from auth import permission_required
+from database import get_read_connection
+from write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FLUSH_INTERVAL = 2.0        # seconds before an event is visible to the audit view
+ACTIVITY_LOG_RETENTION_DAYS = 90     # days kept in USER_ACTIVITY_LOG before monthly archiving
+ARCHIVE_PREFIX = 'USER_ACTIVITY_LOG_'  # + YYYYMM
+
+INSERT_ACTIVITY = """
+    INSERT INTO USER_ACTIVITY_LOG (
+        USER_ID, ACTION_TYPE, TARGET_TYPE, TARGET_ID,
+        DESCRIPTION, IP_ADDRESS, CREATED_AT
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_buffer = WriteBehindBuffer('activity_log', INSERT_ACTIVITY,
+                            flush_interval=ACTIVITY_FLUSH_INTERVAL, max_pending=500)
+
+
+def configure(flush_interval=ACTIVITY_FLUSH_INTERVAL):
+    """Flush interval for audit events (0 = insert on every call)"""
+    _buffer.flush_interval = flush_interval
+
+
+def log_activity(user_id, action_type, description=None, target_type=None,
+                 target_id=None, ip_address=None):
+    """Queue one audit event; CREATED_AT is taken now (UTC, like CURRENT_TIMESTAMP)"""
+    created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        _buffer.add((user_id, action_type, target_type, target_id,
+                     description, ip_address, created_at))
+    except Exception as e:
+        # Write-through mode writes inline; audit logging never fails the request
+        logger.error(f"Activity log write failed: {str(e)}")
+
+
+def flush():
+    """Write queued events now (tests, shutdown)"""
+    return _buffer.flush()
+
+
+def archive_table_name(month):
+    """Monthly archive table for 'YYYYMM', e.g. USER_ACTIVITY_LOG_202601"""
+    return f"{ARCHIVE_PREFIX}{month}"
+
+
+def get_recent_activity(limit=100, user_id=None, action_type=None):
+    """Latest events from the live table, newest first"""
+    conditions, params = [], []
+    if user_id:
+        conditions.append("l.USER_ID = ?")
+        params.append(user_id)
+    if action_type:
+        conditions.append("l.ACTION_TYPE = ?")
+        params.append(action_type)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    db = get_read_connection()
+    try:
+        cursor = db.cursor()
+        cursor.execute(f"""
+            SELECT l.LOG_ID, l.USER_ID, u.USERNAME, l.ACTION_TYPE, l.TARGET_TYPE,
+                   l.TARGET_ID, l.DESCRIPTION, l.IP_ADDRESS, l.CREATED_AT
+            FROM USER_ACTIVITY_LOG l
+            LEFT JOIN USER u ON l.USER_ID = u.USER_ID
+            {where}
+            ORDER BY l.CREATED_AT DESC, l.LOG_ID DESC
+            LIMIT ?
+        """, (*params, limit))
+        return [{
+            'log_id': row[0],
+            'user_id': row[1],
+            'username': row[2],
+            'action_type': row[3],
+            'target_type': row[4],
+            'target_id': row[5],
+            'description': row[6],
+            'ip_address': row[7],
+            'created_at': row[8]
+        } for row in cursor.fetchall()]
+    finally:
+        db.close()
+
+
+def register_activity_log_api(app):
+    """GET /api/admin/activity-log"""
+    configure(app.config.get('ACTIVITY_FLUSH_INTERVAL', ACTIVITY_FLUSH_INTERVAL))
+
+    @app.route('/api/admin/activity-log', methods=['GET'])
+    @permission_required('all')
+    def api_get_activity_log():
+        """Audit events, newest first (?limit=&user_id=&action=)"""
+        try:
+            limit = min(request.args.get('limit', 100, type=int), 1000)
+            events = get_recent_activity(limit,
+                                         request.args.get('user_id', type=int),
+                                         request.args.get('action'))
+            return jsonify({
+                'success': True,
+                'data': events,
+                'total': len(events),
+                'flush_interval': _buffer.flush_interval
+            })
+        except Exception as e:
+            logger.error(f"Get activity log error: {str(e)}")
+            return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
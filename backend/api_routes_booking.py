@@ -5,6 +5,7 @@ Museum Management System - Option 2: Manual Admin Approval
 
 from flask import request, jsonify, session
 from auth import login_required, permission_required
+from queries import query_one
 from datetime import datetime, timedelta
 import os
 import hashlib
@@ -81,11 +82,7 @@ def api_create_order():
         cursor = db.cursor()
         
         # Get customer_id from user_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
             db.close()
             return jsonify({
@@ -216,11 +213,7 @@ def api_upload_payment_proof(order_id):
         cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
             db.close()
             return jsonify({
@@ -312,11 +305,7 @@ def api_get_my_orders():
         cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
             db.close()
             return jsonify({
@@ -396,11 +385,7 @@ def api_get_order_detail(order_id):
         cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
             db.close()
             return jsonify({
@@ -493,11 +478,7 @@ def api_cancel_order(order_id):
         cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
             db.close()
             return jsonify({
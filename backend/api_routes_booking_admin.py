@@ -3,6 +3,8 @@ Admin Order Management APIs
 Add to api_routes_booking.py
 """
 
+from queries import query_one
+
 # ==================== ADMIN ORDER MANAGEMENT APIs ====================
 
 @app.route('/api/admin/orders', methods=['GET'])
@@ -180,16 +182,7 @@ def api_admin_approve_order(order_id):
         cursor = db.cursor()
         
         # Get order details
-        cursor.execute("""
-            SELECT o.STATUS, o.CUSTOMER_ID, o.TICKET_TYPE_ID, o.QUANTITY,
-                   o.ORDER_CODE, o.TOTAL_PRICE,
-                   c.EMAIL, c.FULLNAME
-            FROM "ORDER" o
-            JOIN CUSTOMER c ON o.CUSTOMER_ID = c.CUSTOMER_ID
-            WHERE o.ORDER_ID = ?
-        """, (order_id,))
-        
-        order_row = cursor.fetchone()
+        order_row = query_one(db, 'order_for_review', (order_id,))
         
         if not order_row:
             db.close()
@@ -198,7 +191,7 @@ def api_admin_approve_order(order_id):
                 'message': 'Không tìm thấy đơn hàng'
             }), 404
         
-        status = order_row[0]
+        status = order_row['STATUS']
         
         if status != 'waiting_confirmation':
             db.close()
@@ -207,13 +200,13 @@ def api_admin_approve_order(order_id):
                 'message': f'Chỉ có thể duyệt đơn hàng có trạng thái "Chờ xác nhận". Trạng thái hiện tại: {status}'
             }), 400
         
-        customer_id = order_row[1]
-        ticket_type_id = order_row[2]
-        quantity = order_row[3]
-        order_code = order_row[4]
-        total_price = order_row[5]
-        customer_email = order_row[6]
-        customer_name = order_row[7]
+        customer_id = order_row['CUSTOMER_ID']
+        ticket_type_id = order_row['TICKET_TYPE_ID']
+        quantity = order_row['QUANTITY']
+        order_code = order_row['ORDER_CODE']
+        total_price = order_row['TOTAL_PRICE']
+        customer_email = order_row['EMAIL']
+        customer_name = order_row['FULLNAME']
         
         # Update order status
         paid_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -297,14 +290,7 @@ def api_admin_reject_order(order_id):
         cursor = db.cursor()
         
         # Get order info
-        cursor.execute("""
-            SELECT o.STATUS, o.ORDER_CODE, c.EMAIL, c.FULLNAME
-            FROM "ORDER" o
-            JOIN CUSTOMER c ON o.CUSTOMER_ID = c.CUSTOMER_ID
-            WHERE o.ORDER_ID = ?
-        """, (order_id,))
-        
-        order_row = cursor.fetchone()
+        order_row = query_one(db, 'order_for_review', (order_id,))
         
         if not order_row:
             db.close()
@@ -313,7 +299,7 @@ def api_admin_reject_order(order_id):
                 'message': 'Không tìm thấy đơn hàng'
             }), 404
         
-        status = order_row[0]
+        status = order_row['STATUS']
         
         if status != 'waiting_confirmation':
             db.close()
@@ -322,9 +308,9 @@ def api_admin_reject_order(order_id):
                 'message': f'Chỉ có thể từ chối đơn hàng có trạng thái "Chờ xác nhận"'
             }), 400
         
-        order_code = order_row[1]
-        customer_email = order_row[2]
-        customer_name = order_row[3]
+        order_code = order_row['ORDER_CODE']
+        customer_email = order_row['EMAIL']
+        customer_name = order_row['FULLNAME']
         
         # Update order
         cursor.execute("""
@@ -389,7 +375,7 @@ def api_admin_order_stats():
         cursor.execute("""
             SELECT COUNT(*), SUM(TOTAL_PRICE)
             FROM "ORDER"
-            WHERE DATE(CREATED_AT) = DATE('now')
+            WHERE CREATED_AT >= DATE('now') AND CREATED_AT < DATE('now', '+1 day')
         """)
         
         today_row = cursor.fetchone()
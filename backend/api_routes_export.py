@@ -8,6 +8,7 @@ pip install openpyxl --break-system-packages
 
 from flask import request, jsonify, send_file
 from auth import permission_required
+from revenue_rollup import revenue_by_day, revenue_by_ticket_type
 import sqlite3
 from datetime import datetime
 from openpyxl import Workbook
@@ -142,11 +143,11 @@ def api_export_tickets():
         params = []
         
         if start_date:
-            query += " AND DATE(t.PURCHASE_DATE) >= ?"
+            query += " AND t.PURCHASE_DATE >= DATE(?)"
             params.append(start_date)
         
         if end_date:
-            query += " AND DATE(t.PURCHASE_DATE) <= ?"
+            query += " AND t.PURCHASE_DATE < DATE(?, '+1 day')"
             params.append(end_date)
         
         if status:
@@ -304,56 +305,10 @@ def api_export_revenue_report():
     
     try:
         db = get_db_connection()
-        cursor = db.cursor()
-        
-        # Get revenue by date
-        query = """
-            SELECT 
-                DATE(PURCHASE_DATE) as sale_date,
-                COUNT(*) as ticket_count,
-                SUM(TOTAL_PRICE) as daily_revenue
-            FROM TICKET
-            WHERE 1=1
-        """
-        params = []
-        
-        if start_date:
-            query += " AND DATE(PURCHASE_DATE) >= ?"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND DATE(PURCHASE_DATE) <= ?"
-            params.append(end_date)
-        
-        query += " GROUP BY DATE(PURCHASE_DATE) ORDER BY sale_date DESC"
-        
-        cursor.execute(query, params)
-        daily_revenue = cursor.fetchall()
-        
-        # Get revenue by ticket type
-        query2 = """
-            SELECT 
-                tt.TYPE_NAME,
-                COUNT(*) as ticket_count,
-                SUM(t.TOTAL_PRICE) as type_revenue
-            FROM TICKET t
-            JOIN TICKET_TYPE tt ON t.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
-            WHERE 1=1
-        """
-        params2 = []
-        
-        if start_date:
-            query2 += " AND DATE(t.PURCHASE_DATE) >= ?"
-            params2.append(start_date)
-        
-        if end_date:
-            query2 += " AND DATE(t.PURCHASE_DATE) <= ?"
-            params2.append(end_date)
-        
-        query2 += " GROUP BY tt.TYPE_NAME ORDER BY type_revenue DESC"
         
-        cursor.execute(query2, params2)
-        type_revenue = cursor.fetchall()
+        # Revenue by date and by ticket type, from the REVENUE_DAILY rollup
+        daily_revenue = revenue_by_day(db, start_date, end_date)
+        type_revenue = revenue_by_ticket_type(db, start_date, end_date)
         
         db.close()
         
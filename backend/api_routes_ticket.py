@@ -5,6 +5,7 @@ Add these routes to your app.py
 
 from flask import request, jsonify, session
 from auth import login_required, permission_required
+from queries import query_one
 import sqlite3
 from datetime import datetime
 
@@ -26,12 +27,9 @@ def api_get_customer_tickets():
         cursor = db.cursor()
         
         # Get customer_id from user_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
+            db.close()
             return jsonify({
                 'success': False,
                 'message': 'Không tìm thấy thông tin khách hàng'
@@ -126,15 +124,11 @@ def api_get_customer_ticket_detail(ticket_id):
     """Get detailed ticket information with QR code data"""
     try:
         db = get_db_connection()
-        cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
+            db.close()
             return jsonify({
                 'success': False,
                 'message': 'Không tìm thấy thông tin khách hàng'
@@ -143,22 +137,7 @@ def api_get_customer_ticket_detail(ticket_id):
         customer_id = customer_row[0]
         
         # Get ticket details
-        cursor.execute("""
-            SELECT 
-                t.TICKET_ID, t.TICKET_CODE, t.QUANTITY, t.TOTAL_PRICE,
-                t.VALID_DATE, t.PURCHASE_DATE, t.STATUS, t.PAYMENT_METHOD, t.NOTES,
-                tt.TYPE_NAME, tt.PRICE, tt.DESCRIPTION,
-                c.FULLNAME, c.PHONE, c.EMAIL,
-                vh.CHECK_IN_TIME, vh.CHECK_OUT_TIME, vh.DURATION_MINUTES,
-                vh.RATING, vh.FEEDBACK
-            FROM TICKET t
-            JOIN TICKET_TYPE tt ON t.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
-            JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
-            LEFT JOIN VISIT_HISTORY vh ON t.TICKET_ID = vh.TICKET_ID
-            WHERE t.TICKET_ID = ? AND t.CUSTOMER_ID = ?
-        """, (ticket_id, customer_id))
-        
-        row = cursor.fetchone()
+        row = query_one(db, 'customer_ticket_detail', (ticket_id, customer_id))
         db.close()
         
         if not row:
@@ -231,12 +210,9 @@ def api_get_customer_ticket_stats():
         cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
+            db.close()
             return jsonify({
                 'success': False,
                 'message': 'Không tìm thấy thông tin khách hàng'
@@ -552,6 +528,13 @@ def api_checkin_ticket(ticket_id):
             'message': 'Check-in thành công'
         })
         
+    except sqlite3.IntegrityError:
+        # idx_visit_history_open_ticket: one open visit per ticket
+        db.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'Vé đã được check-in rồi'
+        }), 400
     except Exception as e:
         db.rollback()
         return jsonify({
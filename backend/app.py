@@ -1,23 +1,46 @@
 from flask import Flask, request, jsonify, send_file, session
 from flask_cors import CORS
 from flask_mail import Mail, Message
-from database import get_db_connection
+from database import (get_db_connection, get_read_connection, get_pool_stats, get_write_stats,
+                      write_transaction, WriteQueueFull, init_app as init_database)
+from queries import query_one, query_all, get_query_stats
+from row_encoder import json_rows_response
 from auth import AuthManager, login_required, permission_required, role_required
+from authz import has_permission, get_authz_stats
 from email_service import EmailService, init_email_service
 from logger_config import app_logger
 import traceback
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import secrets
 import sqlite3
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
+import csv
 import io
 import os
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from sql_console import register_sql_console
-from museum_data_api import register_museum_data_api
+from museum_data_api import register_museum_data_api, get_snapshot_stats
+from write_behind import WriteBehindBuffer, get_write_behind_stats
+from session_store import init_session_store, revoke_session, get_session_cache_stats
+from invalidation import invalidate_user
+from rate_limit import throttle, client_ip, get_rate_limit_stats, init_rate_limits
+from password_hashing import (hash_password, hash_passwords, check_password, rehash_if_needed, HashingBusy,
+                              get_password_hash_stats, init_password_hashing)
+from activity_log import log_activity, register_activity_log_api
+from maintenance import register_maintenance, get_maintenance_stats
+from dashboard_counters import read_counters
+from revenue_rollup import orders_between
+from response_cache import (response_cache, init_response_cache, invalidate_response_caches,
+                            get_response_cache_stats)
+from event_stream import publish, latest_event_id, register_event_stream, get_event_stream_stats
+from occupancy import record_checkin, record_checkout, register_occupancy, get_occupancy_stats
+from visit_analytics import register_visit_analytics
+from rating_rollup import register_rating_analytics
+from presence import (register_presence_api, record_activity, record_login, record_logout,
+                      online_condition, online_cutoff, configure as configure_presence)
 
 
 # ==================== APP INITIALIZATION ====================
@@ -27,15 +50,93 @@ CORS(app, supports_credentials=True)
 # Register SQL Console routes
 register_sql_console(app)
 
-# Register Museum Data API (4 tables)
-register_museum_data_api(app)
+# Register Museum Data API (4 tables, served from an in-memory snapshot)
+register_museum_data_api(app, snapshot=True)
 
 # CRITICAL: Secret key for sessions
 app.secret_key = 'museum-bennharong-secret-key-2026-fixed'
 
-# Session configuration
-app.config['SESSION_TYPE'] = 'filesystem'
+# Session configuration: server-side sessions keyed by USER_SESSION token
 app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24 hours
+app.config['SESSION_CACHE_SIZE'] = 4096  # cached identities per worker
+init_session_store(app)
+
+# Database connection pool (idle connections kept per worker)
+app.config['DB_POOL_SIZE'] = 8
+app.config['DB_READ_POOL_SIZE'] = 8
+app.config['DB_WRITE_QUEUE_LIMIT'] = 32
+init_database(app)
+
+# Password hashing runs in a bounded process pool per worker; over the
+# queue limit requests get 503 at once. Calibrate the scrypt cost with
+# bench_password_hash.py (N doubles the time and memory of every hash)
+app.config['PASSWORD_HASH_WORKERS'] = 2
+app.config['PASSWORD_HASH_QUEUE_LIMIT'] = 16
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'
+init_password_hashing(app)
+
+# Behind nginx (proxy_params) the client address comes from X-Forwarded-For;
+# set to 0 when clients connect directly, or they can pick their own address
+app.config['TRUSTED_PROXY_HOPS'] = 1
+if app.config['TRUSTED_PROXY_HOPS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_HOPS'])
+
+# Token buckets for login / forgot-password / register, shared by all
+# workers: name -> (burst, seconds to refill); see rate_limit.DEFAULT_LIMITS
+app.config['RATE_LIMITS'] = {
+    'login_ip': (30, 300),
+    'login_user': (10, 600),
+    'forgot_password_ip': (5, 3600),
+    'forgot_password_email': (3, 3600),
+    'register_ip': (10, 3600),
+}
+init_rate_limits(app)
+
+# Session LAST_ACTIVITY is written behind: at most this many seconds late,
+# one batched UPDATE per interval (0 = write on every request, exact presence)
+app.config['SESSION_ACTIVITY_FLUSH_INTERVAL'] = 5
+
+# Presence (USER_PRESENCE) uses the same flush interval
+configure_presence(app.config['SESSION_ACTIVITY_FLUSH_INTERVAL'])
+register_presence_api(app)
+
+# Reaper: expire idle sessions, drop spent reset tokens, expire unpaid
+# orders and archive old rows, in small batches (see maintenance.py);
+# 0 = only from cron (python maintenance.py)
+app.config['MAINTENANCE_INTERVAL'] = 3600
+register_maintenance(app)
+
+# USER_ACTIVITY_LOG events are queued and inserted in batches; the audit
+# view (/api/admin/activity-log) sees them at most this many seconds late
+app.config['ACTIVITY_FLUSH_INTERVAL'] = 2
+register_activity_log_api(app)
+
+# Dashboard payloads polled by many screens are shared per worker: fresh
+# for RESPONSE_CACHE_TTL seconds, then served stale while one background
+# refresh runs, for at most RESPONSE_CACHE_MAX_STALE more seconds
+app.config['RESPONSE_CACHE_TTL'] = 5
+app.config['RESPONSE_CACHE_MAX_STALE'] = 60
+init_response_cache(app)
+
+# Live feed for dashboard / order / gate screens (Server-Sent Events); the
+# handlers below publish() into EVENT_OUTBOX inside their transaction.
+# Every open stream holds one gunicorn thread: keep SSE_MAX_STREAMS below
+# --threads (README) so extra screens get 503 instead of starving the worker
+app.config['SSE_MAX_STREAMS'] = 12
+register_event_stream(app)
+
+# Visitors inside: counted by check-in / check-out, sampled per minute and
+# reconciled against open visits by a per-worker thread (0 = off)
+app.config['OCCUPANCY_SAMPLE_INTERVAL'] = 60
+app.config['OCCUPANCY_RECONCILE_INTERVAL'] = 300
+register_occupancy(app)
+
+# Visit duration / throughput analytics; hours and dates in museum local time
+app.config['ANALYTICS_UTC_OFFSET_HOURS'] = 7
+register_visit_analytics(app)
+
+# Rating / feedback aggregates per guide, ticket type and day (RATING_DAILY)
+register_rating_analytics(app)
 
 # Email Configuration
 app.config['MAIL_SERVER'] = 'smtp.gmail.com'
@@ -88,37 +189,33 @@ def handle_error(error, context=""):
 
 def create_user_session(user_id, ip_address=None, user_agent=None):
     """Create new session record in USER_SESSION table"""
-    db = get_db_connection()
-    cursor = db.cursor()
-    
     session_token = secrets.token_urlsafe(32)
     
-    cursor.execute("""
-        INSERT INTO USER_SESSION (USER_ID, SESSION_TOKEN, IP_ADDRESS, USER_AGENT)
-        VALUES (?, ?, ?, ?)
-    """, (user_id, session_token, ip_address, user_agent))
-    
-    session_id = cursor.lastrowid
-    db.commit()
-    db.close()
+    with write_transaction() as db:
+        cursor = db.cursor()
+        cursor.execute("""
+            INSERT INTO USER_SESSION (USER_ID, SESSION_TOKEN, IP_ADDRESS, USER_AGENT)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, session_token, ip_address, user_agent))
+        
+        session_id = cursor.lastrowid
     
     return session_token, session_id
 
 
+# Latest activity per session token, flushed in one executemany
+session_activity = WriteBehindBuffer('session_activity', """
+    UPDATE USER_SESSION
+    SET LAST_ACTIVITY = ?
+    WHERE SESSION_TOKEN = ? AND IS_ACTIVE = 1
+""", flush_interval=app.config['SESSION_ACTIVITY_FLUSH_INTERVAL'])
+
+
 def update_session_activity(session_token):
-    """Update LAST_ACTIVITY for active session"""
+    """Record LAST_ACTIVITY for active session (UTC, like CURRENT_TIMESTAMP)"""
     try:
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        cursor.execute("""
-            UPDATE USER_SESSION
-            SET LAST_ACTIVITY = CURRENT_TIMESTAMP
-            WHERE SESSION_TOKEN = ? AND IS_ACTIVE = 1
-        """, (session_token,))
-        
-        db.commit()
-        db.close()
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        session_activity.add((now, session_token), key=session_token)
     except:
         pass
 
@@ -150,6 +247,8 @@ def track_session_activity():
     if 'session_token' in session and request.endpoint not in ['static', 'api_login', 'api_logout']:
         try:
             update_session_activity(session['session_token'])
+            if 'user_id' in session:
+                record_activity(session['user_id'])
         except:
             pass
 
@@ -170,21 +269,17 @@ def api_login():
             'message': 'Vui lòng nhập tên đăng nhập và mật khẩu'
         }), 400
     
+    # Before any query or hash: over-budget attempts cost nothing
+    throttled = throttle(login_ip=client_ip(), login_user=f"{user_type}:{username}")
+    if throttled:
+        logger.warning(f"Login throttled for {username} from {client_ip()}")
+        return throttled
+    
     try:
-        db = get_db_connection()
-        cursor = db.cursor()
+        db = get_read_connection()
         
         # Get user from database
-        cursor.execute("""
-            SELECT u.USER_ID, u.USERNAME, u.PASSWORD, u.FULLNAME, u.EMAIL, u.PHONE,
-                   u.IS_ACTIVE, u.USER_TYPE, r.ROLE_NAME, r.PERMISSIONS
-            FROM USER u
-            LEFT JOIN USER_ROLE ur ON u.USER_ID = ur.USER_ID
-            LEFT JOIN ROLE r ON ur.ROLE_ID = r.ROLE_ID
-            WHERE u.USERNAME = ? AND u.USER_TYPE = ?
-        """, (username, user_type))
-        
-        user = cursor.fetchone()
+        user = query_one(db, 'user_for_login', (username, user_type))
         
         if not user:
             db.close()
@@ -205,8 +300,8 @@ def api_login():
                 'message': 'Tài khoản đã bị vô hiệu hóa'
             }), 401
         
-        # Verify password using werkzeug
-        if not check_password_hash(stored_password, password):
+        # Verify password using werkzeug (hashing pool)
+        if not check_password(stored_password, password):
             db.close()
             logger.warning(f"Login failed for {username}: Wrong password")
             return jsonify({
@@ -214,21 +309,26 @@ def api_login():
                 'message': 'Tên đăng nhập hoặc mật khẩu không đúng'
             }), 401
         
-        # Update last login
-        cursor.execute("""
-            UPDATE USER 
-            SET LAST_LOGIN = CURRENT_TIMESTAMP
-            WHERE USER_ID = ?
-        """, (user_id,))
+        db.close()
         
-        # Log activity
-        cursor.execute("""
-            INSERT INTO USER_ACTIVITY_LOG (USER_ID, ACTION_TYPE, DESCRIPTION, IP_ADDRESS)
-            VALUES (?, 'login', ?, ?)
-        """, (user_id, f'User {username} logged in', request.remote_addr))
+        # Legacy scheme or old cost parameters: rehash in the background
+        rehash_if_needed(user_id, stored_password, password)
         
-        db.commit()
-        db.close()
+        with write_transaction() as db:
+            cursor = db.cursor()
+            
+            # Update last login
+            cursor.execute("""
+                UPDATE USER 
+                SET LAST_LOGIN = CURRENT_TIMESTAMP
+                WHERE USER_ID = ?
+            """, (user_id,))
+            
+            # Mark online
+            record_login(db, user_id)
+        
+        # Log activity (queued, written in the background)
+        log_activity(user_id, 'login', f'User {username} logged in', ip_address=request.remote_addr)
         
         # Create session in USER_SESSION table
         ip_address = request.remote_addr
@@ -259,6 +359,8 @@ def api_login():
             }
         })
         
+    except (WriteQueueFull, HashingBusy):
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         logger.error(traceback.format_exc())
@@ -280,17 +382,13 @@ def api_logout():
         # End session in USER_SESSION table
         if session_token:
             end_user_session(session_token)
+            revoke_session(session_token, user_id)
         
-        # Log activity
+        # Mark offline and log activity
         if user_id:
-            db = get_db_connection()
-            cursor = db.cursor()
-            cursor.execute("""
-                INSERT INTO USER_ACTIVITY_LOG (USER_ID, ACTION_TYPE, DESCRIPTION, IP_ADDRESS)
-                VALUES (?, 'logout', ?, ?)
-            """, (user_id, f'User {username} logged out', request.remote_addr))
-            db.commit()
-            db.close()
+            with write_transaction() as db:
+                record_logout(db, user_id)
+            log_activity(user_id, 'logout', f'User {username} logged out', ip_address=request.remote_addr)
     except Exception as e:
         logger.error(f"Logout tracking error: {str(e)}")
     
@@ -306,61 +404,23 @@ def api_logout():
 @app.route('/api/auth/session', methods=['GET'])
 def api_check_session():
     """Check if user is logged in and return session data"""
+    # The server-side session already carries a fresh identity (reloaded
+    # whenever the user is invalidated), so no database read here
     if 'user_id' in session:
-        # Get fresh data from database to include email and phone
-        try:
-            db = get_db_connection()
-            cursor = db.cursor()
-            
-            cursor.execute("""
-                SELECT u.USER_ID, u.USERNAME, u.FULLNAME, u.EMAIL, u.PHONE,
-                       r.ROLE_NAME, r.PERMISSIONS
-                FROM USER u
-                LEFT JOIN USER_ROLE ur ON u.USER_ID = ur.USER_ID
-                LEFT JOIN ROLE r ON ur.ROLE_ID = r.ROLE_ID
-                WHERE u.USER_ID = ? AND u.IS_ACTIVE = 1
-            """, (session['user_id'],))
-            
-            user = cursor.fetchone()
-            db.close()
-            
-            if not user:
-                session.clear()
-                return jsonify({
-                    'success': True,
-                    'logged_in': False
-                })
-            
-            return jsonify({
-                'success': True,
-                'logged_in': True,
-                'data': {
-                    'user_id': user[0],
-                    'username': user[1],
-                    'fullname': user[2],
-                    'email': user[3],
-                    'phone': user[4],
-                    'role': user[5],
-                    'user_type': session.get('user_type'),
-                    'permissions': user[6].split(',') if user[6] else []
-                }
-            })
-        except Exception as e:
-            logger.error(f"Session check error: {str(e)}")
-            return jsonify({
-                'success': True,
-                'logged_in': True,
-                'data': {
-                    'user_id': session.get('user_id'),
-                    'username': session.get('username'),
-                    'fullname': session.get('fullname'),
-                    'email': session.get('email'),
-                    'phone': session.get('phone'),
-                    'role': session.get('role'),
-                    'user_type': session.get('user_type'),
-                    'permissions': session.get('permissions', [])
-                }
-            })
+        return jsonify({
+            'success': True,
+            'logged_in': True,
+            'data': {
+                'user_id': session.get('user_id'),
+                'username': session.get('username'),
+                'fullname': session.get('fullname'),
+                'email': session.get('email'),
+                'phone': session.get('phone'),
+                'role': session.get('role'),
+                'user_type': session.get('user_type'),
+                'permissions': session.get('permissions', [])
+            }
+        })
     else:
         return jsonify({
             'success': True,
@@ -377,6 +437,10 @@ def api_register_customer():
     phone = data.get('phone')
     email = data.get('email', '')
     
+    throttled = throttle(register_ip=client_ip())
+    if throttled:
+        return throttled
+    
     try:
         db = get_db_connection()
         user_id, error = AuthManager.register_customer(
@@ -405,6 +469,8 @@ def api_register_customer():
             'data': {'user_id': user_id}
         })
         
+    except HashingBusy:
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         logger.error(traceback.format_exc())
@@ -426,6 +492,10 @@ def api_forgot_password():
             'message': 'Vui lòng nhập email'
         }), 400
     
+    throttled = throttle(forgot_password_ip=client_ip(), forgot_password_email=email)
+    if throttled:
+        return throttled
+    
     try:
         db = get_db_connection()
         cursor = db.cursor()
@@ -435,6 +505,7 @@ def api_forgot_password():
         user = cursor.fetchone()
         
         if not user:
+            db.close()
             # Don't reveal if email exists or not for security
             return jsonify({
                 'success': True,
@@ -508,6 +579,8 @@ def api_reset_password():
             'message': 'Đặt lại mật khẩu thành công! Vui lòng đăng nhập.'
         })
         
+    except HashingBusy:
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
     except Exception as e:
         logger.error(f"Reset password error: {str(e)}")
         return jsonify({
@@ -549,6 +622,8 @@ def api_change_password():
             'message': 'Đổi mật khẩu thành công!'
         })
         
+    except HashingBusy:
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
     except Exception as e:
         logger.error(f"Change password error: {str(e)}")
         return jsonify({
@@ -593,8 +668,7 @@ def api_update_profile():
         user_id = session['user_id']
         
         # Get customer_id
-        cursor.execute("SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?", (user_id,))
-        customer = cursor.fetchone()
+        customer = query_one(db, 'customer_id_by_user', (user_id,))
         
         if not customer:
             db.close()
@@ -621,6 +695,7 @@ def api_update_profile():
         
         db.commit()
         db.close()
+        invalidate_user(user_id)
         
         logger.info(f"Profile updated for user_id: {user_id}")
         
@@ -629,6 +704,9 @@ def api_update_profile():
             'message': 'Cập nhật thông tin thành công'
         })
         
+    except sqlite3.IntegrityError as e:
+        message = AuthManager.integrity_message(e) or f'Lỗi: {str(e)}'
+        return jsonify({'success': False, 'message': message}), 400
     except Exception as e:
         logger.error(f"Update profile error: {str(e)}")
         logger.error(traceback.format_exc())
@@ -652,29 +730,25 @@ def api_get_all_users():
         db = get_db_connection()
         cursor = db.cursor()
         
-        # Build query with online status from USER_SESSION
-        query = """
+        # Build query with online status from USER_PRESENCE (one row per user)
+        query = f"""
             SELECT 
                 u.USER_ID, u.USERNAME, u.FULLNAME, u.EMAIL, u.PHONE,
                 u.IS_ACTIVE, u.LAST_LOGIN, u.CREATED_AT,
                 r.ROLE_NAME, r.ROLE_ID,
                 u.USER_TYPE,
                 CASE 
-                    WHEN EXISTS (
-                        SELECT 1 FROM USER_SESSION s
-                        WHERE s.USER_ID = u.USER_ID
-                        AND s.IS_ACTIVE = 1
-                        AND datetime(s.LAST_ACTIVITY) > datetime('now', '-30 minutes')
-                    )
+                    WHEN {online_condition('p')}
                     THEN 1
                     ELSE 0
                 END as IS_ONLINE
             FROM USER u
             LEFT JOIN USER_ROLE ur ON u.USER_ID = ur.USER_ID
             LEFT JOIN ROLE r ON ur.ROLE_ID = r.ROLE_ID
+            LEFT JOIN USER_PRESENCE p ON p.USER_ID = u.USER_ID
             WHERE u.USER_TYPE = ?
         """
-        params = [user_type]
+        params = [online_cutoff(), user_type]
         
         if search:
             query += " AND (u.USERNAME LIKE ? OR u.FULLNAME LIKE ? OR u.EMAIL LIKE ?)"
@@ -808,7 +882,7 @@ def api_update_user(user_id):
         
         if 'phone' in data:
             updates.append('PHONE = ?')
-            params.append(data['phone'])
+            params.append(AuthManager.normalize_phone(data['phone']) or None)
         
         if 'is_active' in data:
             updates.append('IS_ACTIVE = ?')
@@ -826,6 +900,7 @@ def api_update_user(user_id):
             query = f"UPDATE USER SET {', '.join(updates)} WHERE USER_ID = ?"
             cursor.execute(query, params)
             db.commit()
+            invalidate_user(user_id)
         
         db.close()
         
@@ -836,6 +911,9 @@ def api_update_user(user_id):
             'message': 'Cập nhật thành công'
         })
         
+    except sqlite3.IntegrityError as e:
+        message = AuthManager.integrity_message(e) or f'Lỗi: {str(e)}'
+        return jsonify({'success': False, 'message': message}), 400
     except Exception as e:
         logger.error(f"Update user error: {str(e)}")
         return jsonify({
@@ -871,6 +949,7 @@ def api_delete_user(user_id):
         
         db.commit()
         db.close()
+        invalidate_user(user_id)
         
         logger.info(f"User {user_id} deleted by {session['username']}")
         
@@ -907,12 +986,12 @@ def api_admin_change_user_password(user_id):
         }), 400
     
     try:
+        # Hash password using werkzeug (hashing pool), before opening the connection
+        hashed_pwd = hash_password(new_password)
+        
         db = get_db_connection()
         cursor = db.cursor()
         
-        # Hash password using werkzeug
-        hashed_pwd = generate_password_hash(new_password)
-        
         cursor.execute("""
             UPDATE USER 
             SET PASSWORD = ?, UPDATED_AT = ?, UPDATED_BY = ?
@@ -934,6 +1013,8 @@ def api_admin_change_user_password(user_id):
             'message': 'Đổi mật khẩu thành công'
         })
         
+    except HashingBusy:
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
     except Exception as e:
         logger.error(f"Admin change password error: {str(e)}")
         return jsonify({
@@ -942,6 +1023,80 @@ def api_admin_change_user_password(user_id):
         }), 500
 
 
+# Plain-text passwords cost one scrypt hash each, so they are capped per
+# request; accounts given as password_hash or without a password are not
+IMPORT_MAX_ACCOUNTS = 10000
+IMPORT_MAX_PLAIN_PASSWORDS = 200
+
+
+@app.route('/api/admin/customers/import', methods=['POST'])
+@permission_required('all')
+def api_import_customers():
+    """Bulk-create customer accounts in one transaction
+    
+    JSON {"accounts": [{username, fullname, phone, email, password | password_hash}]}
+    or a CSV upload ("file") with those columns. Rows that are invalid or clash
+    with existing accounts are skipped and reported.
+    """
+    try:
+        if 'file' in request.files:
+            text = request.files['file'].read().decode('utf-8-sig')
+            accounts = list(csv.DictReader(io.StringIO(text)))
+        else:
+            accounts = (request.get_json(silent=True) or {}).get('accounts') or []
+        
+        if not accounts:
+            return jsonify({'success': False, 'message': 'Không có tài khoản để nhập'}), 400
+        if len(accounts) > IMPORT_MAX_ACCOUNTS:
+            return jsonify({
+                'success': False,
+                'message': f'Tối đa {IMPORT_MAX_ACCOUNTS} tài khoản mỗi lần nhập'
+            }), 400
+        
+        rows, errors = AuthManager.prepare_import(accounts)
+        
+        plain = [row for row in rows if row['password'] and not row['password_hash']]
+        if len(plain) > IMPORT_MAX_PLAIN_PASSWORDS:
+            return jsonify({
+                'success': False,
+                'message': f'Tối đa {IMPORT_MAX_PLAIN_PASSWORDS} mật khẩu dạng rõ mỗi lần nhập; '
+                           f'hãy dùng password_hash hoặc bỏ trống mật khẩu'
+            }), 400
+        
+        # Hash outside the transaction, on every hashing process
+        for row, hashed in zip(plain, hash_passwords([row['password'] for row in plain])):
+            row['hash'] = hashed
+        for row in rows:
+            row.setdefault('hash', row['password_hash'] or AuthManager.UNUSABLE_PASSWORD)
+        
+        created, skipped = 0, []
+        if rows:
+            with write_transaction() as db:
+                created, skipped = AuthManager.import_customers(db, rows)
+        
+        log_activity(session['user_id'], 'customers_imported',
+                     f'Imported {created} customer accounts ({len(errors) + len(skipped)} skipped)',
+                     ip_address=request.remote_addr)
+        logger.info(f"Admin {session['username']} imported {created} customer accounts")
+        
+        return jsonify({
+            'success': True,
+            'message': f'Đã nhập {created} tài khoản',
+            'data': {
+                'created': created,
+                'skipped': sorted(errors + skipped, key=lambda item: item['row']),
+                'without_password': sum(1 for row in rows if row['hash'] == AuthManager.UNUSABLE_PASSWORD)
+            }
+        })
+    
+    except (WriteQueueFull, HashingBusy):
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
+    except Exception as e:
+        logger.error(f"Import customers error: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
+
+
 @app.route('/api/admin/users/<int:user_id>/change-role', methods=['POST'])
 @permission_required('all')
 def api_admin_change_user_role(user_id):
@@ -973,6 +1128,7 @@ def api_admin_change_user_role(user_id):
         
         db.commit()
         db.close()
+        invalidate_user(user_id)
         
         logger.info(f"Admin {session['username']} changed role for user {user_id} to role {new_role_id}")
         
@@ -1054,12 +1210,9 @@ def api_get_customer_tickets():
         cursor = db.cursor()
         
         # Get customer_id from user_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
+            db.close()
             return jsonify({
                 'success': False,
                 'message': 'Không tìm thấy thông tin khách hàng'
@@ -1154,15 +1307,11 @@ def api_get_customer_ticket_detail(ticket_id):
     """Get detailed ticket information with QR code data"""
     try:
         db = get_db_connection()
-        cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
-        """, (session['user_id'],))
-        
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         if not customer_row:
+            db.close()
             return jsonify({
                 'success': False,
                 'message': 'Không tìm thấy thông tin khách hàng'
@@ -1171,22 +1320,7 @@ def api_get_customer_ticket_detail(ticket_id):
         customer_id = customer_row[0]
         
         # Get ticket details
-        cursor.execute("""
-            SELECT 
-                t.TICKET_ID, t.TICKET_CODE, t.QUANTITY, t.TOTAL_PRICE,
-                t.VALID_DATE, t.PURCHASE_DATE, t.STATUS, t.PAYMENT_METHOD, t.NOTES,
-                tt.TYPE_NAME, tt.PRICE, tt.DESCRIPTION,
-                c.FULLNAME, c.PHONE, c.EMAIL,
-                vh.CHECK_IN_TIME, vh.CHECK_OUT_TIME, vh.DURATION_MINUTES,
-                vh.RATING, vh.FEEDBACK
-            FROM TICKET t
-            JOIN TICKET_TYPE tt ON t.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
-            JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
-            LEFT JOIN VISIT_HISTORY vh ON t.TICKET_ID = vh.TICKET_ID
-            WHERE t.TICKET_ID = ? AND t.CUSTOMER_ID = ?
-        """, (ticket_id, customer_id))
-        
-        row = cursor.fetchone()
+        row = query_one(db, 'customer_ticket_detail', (ticket_id, customer_id))
         db.close()
         
         if not row:
@@ -1306,8 +1440,7 @@ def api_create_order():
         cursor = db.cursor()
         
         # Get customer_id from user_id
-        cursor.execute("SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?", (session['user_id'],))
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         
         if not customer_row:
             db.close()
@@ -1316,8 +1449,7 @@ def api_create_order():
         customer_id = customer_row[0]
         
         # Get ticket type price
-        cursor.execute("SELECT PRICE, TYPE_NAME FROM TICKET_TYPE WHERE TICKET_TYPE_ID = ?", (ticket_type_id,))
-        ticket_row = cursor.fetchone()
+        ticket_row = query_one(db, 'ticket_type_price', (ticket_type_id,))
         
         if not ticket_row:
             db.close()
@@ -1347,8 +1479,17 @@ def api_create_order():
         order_code = order_row[0]
         payment_reference = order_row[1]
         
+        publish(db, 'order_created', {
+            'order_id': order_id,
+            'order_code': order_code,
+            'status': 'pending',
+            'quantity': quantity,
+            'total_price': total_price
+        })
+        
         db.commit()
         db.close()
+        invalidate_response_caches()
         
         logger.info(f"Order created: {order_code} by customer {customer_id}")
         
@@ -1391,8 +1532,7 @@ def api_get_my_orders():
         cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?", (session['user_id'],))
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         
         if not customer_row:
             db.close()
@@ -1477,8 +1617,7 @@ def api_upload_payment_proof(order_id):
         cursor = db.cursor()
         
         # Get customer_id
-        cursor.execute("SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?", (session['user_id'],))
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
         
         if not customer_row:
             db.close()
@@ -1525,8 +1664,11 @@ def api_upload_payment_proof(order_id):
             WHERE ORDER_ID = ?
         """, (file_path_relative, transaction_ref, order_id))
         
+        publish(db, 'order_submitted', {'order_id': order_id, 'status': 'waiting_confirmation'})
+        
         db.commit()
         db.close()
+        invalidate_response_caches()
         
         logger.info(f"Payment proof uploaded for order {order_id}")
         
@@ -1553,8 +1695,7 @@ def api_cancel_order(order_id):
         cursor = db.cursor()
 
         # Get customer_id
-        cursor.execute("SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?", (session['user_id'],))
-        customer_row = cursor.fetchone()
+        customer_row = query_one(db, 'customer_id_by_user', (session['user_id'],))
 
         if not customer_row:
             db.close()
@@ -1601,68 +1742,46 @@ def api_cancel_order(order_id):
         return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
 
 
-@app.route('/api/statistics', methods=['GET'])
-@login_required
-def api_get_statistics():
-    """Get dashboard statistics"""
+def _load_statistics():
+    """Dashboard statistics payload (served through statistics_cache)"""
+    db = get_read_connection()
     try:
-        db = get_db_connection()
         cursor = db.cursor()
         
-        # Total tickets sold (all non-cancelled tickets)
-        cursor.execute("""
-            SELECT COUNT(*) FROM TICKET 
-            WHERE STATUS != 'cancelled'
-        """)
-        total_tickets = cursor.fetchone()[0]
-        
-        # Total revenue (sum of all paid tickets - exclude cancelled)
-        cursor.execute("""
-            SELECT COALESCE(SUM(TOTAL_PRICE), 0) FROM TICKET 
-            WHERE STATUS IN ('valid', 'used', 'checked_out', 'completed')
-        """)
-        total_revenue = cursor.fetchone()[0]
-        
-        # Total customers
-        cursor.execute("SELECT COUNT(*) FROM CUSTOMER")
-        total_customers = cursor.fetchone()[0]
+        # Running totals, kept current by triggers (dashboard_counters.py)
+        counters = read_counters(db)
         
-        # Total visits (all visit records)
-        cursor.execute("SELECT COUNT(*) FROM VISIT_HISTORY")
-        total_visits = cursor.fetchone()[0]
-        
-        # Recent tickets (last 7 days)
+        # Recent tickets (last 7 days), from the REVENUE_DAILY rollup
         cursor.execute("""
-            SELECT COUNT(*) FROM TICKET 
-            WHERE DATE(PURCHASE_DATE) >= DATE('now', '-7 days')
+            SELECT COALESCE(SUM(TICKETS), 0) FROM REVENUE_DAILY 
+            WHERE DAY >= DATE('now', '-7 days')
         """)
         recent_tickets = cursor.fetchone()[0]
-        
-        # Pending orders
-        cursor.execute("SELECT COUNT(*) FROM \"ORDER\" WHERE STATUS = 'pending'")
-        pending_orders = cursor.fetchone()[0]
-        
-        # Waiting confirmation orders
-        cursor.execute("SELECT COUNT(*) FROM \"ORDER\" WHERE STATUS = 'waiting_confirmation'")
-        waiting_orders = cursor.fetchone()[0]
-        
+    finally:
         db.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'overview': {
-                    'total_tickets': total_tickets,
-                    'total_revenue': total_revenue,
-                    'total_customers': total_customers,
-                    'total_visits': total_visits
-                },
-                'recent_tickets': recent_tickets,
-                'pending_orders': pending_orders,
-                'waiting_orders': waiting_orders
-            }
-        })
-        
+    
+    return {
+        'overview': {
+            'total_tickets': counters['tickets_total'] - counters['tickets_cancelled'],
+            'total_revenue': counters['revenue'],
+            'total_customers': counters['customers'],
+            'total_visits': counters['visits']
+        },
+        'recent_tickets': recent_tickets,
+        'pending_orders': counters['orders_pending'],
+        'waiting_orders': counters['orders_waiting_confirmation']
+    }
+
+
+statistics_cache = response_cache('statistics', _load_statistics, version=latest_event_id)
+
+
+@app.route('/api/statistics', methods=['GET'])
+@login_required
+def api_get_statistics():
+    """Get dashboard statistics (cached, see response_cache.py)"""
+    try:
+        return statistics_cache.response()
     except Exception as e:
         logger.error(f"Get statistics error: {str(e)}")
         return jsonify({'success': False, 'message': f'Loi: {str(e)}'}), 500    
@@ -1676,56 +1795,20 @@ def api_auth_verify():
     if 'user_id' not in session:
         return jsonify({'success': False, 'logged_in': False}), 401
     
-    try:
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        # Get user info
-        cursor.execute("""
-            SELECT u.USER_ID, u.USERNAME, u.EMAIL, u.FULLNAME, u.PHONE, u.USER_TYPE
-            FROM USER u
-            WHERE u.USER_ID = ? AND u.IS_ACTIVE = 1
-        """, (session['user_id'],))
-        
-        user = cursor.fetchone()
-        
-        if not user:
-            db.close()
-            session.clear()
-            return jsonify({'success': False, 'logged_in': False}), 401
-        
-        # Get role
-        cursor.execute("""
-            SELECT r.ROLE_NAME, r.PERMISSIONS
-            FROM USER_ROLE ur
-            JOIN ROLE r ON ur.ROLE_ID = r.ROLE_ID
-            WHERE ur.USER_ID = ?
-        """, (session['user_id'],))
-        
-        role_row = cursor.fetchone()
-        role_name = role_row[0] if role_row else None
-        permissions = role_row[1].split(',') if role_row and role_row[1] else []
-        
-        db.close()
-        
-        return jsonify({
-            'success': True,
-            'logged_in': True,
-            'data': {
-                'user_id': user[0],
-                'username': user[1],
-                'email': user[2],
-                'fullname': user[3],
-                'phone': user[4],
-                'user_type': user[5],
-                'role': role_name,
-                'permissions': permissions
-            }
-        })
-        
-    except Exception as e:
-        logger.error(f"Auth verify error: {str(e)}")
-        return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
+    return jsonify({
+        'success': True,
+        'logged_in': True,
+        'data': {
+            'user_id': session.get('user_id'),
+            'username': session.get('username'),
+            'email': session.get('email'),
+            'fullname': session.get('fullname'),
+            'phone': session.get('phone'),
+            'user_type': session.get('user_type'),
+            'role': session.get('role'),
+            'permissions': session.get('permissions', [])
+        }
+    })
 
 
 # 2. Ticket Types Endpoint (for admin)
@@ -1768,6 +1851,14 @@ def api_get_all_ticket_types():
 
 # ========== TICKETS API ==========
 
+# api_get_tickets output keys, in SELECT column order
+TICKET_LIST_KEYS = (
+    'id',  # Fixed: was ticket_id
+    'code',  # Fixed: was ticket_code
+    'status', 'quantity', 'total_price', 'purchase_date', 'valid_date',
+    'ticket_type', 'customer_name', 'customer_phone',
+)
+
 @app.route('/api/tickets', methods=['GET'])
 @login_required
 def api_get_tickets():
@@ -1776,7 +1867,7 @@ def api_get_tickets():
         status_filter = request.args.get('status', '')
         limit = request.args.get('limit', 100)
         
-        db = get_db_connection()
+        db = get_read_connection()
         cursor = db.cursor()
         
         query = """
@@ -1800,24 +1891,8 @@ def api_get_tickets():
         
         cursor.execute(query, params)
         
-        tickets = []
-        for row in cursor.fetchall():
-            tickets.append({
-                'id': row[0],  # Fixed: was ticket_id
-                'code': row[1],  # Fixed: was ticket_code
-                'status': row[2],
-                'quantity': row[3],
-                'total_price': row[4],
-                'purchase_date': row[5],
-                'valid_date': row[6],
-                'ticket_type': row[7],
-                'customer_name': row[8],
-                'customer_phone': row[9]
-            })
-        
-        db.close()
-        
-        return jsonify({'success': True, 'data': tickets})
+        return json_rows_response(cursor, TICKET_LIST_KEYS, envelope={'success': True},
+                                  stream=request.args.get('stream') == '1', on_close=db.close)
         
     except Exception as e:
         logger.error(f"Get tickets error: {str(e)}")
@@ -1826,6 +1901,13 @@ def api_get_tickets():
 
 # ========== CUSTOMERS API ==========
 
+# api_get_customers output keys, in SELECT column order
+CUSTOMER_LIST_KEYS = (
+    'id',  # Fixed: was customer_id
+    'full_name',  # Fixed: was fullname
+    'phone', 'email', 'id_number', 'nationality', 'created_at', 'ticket_count',
+)
+
 @app.route('/api/customers', methods=['GET'])
 @login_required
 def api_get_customers():
@@ -1834,7 +1916,7 @@ def api_get_customers():
         limit = request.args.get('limit', 100)
         search = request.args.get('search', '')
         
-        db = get_db_connection()
+        db = get_read_connection()
         cursor = db.cursor()
         
         query = """
@@ -1857,22 +1939,8 @@ def api_get_customers():
         
         cursor.execute(query, params)
         
-        customers = []
-        for row in cursor.fetchall():
-            customers.append({
-                'id': row[0],  # Fixed: was customer_id
-                'full_name': row[1],  # Fixed: was fullname
-                'phone': row[2],
-                'email': row[3],
-                'id_number': row[4],
-                'nationality': row[5],
-                'created_at': row[6],
-                'ticket_count': row[7]
-            })
-        
-        db.close()
-        
-        return jsonify({'success': True, 'data': customers})
+        return json_rows_response(cursor, CUSTOMER_LIST_KEYS, envelope={'success': True},
+                                  stream=request.args.get('stream') == '1', on_close=db.close)
         
     except Exception as e:
         logger.error(f"Get customers error: {str(e)}")
@@ -1924,6 +1992,13 @@ def api_get_active_visits():
         return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
 
 
+# api_get_visit_history output keys, in SELECT column order
+VISIT_HISTORY_KEYS = (
+    'id',  # Fixed: was history_id
+    'check_in_time', 'check_out_time', 'duration_minutes', 'rating', 'feedback',
+    'customer_name', 'customer_phone', 'ticket_code', 'guide_name',
+)
+
 @app.route('/api/visit-history', methods=['GET'])
 @login_required
 def api_get_visit_history():
@@ -1931,7 +2006,7 @@ def api_get_visit_history():
     try:
         limit = request.args.get('limit', 50)
         
-        db = get_db_connection()
+        db = get_read_connection()
         cursor = db.cursor()
         
         cursor.execute("""
@@ -1949,24 +2024,8 @@ def api_get_visit_history():
             LIMIT ?
         """, (limit,))
         
-        history = []
-        for row in cursor.fetchall():
-            history.append({
-                'id': row[0],  # Fixed: was history_id
-                'check_in_time': row[1],
-                'check_out_time': row[2],
-                'duration_minutes': row[3],
-                'rating': row[4],
-                'feedback': row[5],
-                'customer_name': row[6],
-                'customer_phone': row[7],
-                'ticket_code': row[8],
-                'guide_name': row[9]
-            })
-        
-        db.close()
-        
-        return jsonify({'success': True, 'data': history})
+        return json_rows_response(cursor, VISIT_HISTORY_KEYS, envelope={'success': True},
+                                  stream=request.args.get('stream') == '1', on_close=db.close)
         
     except Exception as e:
         logger.error(f"Get visit history error: {str(e)}")
@@ -1995,7 +2054,7 @@ def api_create_customer():
             ) VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (
             data.get('full_name'),
-            data.get('phone'),
+            AuthManager.normalize_phone(data.get('phone')) or None,
             data.get('email'),
             data.get('date_of_birth'),  # Frontend sends as date_of_birth
             data.get('gender'),
@@ -2031,6 +2090,9 @@ def api_create_customer():
         logger.info(f"Customer created: {customer['full_name']} (ID: {customer_id})")
         return jsonify({'success': True, 'data': customer, 'message': 'Thêm khách hàng thành công'})
         
+    except sqlite3.IntegrityError as e:
+        message = AuthManager.integrity_message(e) or f'Lỗi: {str(e)}'
+        return jsonify({'success': False, 'message': message}), 400
     except Exception as e:
         logger.error(f"Create customer error: {str(e)}")
         return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
@@ -2042,7 +2104,8 @@ def api_create_customer():
 def api_search_customer_by_phone():
     """Search customer by phone number"""
     try:
-        phone = request.args.get('phone', '')
+        # Stored phones are canonical (digits only, +84 -> 0)
+        phone = AuthManager.normalize_phone(request.args.get('phone', ''))
         
         if not phone:
             return jsonify({'success': False, 'message': 'Số điện thoại không được để trống'}), 400
@@ -2264,21 +2327,9 @@ def api_send_ticket_email(ticket_id):
     """Send email - OFFLINE to admin, ONLINE to customer"""
     try:
         db = get_db_connection()
-        cursor = db.cursor()
         
         # Get complete ticket info including USER_ID to detect OFFLINE/ONLINE
-        cursor.execute("""
-            SELECT t.TICKET_ID, t.TICKET_CODE, t.QUANTITY, t.TOTAL_PRICE, 
-                   t.VALID_DATE, t.STATUS, t.PAYMENT_METHOD,
-                   tt.TYPE_NAME, tt.PRICE,
-                   c.FULLNAME, c.PHONE, c.EMAIL, c.USER_ID
-            FROM TICKET t
-            JOIN TICKET_TYPE tt ON t.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
-            JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
-            WHERE t.TICKET_ID = ?
-        """, (ticket_id,))
-        
-        ticket = cursor.fetchone()
+        ticket = query_one(db, 'ticket_with_customer', (ticket_id,))
         db.close()
         
         if not ticket:
@@ -2428,8 +2479,9 @@ def api_get_available_checkin():
             FROM TICKET t
             JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
             WHERE t.STATUS = 'valid'
-            AND t.TICKET_ID NOT IN (
-                SELECT TICKET_ID FROM VISIT_HISTORY WHERE CHECK_OUT_TIME IS NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM VISIT_HISTORY vh
+                WHERE vh.TICKET_ID = t.TICKET_ID AND vh.CHECK_OUT_TIME IS NULL
             )
             GROUP BY c.CUSTOMER_ID, c.FULLNAME, c.PHONE
             ORDER BY c.FULLNAME
@@ -2464,73 +2516,70 @@ def api_checkin():
     try:
         data = request.get_json()
         ticket_code = data.get('ticket_code')
+        construction_id = data.get('construction_id')   # optional: area checked in at
         
         if not ticket_code:
             return jsonify({'success': False, 'message': 'Mã vé không được để trống'}), 400
         
-        db = get_db_connection()
-        cursor = db.cursor()
+        with write_transaction() as db:
+            cursor = db.cursor()
         
-        # Find ticket
-        cursor.execute("""
-            SELECT t.TICKET_ID, t.STATUS, t.CUSTOMER_ID, t.VALID_DATE,
-                   c.FULLNAME, c.PHONE,
-                   tt.TYPE_NAME
-            FROM TICKET t
-            JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
-            JOIN TICKET_TYPE tt ON t.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
-            WHERE t.TICKET_CODE = ?
-        """, (ticket_code,))
+            if construction_id is not None:
+                area = db.execute(
+                    "SELECT CONSTRUCTION_ID FROM CONSTRUCTION WHERE CONSTRUCTION_ID = ? AND IS_ACTIVE = 1",
+                    (construction_id,)).fetchone()
+                if not area:
+                    return jsonify({'success': False, 'message': 'Khu vực không tồn tại'}), 400
+                construction_id = area[0]
         
-        ticket = cursor.fetchone()
+            # Find ticket
+            ticket = query_one(db, 'ticket_by_code', (ticket_code,))
         
-        if not ticket:
-            db.close()
-            return jsonify({'success': False, 'message': 'Mã vé không tồn tại'}), 404
-        
-        ticket_id = ticket[0]
-        status = ticket[1]
-        customer_id = ticket[2]
-        valid_date = ticket[3]
-        customer_name = ticket[4]
-        customer_phone = ticket[5]
-        ticket_type = ticket[6]
-        
-        # Validate status
-        if status == 'used':
-            db.close()
-            return jsonify({'success': False, 'message': 'Vé đã được sử dụng'}), 400
+            if not ticket:
+                return jsonify({'success': False, 'message': 'Mã vé không tồn tại'}), 404
         
-        if status == 'cancelled':
-            db.close()
-            return jsonify({'success': False, 'message': 'Vé đã bị hủy'}), 400
+            ticket_id = ticket[0]
+            status = ticket[1]
+            customer_id = ticket[2]
+            valid_date = ticket[3]
+            customer_name = ticket[4]
+            customer_phone = ticket[5]
+            ticket_type = ticket[6]
         
-        if status != 'valid':
-            db.close()
-            return jsonify({'success': False, 'message': f'Vé không hợp lệ'}), 400
+            # Validate status
+            if status == 'used':
+                return jsonify({'success': False, 'message': 'Vé đã được sử dụng'}), 400
         
-        # Check if already checked-in
-        cursor.execute("""
-            SELECT HISTORY_ID FROM VISIT_HISTORY 
-            WHERE TICKET_ID = ? AND CHECK_OUT_TIME IS NULL
-        """, (ticket_id,))
+            if status == 'cancelled':
+                return jsonify({'success': False, 'message': 'Vé đã bị hủy'}), 400
         
-        if cursor.fetchone():
-            db.close()
-            return jsonify({'success': False, 'message': 'Vé đã được check-in rồi'}), 400
+            if status != 'valid':
+                return jsonify({'success': False, 'message': f'Vé không hợp lệ'}), 400
         
-        # Get guide (current user)
-        guide_id = session.get('user_id')
+            # Check if already checked-in
+            if query_one(db, 'open_visit_by_ticket', (ticket_id,)):
+                return jsonify({'success': False, 'message': 'Vé đã được check-in rồi'}), 400
         
-        # Create visit history (check-in)
-        cursor.execute("""
-            INSERT INTO VISIT_HISTORY (
-                TICKET_ID, CUSTOMER_ID, GUIDE_ID, CHECK_IN_TIME
-            ) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        """, (ticket_id, customer_id, guide_id))
+            # Get guide (current user)
+            guide_id = session.get('user_id')
         
-        db.commit()
-        db.close()
+            # Create visit history (check-in)
+            cursor.execute("""
+                INSERT INTO VISIT_HISTORY (
+                    TICKET_ID, CUSTOMER_ID, GUIDE_ID, CHECK_IN_TIME, CONSTRUCTION_ID
+                ) VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)
+            """, (ticket_id, customer_id, guide_id, construction_id))
+        
+            record_checkin(db, construction_id)
+            publish(db, 'checkin', {
+                'history_id': cursor.lastrowid,
+                'ticket_code': ticket_code,
+                'customer_id': customer_id,
+                'customer_name': customer_name,
+                'construction_id': construction_id
+            })
+        
+        invalidate_response_caches()
         
         logger.info(f"Check-in successful: {ticket_code} - {customer_name}")
         return jsonify({
@@ -2544,6 +2593,11 @@ def api_checkin():
             }
         })
         
+    except sqlite3.IntegrityError:
+        # idx_visit_history_open_ticket: one open visit per ticket
+        return jsonify({'success': False, 'message': 'Vé đã được check-in rồi'}), 400
+    except WriteQueueFull:
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
     except Exception as e:
         logger.error(f"Check-in error: {str(e)}")
         return jsonify({'success': False, 'message': f'Lỗi check-in: {str(e)}'}), 500
@@ -2612,58 +2666,55 @@ def api_checkout():
         if not ticket_code:
             return jsonify({'success': False, 'message': 'Mã vé không được để trống'}), 400
         
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        # Find ticket
-        cursor.execute("""
-            SELECT t.TICKET_ID, c.FULLNAME, c.PHONE
-            FROM TICKET t
-            JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
-            WHERE t.TICKET_CODE = ?
-        """, (ticket_code,))
+        with write_transaction() as db:
+            cursor = db.cursor()
         
-        ticket = cursor.fetchone()
+            # Find ticket
+            ticket = query_one(db, 'ticket_by_code', (ticket_code,))
         
-        if not ticket:
-            db.close()
-            return jsonify({'success': False, 'message': 'Mã vé không tồn tại'}), 404
+            if not ticket:
+                return jsonify({'success': False, 'message': 'Mã vé không tồn tại'}), 404
         
-        ticket_id = ticket[0]
-        customer_name = ticket[1]
-        customer_phone = ticket[2]
+            ticket_id = ticket['TICKET_ID']
+            customer_name = ticket['FULLNAME']
+            customer_phone = ticket['PHONE']
         
-        # Find active visit
-        cursor.execute("""
-            SELECT HISTORY_ID, CHECK_IN_TIME 
-            FROM VISIT_HISTORY 
-            WHERE TICKET_ID = ? AND CHECK_OUT_TIME IS NULL
-        """, (ticket_id,))
+            # Find active visit
+            visit = query_one(db, 'open_visit_by_ticket', (ticket_id,))
         
-        visit = cursor.fetchone()
+            if not visit:
+                return jsonify({'success': False, 'message': 'Vé chưa được check-in hoặc đã check-out rồi'}), 400
         
-        if not visit:
-            db.close()
-            return jsonify({'success': False, 'message': 'Vé chưa được check-in hoặc đã check-out rồi'}), 400
+            history_id = visit[0]
+            construction_id = visit[2]
         
-        history_id = visit[0]
+            # Update visit history (check-out); only an open visit can be closed
+            cursor.execute("""
+                UPDATE VISIT_HISTORY 
+                SET CHECK_OUT_TIME = CURRENT_TIMESTAMP,
+                    DURATION_MINUTES = CAST((julianday(CURRENT_TIMESTAMP) - julianday(CHECK_IN_TIME)) * 1440 AS INTEGER),
+                    RATING = ?,
+                    FEEDBACK = ?
+                WHERE HISTORY_ID = ? AND CHECK_OUT_TIME IS NULL
+            """, (rating, feedback, history_id))
+        
+            if cursor.rowcount != 1:
+                return jsonify({'success': False, 'message': 'Vé chưa được check-in hoặc đã check-out rồi'}), 400
+        
+            # Update ticket status to 'used'
+            cursor.execute("""
+                UPDATE TICKET SET STATUS = 'used' WHERE TICKET_ID = ?
+            """, (ticket_id,))
         
-        # Update visit history (check-out)
-        cursor.execute("""
-            UPDATE VISIT_HISTORY 
-            SET CHECK_OUT_TIME = CURRENT_TIMESTAMP,
-                RATING = ?,
-                FEEDBACK = ?
-            WHERE HISTORY_ID = ?
-        """, (rating, feedback, history_id))
-        
-        # Update ticket status to 'used'
-        cursor.execute("""
-            UPDATE TICKET SET STATUS = 'used' WHERE TICKET_ID = ?
-        """, (ticket_id,))
+            record_checkout(db, construction_id)
+            publish(db, 'checkout', {
+                'history_id': history_id,
+                'ticket_code': ticket_code,
+                'customer_name': customer_name,
+                'construction_id': construction_id
+            })
         
-        db.commit()
-        db.close()
+        invalidate_response_caches()
         
         logger.info(f"Check-out successful: {ticket_code} - {customer_name}")
         return jsonify({
@@ -2676,6 +2727,8 @@ def api_checkout():
             }
         })
         
+    except WriteQueueFull:
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
     except Exception as e:
         logger.error(f"Check-out error: {str(e)}")
         return jsonify({'success': False, 'message': f'Lỗi check-out: {str(e)}'}), 500
@@ -2699,6 +2752,16 @@ def api_checkout():
 
 # ==================== ORDER MANAGEMENT ROUTES ====================
 
+# api_get_all_orders output keys, in order_list_* column order
+ORDER_LIST_KEYS = (
+    'order_id', 'order_code', 'status', 'quantity', 'total_price',
+    'payment_proof_path', 'transaction_ref', 'created_at', 'updated_at',
+    'customer_id', 'customer_name', 'customer_phone', 'customer_email',
+    'ticket_type', 'unit_price', 'customer_note',
+    'bank_name', 'bank_account', 'bank_account_name',
+    'rejection_reason', 'confirmed_by', 'confirmed_at',
+)
+
 @app.route('/api/admin/orders/list', methods=['GET'])
 @login_required
 @permission_required(['all', 'dashboard'])
@@ -2707,112 +2770,18 @@ def api_get_all_orders():
     try:
         status = request.args.get('status', 'all')
         
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        if status == 'all':
-            query = """
-                SELECT 
-                    o.ORDER_ID,
-                    o.ORDER_CODE,
-                    o.STATUS,
-                    o.QUANTITY,
-                    o.TOTAL_PRICE,
-                    o.PAYMENT_PROOF_PATH,
-                    o.TRANSACTION_REF,
-                    o.CREATED_AT,
-                    o.UPDATED_AT,
-                    c.CUSTOMER_ID,
-                    c.FULLNAME as CUSTOMER_NAME,
-                    c.PHONE as CUSTOMER_PHONE,
-                    c.EMAIL as CUSTOMER_EMAIL,
-                    tt.TYPE_NAME,
-                    tt.PRICE as UNIT_PRICE,
-                    o.CUSTOMER_NOTE,
-                    o.BANK_NAME,
-                    o.BANK_ACCOUNT,
-                    o.BANK_ACCOUNT_NAME,
-                    o.REJECTION_REASON,
-                    u.USERNAME as CONFIRMED_BY_NAME,
-                    o.CONFIRMED_AT
-                FROM "ORDER" o
-                JOIN CUSTOMER c ON o.CUSTOMER_ID = c.CUSTOMER_ID
-                JOIN TICKET_TYPE tt ON o.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
-                LEFT JOIN USER u ON o.CONFIRMED_BY = u.USER_ID
-                ORDER BY o.CREATED_AT DESC
-            """
-        else:
-            query = """
-                SELECT 
-                    o.ORDER_ID,
-                    o.ORDER_CODE,
-                    o.STATUS,
-                    o.QUANTITY,
-                    o.TOTAL_PRICE,
-                    o.PAYMENT_PROOF_PATH,
-                    o.TRANSACTION_REF,
-                    o.CREATED_AT,
-                    o.UPDATED_AT,
-                    c.CUSTOMER_ID,
-                    c.FULLNAME as CUSTOMER_NAME,
-                    c.PHONE as CUSTOMER_PHONE,
-                    c.EMAIL as CUSTOMER_EMAIL,
-                    tt.TYPE_NAME,
-                    tt.PRICE as UNIT_PRICE,
-                    o.CUSTOMER_NOTE,
-                    o.BANK_NAME,
-                    o.BANK_ACCOUNT,
-                    o.BANK_ACCOUNT_NAME,
-                    o.REJECTION_REASON,
-                    u.USERNAME as CONFIRMED_BY_NAME,
-                    o.CONFIRMED_AT
-                FROM "ORDER" o
-                JOIN CUSTOMER c ON o.CUSTOMER_ID = c.CUSTOMER_ID
-                JOIN TICKET_TYPE tt ON o.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
-                LEFT JOIN USER u ON o.CONFIRMED_BY = u.USER_ID
-                WHERE o.STATUS = ?
-                ORDER BY o.CREATED_AT DESC
-            """
+        db = get_read_connection()
         
         if status == 'all':
-            cursor.execute(query)
+            rows = query_all(db, 'order_list_all')
+        elif status == 'waiting_confirmation':
+            rows = query_all(db, 'order_list_waiting')
         else:
-            cursor.execute(query, (status,))
+            rows = query_all(db, 'order_list_by_status', (status,))
         
-        rows = cursor.fetchall()
         db.close()
         
-        orders = []
-        for row in rows:
-            orders.append({
-                'order_id': row[0],
-                'order_code': row[1],
-                'status': row[2],
-                'quantity': row[3],
-                'total_price': row[4],
-                'payment_proof_path': row[5],
-                'transaction_ref': row[6],
-                'created_at': row[7],
-                'updated_at': row[8],
-                'customer_id': row[9],
-                'customer_name': row[10],
-                'customer_phone': row[11],
-                'customer_email': row[12],
-                'ticket_type': row[13],
-                'unit_price': row[14],
-                'customer_note': row[15],
-                'bank_name': row[16],
-                'bank_account': row[17],
-                'bank_account_name': row[18],
-                'rejection_reason': row[19],
-                'confirmed_by': row[20],
-                'confirmed_at': row[21]
-            })
-        
-        return jsonify({
-            'success': True,
-            'data': orders
-        })
+        return json_rows_response(rows, ORDER_LIST_KEYS, envelope={'success': True})
         
     except Exception as e:
         return handle_error(e, "api_get_all_orders")
@@ -2824,88 +2793,67 @@ def api_get_all_orders():
 def api_approve_order(order_id):
     """Approve order and generate tickets"""
     try:
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        # Get order details
-        cursor.execute("""
-            SELECT 
-                o.ORDER_ID,
-                o.ORDER_CODE,
-                o.CUSTOMER_ID,
-                o.TICKET_TYPE_ID,
-                o.QUANTITY,
-                o.UNIT_PRICE,
-                o.TOTAL_PRICE,
-                o.STATUS,
-                c.FULLNAME,
-                c.EMAIL,
-                c.PHONE,
-                tt.TYPE_NAME
-            FROM "ORDER" o
-            JOIN CUSTOMER c ON o.CUSTOMER_ID = c.CUSTOMER_ID
-            JOIN TICKET_TYPE tt ON o.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
-            WHERE o.ORDER_ID = ?
-        """, (order_id,))
-        
-        order = cursor.fetchone()
-        
-        if not order:
-            db.close()
-            return jsonify({
-                'success': False,
-                'message': 'Không tìm thấy đơn hàng'
-            }), 404
+        with write_transaction() as db:
+            cursor = db.cursor()
         
-        if order[7] != 'waiting_confirmation':
-            db.close()
-            return jsonify({
-                'success': False,
-                'message': 'Đơn hàng không ở trạng thái chờ xác nhận'
-            }), 400
+            # Get order details
+            order = query_one(db, 'order_for_review', (order_id,))
         
-        # Update order status
-        cursor.execute("""
-            UPDATE "ORDER"
-            SET STATUS = 'paid',
-                CONFIRMED_BY = ?,
-                CONFIRMED_AT = CURRENT_TIMESTAMP,
-                PAID_AT = CURRENT_TIMESTAMP,
-                UPDATED_AT = CURRENT_TIMESTAMP
-            WHERE ORDER_ID = ?
-        """, (session.get('user_id'), order_id))
+            if not order:
+                return jsonify({
+                    'success': False,
+                    'message': 'Không tìm thấy đơn hàng'
+                }), 404
         
-        # Generate tickets
-        import secrets
-        tickets_generated = []
+            if order[7] != 'waiting_confirmation':
+                return jsonify({
+                    'success': False,
+                    'message': 'Đơn hàng không ở trạng thái chờ xác nhận'
+                }), 400
         
-        for i in range(order[4]):  # quantity
-            ticket_code = f"VE{secrets.token_hex(6).upper()}"
-            
+            # Update order status
             cursor.execute("""
-                INSERT INTO TICKET (
-                    TICKET_CODE, TICKET_TYPE_ID, CUSTOMER_ID, QUANTITY,
-                    TOTAL_PRICE, VALID_DATE, PURCHASE_DATE, STATUS,
-                    PAYMENT_METHOD, ORDER_ID
-                ) VALUES (?, ?, ?, 1, ?, DATE('now', '+30 days'), DATE('now'), 'valid', 'bank_transfer', ?)
-            """, (ticket_code, order[3], order[2], order[5], order_id))
+                UPDATE "ORDER"
+                SET STATUS = 'paid',
+                    CONFIRMED_BY = ?,
+                    CONFIRMED_AT = CURRENT_TIMESTAMP,
+                    PAID_AT = CURRENT_TIMESTAMP,
+                    UPDATED_AT = CURRENT_TIMESTAMP
+                WHERE ORDER_ID = ?
+            """, (session.get('user_id'), order_id))
+        
+            # Generate tickets
+            import secrets
+            tickets_generated = []
+        
+            for i in range(order[4]):  # quantity
+                ticket_code = f"VE{secrets.token_hex(6).upper()}"
             
-            tickets_generated.append(ticket_code)
+                cursor.execute("""
+                    INSERT INTO TICKET (
+                        TICKET_CODE, TICKET_TYPE_ID, CUSTOMER_ID, QUANTITY,
+                        TOTAL_PRICE, VALID_DATE, PURCHASE_DATE, STATUS,
+                        PAYMENT_METHOD, ORDER_ID
+                    ) VALUES (?, ?, ?, 1, ?, DATE('now', '+30 days'), DATE('now'), 'valid', 'bank_transfer', ?)
+                """, (ticket_code, order[3], order[2], order[5], order_id))
+            
+                tickets_generated.append(ticket_code)
         
-        # Log activity
-        cursor.execute("""
-            INSERT INTO USER_ACTIVITY_LOG 
-            (USER_ID, ACTION_TYPE, TARGET_TYPE, TARGET_ID, DESCRIPTION, IP_ADDRESS)
-            VALUES (?, 'order_approved', 'order', ?, ?, ?)
-        """, (
-            session.get('user_id'),
-            order_id,
-            f"Approved order {order[1]}, generated {order[4]} tickets",
-            request.remote_addr
-        ))
+            publish(db, 'order_approved', {
+                'order_id': order_id,
+                'order_code': order[1],
+                'status': 'paid',
+                'tickets': len(tickets_generated)
+            })
         
-        db.commit()
-        db.close()
+        invalidate_response_caches()
+        
+        # Log activity (after commit)
+        log_activity(
+            session.get('user_id'), 'order_approved',
+            f"Approved order {order[1]}, generated {order[4]} tickets",
+            target_type='order', target_id=order_id, ip_address=request.remote_addr
+        )
         
         # Send confirmation email
         if order[9]:  # email
@@ -2930,6 +2878,8 @@ def api_approve_order(order_id):
             }
         })
         
+    except WriteQueueFull:
+        return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
     except Exception as e:
         return handle_error(e, "api_approve_order")
 
@@ -2947,19 +2897,7 @@ def api_reject_order(order_id):
         cursor = db.cursor()
         
         # Get order details
-        cursor.execute("""
-            SELECT 
-                o.ORDER_ID,
-                o.ORDER_CODE,
-                o.STATUS,
-                c.FULLNAME,
-                c.EMAIL
-            FROM "ORDER" o
-            JOIN CUSTOMER c ON o.CUSTOMER_ID = c.CUSTOMER_ID
-            WHERE o.ORDER_ID = ?
-        """, (order_id,))
-        
-        order = cursor.fetchone()
+        order = query_one(db, 'order_for_review', (order_id,))
         
         if not order:
             db.close()
@@ -2968,7 +2906,7 @@ def api_reject_order(order_id):
                 'message': 'Không tìm thấy đơn hàng'
             }), 404
         
-        if order[2] != 'waiting_confirmation':
+        if order['STATUS'] != 'waiting_confirmation':
             db.close()
             return jsonify({
                 'success': False,
@@ -2986,35 +2924,37 @@ def api_reject_order(order_id):
             WHERE ORDER_ID = ?
         """, (rejection_reason, session.get('user_id'), order_id))
         
-        # Log activity
-        cursor.execute("""
-            INSERT INTO USER_ACTIVITY_LOG 
-            (USER_ID, ACTION_TYPE, TARGET_TYPE, TARGET_ID, DESCRIPTION, IP_ADDRESS)
-            VALUES (?, 'order_rejected', 'order', ?, ?, ?)
-        """, (
-            session.get('user_id'),
-            order_id,
-            f"Rejected order {order[1]}: {rejection_reason}",
-            request.remote_addr
-        ))
+        publish(db, 'order_rejected', {
+            'order_id': order_id,
+            'order_code': order['ORDER_CODE'],
+            'status': 'rejected'
+        })
         
         db.commit()
         db.close()
+        invalidate_response_caches()
+        
+        # Log activity (after commit)
+        log_activity(
+            session.get('user_id'), 'order_rejected',
+            f"Rejected order {order['ORDER_CODE']}: {rejection_reason}",
+            target_type='order', target_id=order_id, ip_address=request.remote_addr
+        )
         
         # Send rejection email
-        if order[4]:  # email
+        if order['EMAIL']:  # email
             try:
                 from email_service import EmailService
                 EmailService.send_payment_rejection(
-                    order[4],  # email
-                    order[3],  # fullname
-                    order[1],  # order_code
+                    order['EMAIL'],  # email
+                    order['FULLNAME'],  # fullname
+                    order['ORDER_CODE'],  # order_code
                     rejection_reason
                 )
             except Exception as e:
                 logger.error(f"Failed to send rejection email: {e}")
         
-        logger.info(f"Order {order[1]} rejected by {session.get('username')}")
+        logger.info(f"Order {order['ORDER_CODE']} rejected by {session.get('username')}")
         
         return jsonify({
             'success': True,
@@ -3025,13 +2965,10 @@ def api_reject_order(order_id):
         return handle_error(e, "api_reject_order")
 
 
-@app.route('/api/admin/orders/statistics', methods=['GET'])
-@login_required
-@permission_required(['all', 'dashboard'])
-def api_get_order_statistics():
-    """Get order statistics for dashboard"""
+def _load_order_statistics():
+    """Order statistics payload (served through order_statistics_cache)"""
+    db = get_read_connection()
     try:
-        db = get_db_connection()
         cursor = db.cursor()
         
         # Get counts by status
@@ -3051,23 +2988,12 @@ def api_get_order_statistics():
                 'total_amount': row[2] or 0
             }
         
-        # Get today's orders
-        cursor.execute("""
-            SELECT COUNT(*), SUM(TOTAL_PRICE)
-            FROM "ORDER"
-            WHERE DATE(CREATED_AT) = DATE('now')
-        """)
-        
-        today = cursor.fetchone()
-        
-        # Get this month's orders
-        cursor.execute("""
-            SELECT COUNT(*), SUM(TOTAL_PRICE)
-            FROM "ORDER"
-            WHERE strftime('%Y-%m', CREATED_AT) = strftime('%Y-%m', 'now')
-        """)
-        
-        this_month = cursor.fetchone()
+        # Today's / this month's orders, from the REVENUE_DAILY rollup (UTC days)
+        today_date = datetime.now(timezone.utc).date()
+        month_start = today_date.replace(day=1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        today = orders_between(db, today_date.isoformat(), (today_date + timedelta(days=1)).isoformat())
+        this_month = orders_between(db, month_start.isoformat(), next_month.isoformat())
         
         # Get pending count
         cursor.execute("""
@@ -3077,25 +3003,33 @@ def api_get_order_statistics():
         """)
         
         pending_count = cursor.fetchone()[0]
-        
+    finally:
         db.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'by_status': status_stats,
-                'today': {
-                    'count': today[0] or 0,
-                    'total_amount': today[1] or 0
-                },
-                'this_month': {
-                    'count': this_month[0] or 0,
-                    'total_amount': this_month[1] or 0
-                },
-                'pending_count': pending_count
-            }
-        })
-        
+    
+    return {
+        'by_status': status_stats,
+        'today': {
+            'count': today[0] or 0,
+            'total_amount': today[1] or 0
+        },
+        'this_month': {
+            'count': this_month[0] or 0,
+            'total_amount': this_month[1] or 0
+        },
+        'pending_count': pending_count
+    }
+
+
+order_statistics_cache = response_cache('order_statistics', _load_order_statistics, version=latest_event_id)
+
+
+@app.route('/api/admin/orders/statistics', methods=['GET'])
+@login_required
+@permission_required(['all', 'dashboard'])
+def api_get_order_statistics():
+    """Get order statistics for dashboard (cached, see response_cache.py)"""
+    try:
+        return order_statistics_cache.response()
     except Exception as e:
         return handle_error(e, "api_get_order_statistics")
 
@@ -3106,7 +3040,7 @@ def api_admin_reject_order(order_id):
     """Reject order with reason"""
     try:
         # Check permission
-        if session.get('role') not in ['admin', 'manager']:
+        if not has_permission(session['user_id'], ['all', 'dashboard']):
             return jsonify({'success': False, 'message': 'Không có quyền từ chối đơn'}), 403
         
         data = request.get_json()
@@ -3137,8 +3071,11 @@ def api_admin_reject_order(order_id):
             WHERE ORDER_ID = ?
         """, (reason, session.get('user_id'), order_id))
         
+        publish(db, 'order_rejected', {'order_id': order_id, 'status': 'rejected'})
+        
         db.commit()
         db.close()
+        invalidate_response_caches()
         
         return jsonify({
             'success': True,
@@ -3160,10 +3097,10 @@ def api_admin_reject_order(order_id):
 @app.route('/api/admin/users', methods=['GET'])
 @login_required
 def api_get_admin_users():
-    """Get users list with online status based on LAST_LOGIN"""
+    """Get users list with online status from USER_PRESENCE"""
     try:
         # Check permission
-        if 'all' not in session.get('permissions', []):
+        if not has_permission(session['user_id'], 'all'):
             return jsonify({'success': False, 'message': 'Khong co quyen'}), 403
         
         user_type = request.args.get('user_type', 'internal')
@@ -3171,8 +3108,8 @@ def api_get_admin_users():
         db = get_db_connection()
         cursor = db.cursor()
         
-        # Get users with online status (last login within 30 minutes)
-        query = """
+        # Get users with online status (seen within the presence window)
+        query = f"""
             SELECT 
                 u.USER_ID,
                 u.USERNAME,
@@ -3185,19 +3122,19 @@ def api_get_admin_users():
                 r.ROLE_NAME,
                 u.LAST_LOGIN,
                 CASE 
-                    WHEN u.LAST_LOGIN IS NOT NULL 
-                    AND datetime(u.LAST_LOGIN) > datetime('now', '-30 minutes')
+                    WHEN {online_condition('p')}
                     THEN 1
                     ELSE 0
                 END as IS_ONLINE
             FROM USER u
             LEFT JOIN USER_ROLE ur ON u.USER_ID = ur.USER_ID
             LEFT JOIN ROLE r ON ur.ROLE_ID = r.ROLE_ID
+            LEFT JOIN USER_PRESENCE p ON p.USER_ID = u.USER_ID
             WHERE u.USER_TYPE = ?
             ORDER BY u.USER_ID
         """
         
-        cursor.execute(query, (user_type,))
+        cursor.execute(query, (online_cutoff(), user_type))
         
         users = []
         for row in cursor.fetchall():
@@ -3235,7 +3172,7 @@ def api_toggle_user_active(user_id):
     """Toggle user active status"""
     try:
         # Check permission
-        if 'all' not in session.get('permissions', []):
+        if not has_permission(session['user_id'], 'all'):
             return jsonify({'success': False, 'message': 'Khong co quyen'}), 403
         
         # Cannot deactivate yourself
@@ -3268,6 +3205,7 @@ def api_toggle_user_active(user_id):
         
         db.commit()
         db.close()
+        invalidate_user(user_id)
         
         action = 'kich hoat' if new_status == 1 else 'vo hieu hoa'
         logger.info(f"User {session.get('username')} {action} user {username}")
@@ -3283,6 +3221,32 @@ def api_toggle_user_active(user_id):
         return jsonify({'success': False, 'message': f'Loi: {str(e)}'}), 500
 
 
+# ==================== METRICS ====================
+
+@app.route('/api/admin/metrics', methods=['GET'])
+@permission_required('all')
+def api_get_metrics():
+    """Runtime metrics for this worker process"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'db_pool': get_pool_stats(),
+            'db_writes': get_write_stats(),
+            'museum_data_snapshot': get_snapshot_stats(),
+            'queries': get_query_stats(),
+            'sessions': get_session_cache_stats(),
+            'authz': get_authz_stats(),
+            'password_hashing': get_password_hash_stats(),
+            'rate_limits': get_rate_limit_stats(),
+            'maintenance': get_maintenance_stats(),
+            'response_cache': get_response_cache_stats(),
+            'event_stream': get_event_stream_stats(),
+            'occupancy': get_occupancy_stats(),
+            'write_behind': get_write_behind_stats()
+        }
+    })
+
+
 # ==================== RUN APP ====================
 if __name__ == '__main__':
     logger.info("Starting Museum Backend Server...")
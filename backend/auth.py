@@ -6,10 +6,13 @@ Museum Management System
 import hashlib
 import secrets
 import re
+import sqlite3
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import session, jsonify, request
-from werkzeug.security import generate_password_hash, check_password_hash
+
+import authz
+import password_hashing
 
 class AuthManager:
     """Handle authentication and authorization"""
@@ -39,13 +42,13 @@ class AuthManager:
     
     @staticmethod
     def hash_password(password):
-        """Hash password using werkzeug (scrypt) - compatible with app.py login"""
-        return generate_password_hash(password)
+        """Hash password using werkzeug (scrypt) in the hashing pool - compatible with app.py login"""
+        return password_hashing.hash_password(password)
     
     @staticmethod
     def verify_password(password, hashed_password):
-        """Verify password against hash using werkzeug"""
-        return check_password_hash(hashed_password, password)
+        """Verify password against hash using werkzeug, in the hashing pool"""
+        return password_hashing.check_password(hashed_password, password)
     
     @staticmethod
     def generate_reset_token():
@@ -71,6 +74,30 @@ class AuthManager:
         pattern = r'^(0|\+84)[0-9]{9,10}$'
         return re.match(pattern, phone) is not None
     
+    @staticmethod
+    def normalize_phone(phone):
+        """Canonical phone form stored in CUSTOMER/USER: digits only, +84 -> 0"""
+        phone = re.sub(r'[\s.\-()]', '', phone or '')
+        if phone.startswith('+84'):
+            phone = '0' + phone[3:]
+        return phone
+    
+    # UNIQUE constraints behind registration -> user-facing message
+    UNIQUE_MESSAGES = {
+        'USER.USERNAME': "Tên đăng nhập đã tồn tại",
+        'USER.EMAIL': "Email đã được sử dụng",
+        'CUSTOMER.PHONE': "Số điện thoại đã được đăng ký",
+    }
+    
+    @staticmethod
+    def integrity_message(error):
+        """Message for a UNIQUE violation (sqlite3.IntegrityError), or None"""
+        text = str(error)
+        for constraint, message in AuthManager.UNIQUE_MESSAGES.items():
+            if constraint in text:
+                return message
+        return None
+    
     @staticmethod
     def get_user_role(db, user_id):
         """Get user's role name"""
@@ -133,6 +160,7 @@ class AuthManager:
         # Verify password
         if not AuthManager.verify_password(password, hashed_pwd):
             return None, "Tên đăng nhập hoặc mật khẩu không đúng"
+        password_hashing.rehash_if_needed(user_id, hashed_pwd, password)
         
         # Get role
         role_name, permissions = AuthManager.get_user_role(db, user_id)
@@ -163,62 +191,55 @@ class AuthManager:
         return session_data, None
     
     @staticmethod
-    def register_customer(db, username, password, fullname, phone, email):
-        """Register new customer account"""
-        cursor = db.cursor()
-        
-        # Validate inputs
-        if not username or not password or not fullname or not phone:
-            return None, "Vui lòng điền đầy đủ thông tin"
+    def validate_registration(username, password, fullname, phone, email, require_password=True):
+        """Error message for registration input, or None"""
+        if not username or (require_password and not password) or not fullname or not phone:
+            return "Vui lòng điền đầy đủ thông tin"
         
         # Validate email if provided
         if email and not AuthManager.validate_email(email):
-            return None, "Email không hợp lệ"
+            return "Email không hợp lệ"
         
         # Validate password
-        is_valid, message = AuthManager.validate_password(password)
-        if not is_valid:
-            return None, message
+        if password:
+            is_valid, message = AuthManager.validate_password(password)
+            if not is_valid:
+                return message
         
         # Validate phone
         if not AuthManager.validate_phone(phone):
-            return None, "Số điện thoại không hợp lệ"
+            return "Số điện thoại không hợp lệ"
         
-        # Check if username exists
-        cursor.execute("""
-            SELECT USER_ID FROM USER WHERE USERNAME = ?
-        """, (username,))
-        if cursor.fetchone():
-            return None, "Tên đăng nhập đã tồn tại"
+        return None
+    
+    @staticmethod
+    def register_customer(db, username, password, fullname, phone, email):
+        """Register new customer account
         
-        # Check if email exists
-        if email:
-            cursor.execute("""
-                SELECT USER_ID FROM USER WHERE EMAIL = ?
-            """, (email,))
-            if cursor.fetchone():
-                return None, "Email đã được sử dụng"
+        USER, CUSTOMER and USER_ROLE rows go in one transaction; duplicate
+        username, email or phone is caught by the UNIQUE indexes
+        (migrations/add_registration_unique_indexes.sql), not by pre-check SELECTs.
+        """
+        cursor = db.cursor()
+        phone = AuthManager.normalize_phone(phone)
+        email = (email or '').strip()
         
-        # Check if phone exists
-        cursor.execute("""
-            SELECT CUSTOMER_ID FROM CUSTOMER WHERE PHONE = ?
-        """, (phone,))
-        if cursor.fetchone():
-            return None, "Số điện thoại đã được đăng ký"
+        error = AuthManager.validate_registration(username, password, fullname, phone, email)
+        if error:
+            return None, error
+        
+        # Hash before writing (HashingBusy propagates to the route)
+        hashed_pwd = AuthManager.hash_password(password)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         try:
             # Create user account
-            hashed_pwd = AuthManager.hash_password(password)
             cursor.execute("""
                 INSERT INTO USER (
                     USERNAME, PASSWORD, EMAIL, FULLNAME, PHONE,
                     USER_TYPE, IS_ACTIVE, CREATED_AT, UPDATED_AT
                 ) VALUES (?, ?, ?, ?, ?, 'customer', 1, ?, ?)
-            """, (
-                username, hashed_pwd, email, fullname, phone,
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ))
+            """, (username, hashed_pwd, email, fullname, phone, now, now))
             
             user_id = cursor.lastrowid
             
@@ -228,26 +249,152 @@ class AuthManager:
                     FULLNAME, PHONE, EMAIL, USER_ID,
                     CREATED_AT, UPDATED_AT
                 ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                fullname, phone, email, user_id,
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ))
+            """, (fullname, phone, email, user_id, now, now))
             
             # Assign Customer role (ROLE_ID = 6)
             cursor.execute("""
                 INSERT INTO USER_ROLE (USER_ID, ROLE_ID, ASSIGNED_AT)
                 VALUES (?, 6, ?)
-            """, (user_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            """, (user_id, now))
             
             db.commit()
             
             return user_id, None
             
+        except sqlite3.IntegrityError as e:
+            db.rollback()
+            message = AuthManager.integrity_message(e)
+            if message:
+                return None, message
+            return None, f"Lỗi khi tạo tài khoản: {str(e)}"
         except Exception as e:
             db.rollback()
             return None, f"Lỗi khi tạo tài khoản: {str(e)}"
     
+    # Imported accounts without a password get one nobody can match; they
+    # sign in after "forgot password"
+    UNUSABLE_PASSWORD = '!'
+    
+    @staticmethod
+    def prepare_import(accounts):
+        """Validate and normalize bulk-import rows: (rows, errors)
+        
+        rows: dicts with row (1-based), username, password or password_hash
+        (werkzeug or legacy MD5, upgraded on first login), fullname, phone, email;
+        errors: {'row', 'username', 'message'} for rows rejected up front
+        """
+        rows, errors = [], []
+        seen = {'username': set(), 'email': set(), 'phone': set()}
+        duplicate_messages = {
+            'username': "Tên đăng nhập đã tồn tại",
+            'email': "Email đã được sử dụng",
+            'phone': "Số điện thoại đã được đăng ký",
+        }
+        for number, account in enumerate(accounts, start=1):
+            row = {
+                'row': number,
+                'username': (account.get('username') or '').strip(),
+                'password': account.get('password') or '',
+                'password_hash': (account.get('password_hash') or '').strip(),
+                'fullname': (account.get('fullname') or '').strip(),
+                'phone': AuthManager.normalize_phone(account.get('phone')),
+                'email': (account.get('email') or '').strip(),
+            }
+            # Password is optional here (or given as an existing hash); the
+            # rest follows register_customer
+            error = AuthManager.validate_registration(
+                row['username'], row['password'], row['fullname'], row['phone'], row['email'],
+                require_password=False)
+            if not error and row['password_hash'] and password_hashing.hash_scheme(row['password_hash']) == 'unknown':
+                error = "Mã băm mật khẩu không hợp lệ"
+
+            if not error:
+                for field in ('username', 'email', 'phone'):
+                    if row[field] and row[field] in seen[field]:
+                        error = duplicate_messages[field]
+                        break
+            if error:
+                errors.append({'row': number, 'username': row['username'], 'message': error})
+                continue
+            for field in ('username', 'email', 'phone'):
+                if row[field]:
+                    seen[field].add(row[field])
+            rows.append(row)
+        return rows, errors
+    
+    @staticmethod
+    def import_customers(db, rows):
+        """Create customer accounts for prepared rows in the caller's transaction
+        
+        rows carry 'hash' (the hashed password). Rows are staged with
+        executemany; those clashing with existing accounts are skipped with the
+        registration message, the rest become USER, CUSTOMER and USER_ROLE
+        rows through three set-based inserts. Returns (created, skipped).
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        db.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS import_account (
+                ROW_NO INTEGER PRIMARY KEY, USERNAME TEXT, PASSWORD TEXT,
+                FULLNAME TEXT, PHONE TEXT, EMAIL TEXT
+            )
+        """)
+        try:
+            db.execute("DELETE FROM temp.import_account")
+            db.executemany("""
+                INSERT INTO temp.import_account (ROW_NO, USERNAME, PASSWORD, FULLNAME, PHONE, EMAIL)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(r['row'], r['username'], r['hash'], r['fullname'], r['phone'], r['email'])
+                  for r in rows])
+            
+            # Rows that would violate a UNIQUE index
+            conflicts = db.execute("""
+                SELECT i.ROW_NO, i.USERNAME, 'USER.USERNAME'
+                FROM temp.import_account i JOIN USER u ON u.USERNAME = i.USERNAME
+                UNION ALL
+                SELECT i.ROW_NO, i.USERNAME, 'USER.EMAIL'
+                FROM temp.import_account i JOIN USER u ON u.EMAIL = i.EMAIL
+                WHERE i.EMAIL <> ''
+                UNION ALL
+                SELECT i.ROW_NO, i.USERNAME, 'CUSTOMER.PHONE'
+                FROM temp.import_account i JOIN CUSTOMER c ON c.PHONE = i.PHONE
+            """).fetchall()
+            skipped = {}
+            for row_no, username, constraint in conflicts:
+                skipped.setdefault(row_no, {
+                    'row': row_no,
+                    'username': username,
+                    'message': AuthManager.UNIQUE_MESSAGES[constraint]
+                })
+            db.executemany("DELETE FROM temp.import_account WHERE ROW_NO = ?",
+                           [(row_no,) for row_no in skipped])
+            
+            created = db.execute("""
+                INSERT INTO USER (
+                    USERNAME, PASSWORD, EMAIL, FULLNAME, PHONE,
+                    USER_TYPE, IS_ACTIVE, CREATED_AT, UPDATED_AT
+                )
+                SELECT USERNAME, PASSWORD, EMAIL, FULLNAME, PHONE, 'customer', 1, ?, ?
+                FROM temp.import_account ORDER BY ROW_NO
+            """, (now, now)).rowcount
+            
+            db.execute("""
+                INSERT INTO CUSTOMER (FULLNAME, PHONE, EMAIL, USER_ID, CREATED_AT, UPDATED_AT)
+                SELECT i.FULLNAME, i.PHONE, i.EMAIL, u.USER_ID, ?, ?
+                FROM temp.import_account i JOIN USER u ON u.USERNAME = i.USERNAME
+                ORDER BY i.ROW_NO
+            """, (now, now))
+            
+            # Customer role (ROLE_ID = 6)
+            db.execute("""
+                INSERT INTO USER_ROLE (USER_ID, ROLE_ID, ASSIGNED_AT)
+                SELECT u.USER_ID, 6, ?
+                FROM temp.import_account i JOIN USER u ON u.USERNAME = i.USERNAME
+            """, (now,))
+        finally:
+            db.execute("DELETE FROM temp.import_account")
+        
+        return created, sorted(skipped.values(), key=lambda item: item['row'])
+    
     @staticmethod
     def create_password_reset_token(db, email):
         """Create password reset token and return token"""
@@ -320,9 +467,10 @@ class AuthManager:
         if datetime.strptime(expires_at, '%Y-%m-%d %H:%M:%S') < datetime.now():
             return False, "Token đã hết hạn"
         
+        hashed_pwd = AuthManager.hash_password(new_password)
+        
         try:
             # Update password ONLY - Do NOT touch EMAIL or PHONE
-            hashed_pwd = AuthManager.hash_password(new_password)
             cursor.execute("""
                 UPDATE USER 
                 SET PASSWORD = ?, UPDATED_AT = ?
@@ -374,9 +522,10 @@ class AuthManager:
         if not AuthManager.verify_password(old_password, current_hashed):
             return False, "Mật khẩu cũ không đúng"
         
+        new_hashed = AuthManager.hash_password(new_password)
+        
         try:
             # Update password ONLY
-            new_hashed = AuthManager.hash_password(new_password)
             cursor.execute("""
                 UPDATE USER 
                 SET PASSWORD = ?, UPDATED_AT = ?
@@ -408,15 +557,14 @@ def login_required(f):
 
 
 def permission_required(permission):
-    """Require specific permission"""
+    """Require specific permission (or any of a list of permissions)"""
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if 'user_id' not in session:
                 return jsonify({'error': 'Unauthorized'}), 401
             
-            role = session.get('role')
-            if not AuthManager.has_permission(role, permission):
+            if not authz.has_permission(session['user_id'], permission):
                 return jsonify({'error': 'Forbidden', 'message': 'Bạn không có quyền truy cập'}), 403
             
             return f(*args, **kwargs)
@@ -432,7 +580,7 @@ def role_required(allowed_roles):
             if 'user_id' not in session:
                 return jsonify({'error': 'Unauthorized'}), 401
             
-            role = session.get('role')
+            role = authz.get_role(session['user_id'])
             if role not in allowed_roles:
                 return jsonify({'error': 'Forbidden', 'message': 'Bạn không có quyền truy cập'}), 403
             
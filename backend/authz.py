@@ -0,0 +1,85 @@
+"""
+Authorization Cache Module
+Museum Management System
+
+Resolves user_id -> (role name, frozenset of permissions) once per worker
+and answers permission checks from memory. Permissions are the role's
+ROLE.PERMISSIONS plus the AuthManager.ROLE_PERMISSIONS defaults for that
+role. Entries follow the user's generation (invalidation.py), so
+invalidate_user() after a role, profile or active-state change drops
+them in every worker.
+"""
+
+import threading
+
+from database import get_read_connection
+from invalidation import user_generation
+from queries import query_one
+
+AUTHZ_CACHE_SIZE = 4096
+
+NO_ACCESS = (None, frozenset())
+
+_lock = threading.Lock()
+_entries = {}                    # user_id -> (role, permissions, generation)
+_stats = {'hits': 0, 'misses': 0, 'stale': 0}
+
+
+def _load(user_id):
+    from auth import AuthManager          # auth imports this module
+
+    db = get_read_connection()
+    try:
+        row = query_one(db, 'user_role_permissions', (user_id,))
+    finally:
+        db.close()
+    if row is None:
+        return NO_ACCESS
+    role = row['ROLE_NAME']
+    permissions = set(AuthManager.ROLE_PERMISSIONS.get(role, ()))
+    if row['PERMISSIONS']:
+        permissions.update(p.strip() for p in row['PERMISSIONS'].split(',') if p.strip())
+    return role, frozenset(permissions)
+
+
+def get_authz(user_id):
+    """(role name, frozenset of permissions) for user_id"""
+    generation = user_generation(user_id)
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is not None and entry[2] == generation:
+            _stats['hits'] += 1
+            return entry[0], entry[1]
+        _stats['stale' if entry is not None else 'misses'] += 1
+
+    role, permissions = _load(user_id)
+    with _lock:
+        _entries.pop(user_id, None)
+        _entries[user_id] = (role, permissions, generation)
+        while len(_entries) > AUTHZ_CACHE_SIZE:
+            del _entries[next(iter(_entries))]
+    return role, permissions
+
+
+def get_role(user_id):
+    return get_authz(user_id)[0]
+
+
+def has_permission(user_id, required):
+    """True if the user holds 'all', the permission, or any of a list of them"""
+    permissions = get_authz(user_id)[1]
+    if 'all' in permissions:
+        return True
+    if isinstance(required, str):
+        return required in permissions
+    return not permissions.isdisjoint(required)
+
+
+def get_authz_stats():
+    """Authorization cache counters for this worker"""
+    with _lock:
+        stats = dict(_stats)
+        stats['size'] = len(_entries)
+    lookups = stats['hits'] + stats['misses'] + stats['stale']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+    return stats
@@ -0,0 +1,193 @@
+"""
+Partial Index Benchmark
+Museum Management System
+
+Times the open-visit / waiting-order / valid-ticket queries on a synthetic
+history (schema copied from the museum database) with the original
+indexes, with the full-column indexes from the earlier migrations, and
+after migrations/add_partial_indexes.sql; also reports index sizes.
+
+Usage: python bench_partial_indexes.py [visits] [repeats]
+"""
+
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from queries import QUERIES
+
+DB_PATH = Path(__file__).parent.parent / 'data' / 'museum_bennharong.db'
+MIGRATIONS_DIR = Path(__file__).parent.parent / 'migrations'
+
+TABLES = ('USER', 'ROLE', 'USER_ROLE', 'CUSTOMER', 'TICKET_TYPE', 'TICKET', 'VISIT_HISTORY',
+          'ORDER', 'PAYMENT_LOG')
+
+STAGES = (
+    ('schema', ()),
+    ('full idx', ('add_advised_indexes.sql', 'add_reporting_range_indexes.sql')),
+    ('partial', ('add_partial_indexes.sql',)),
+)
+
+OPEN_VISITS = 60
+WAITING_ORDERS = 25
+
+BENCH_QUERIES = {
+    'active visits': ("""
+        SELECT vh.HISTORY_ID, vh.CHECK_IN_TIME,
+               c.FULLNAME, c.PHONE, t.TICKET_CODE, u.FULLNAME
+        FROM VISIT_HISTORY vh
+        JOIN CUSTOMER c ON vh.CUSTOMER_ID = c.CUSTOMER_ID
+        LEFT JOIN TICKET t ON vh.TICKET_ID = t.TICKET_ID
+        LEFT JOIN USER u ON vh.GUIDE_ID = u.USER_ID
+        WHERE vh.CHECK_OUT_TIME IS NULL
+        ORDER BY vh.CHECK_IN_TIME DESC
+        LIMIT 50
+    """, ()),
+    'active checkout': ("""
+        SELECT c.CUSTOMER_ID, c.FULLNAME, c.PHONE,
+               GROUP_CONCAT(t.TICKET_CODE, ', '), COUNT(DISTINCT vh.HISTORY_ID),
+               MIN(vh.CHECK_IN_TIME), u.FULLNAME
+        FROM VISIT_HISTORY vh
+        JOIN CUSTOMER c ON vh.CUSTOMER_ID = c.CUSTOMER_ID
+        JOIN TICKET t ON vh.TICKET_ID = t.TICKET_ID
+        LEFT JOIN USER u ON vh.GUIDE_ID = u.USER_ID
+        WHERE vh.CHECK_OUT_TIME IS NULL
+        GROUP BY c.CUSTOMER_ID, c.FULLNAME, c.PHONE, u.FULLNAME
+        ORDER BY MIN(vh.CHECK_IN_TIME) DESC
+    """, ()),
+    'checkin available': ("""
+        SELECT c.CUSTOMER_ID, c.FULLNAME, c.PHONE,
+               GROUP_CONCAT(t.TICKET_CODE, ', '), COUNT(t.TICKET_ID),
+               SUM(t.QUANTITY), MAX(t.VALID_DATE)
+        FROM TICKET t
+        JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
+        WHERE t.STATUS = 'valid'
+        AND NOT EXISTS (
+            SELECT 1 FROM VISIT_HISTORY vh
+            WHERE vh.TICKET_ID = t.TICKET_ID AND vh.CHECK_OUT_TIME IS NULL
+        )
+        GROUP BY c.CUSTOMER_ID, c.FULLNAME, c.PHONE
+        ORDER BY c.FULLNAME
+    """, ()),
+    'open visit by ticket': (QUERIES['open_visit_by_ticket'], None),
+    'waiting orders': (QUERIES['order_list_waiting'], ()),
+    'waiting count': ("""
+        SELECT COUNT(*) FROM "ORDER" WHERE STATUS = 'waiting_confirmation'
+    """, ()),
+}
+
+
+def build_db(visits):
+    source = sqlite3.connect(f"{DB_PATH.resolve().as_uri()}?mode=ro", uri=True)
+    db = sqlite3.connect(':memory:')
+    for table in TABLES:
+        for (sql,) in source.execute(
+                "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL "
+                "AND type IN ('table', 'index')", (table,)):
+            db.execute(sql)
+    source.close()
+
+    rng = random.Random(42)
+    customers = max(visits // 4, 100)
+    db.executemany("INSERT INTO USER (USER_ID, USERNAME, PASSWORD, FULLNAME, USER_TYPE) "
+                   "VALUES (?, ?, 'x', ?, 'staff')",
+                   [(i, f"guide{i}", f"Hướng dẫn viên {i}") for i in range(1, 21)])
+    db.executemany("INSERT INTO CUSTOMER (CUSTOMER_ID, FULLNAME, PHONE) VALUES (?, ?, ?)",
+                   [(i, f"Khách {i}", f"09{i:08d}") for i in range(1, customers + 1)])
+    db.executemany("INSERT INTO TICKET_TYPE (TICKET_TYPE_ID, TYPE_NAME, PRICE) VALUES (?, ?, ?)",
+                   [(1, 'Vé người lớn', 40000), (2, 'Vé trẻ em', 20000)])
+
+    # One ticket per visit; the newest OPEN_VISITS visits are still open and
+    # ~1% of tickets have never been used
+    tickets = visits + visits // 100
+    db.executemany(
+        "INSERT INTO TICKET (TICKET_ID, TICKET_CODE, CUSTOMER_ID, TICKET_TYPE_ID, QUANTITY, "
+        "TOTAL_PRICE, PURCHASE_DATE, VALID_DATE, STATUS) VALUES (?, ?, ?, ?, 1, 40000, ?, ?, ?)",
+        [(i, f"MT{i:08d}", rng.randint(1, customers), 1 + i % 2,
+          f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}", f"2025-{1 + i % 12:02d}-28",
+          'checked_out' if i <= visits - OPEN_VISITS else 'valid')
+         for i in range(1, tickets + 1)])
+    db.executemany(
+        "INSERT INTO VISIT_HISTORY (HISTORY_ID, TICKET_ID, CUSTOMER_ID, GUIDE_ID, "
+        "CHECK_IN_TIME, CHECK_OUT_TIME) VALUES (?, ?, ?, ?, ?, ?)",
+        [(i, i, rng.randint(1, customers), 1 + i % 20,
+          f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} 09:00:00",
+          None if i > visits - OPEN_VISITS else f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} 10:30:00")
+         for i in range(1, visits + 1)])
+
+    orders = max(visits // 4, 100)
+    db.executemany(
+        'INSERT INTO "ORDER" (ORDER_ID, ORDER_CODE, CUSTOMER_ID, TICKET_TYPE_ID, QUANTITY, '
+        'UNIT_PRICE, TOTAL_PRICE, STATUS, CREATED_AT) VALUES (?, ?, ?, 1, 1, 40000, 40000, ?, ?)',
+        [(i, f"MT{i:06d}DEAD", rng.randint(1, customers),
+          'waiting_confirmation' if i > orders - WAITING_ORDERS else rng.choice(('paid', 'cancelled', 'rejected')),
+          f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} 08:00:00")
+         for i in range(1, orders + 1)])
+    db.commit()
+    return db
+
+
+def apply(db, migrations):
+    for name in migrations:
+        db.executescript((MIGRATIONS_DIR / name).read_text(encoding='utf-8'))
+    db.execute("ANALYZE")
+
+
+def index_pages(db):
+    """Pages used by the VISIT_HISTORY / ORDER / TICKET indexes"""
+    return dict(db.execute("""
+        SELECT m.name, COUNT(*) FROM dbstat d JOIN sqlite_master m ON d.name = m.name
+        WHERE m.type = 'index' AND m.tbl_name IN ('VISIT_HISTORY', 'ORDER', 'TICKET')
+        GROUP BY m.name
+    """).fetchall())
+
+
+def run(db, repeats):
+    results = {}
+    for name, (sql, params) in BENCH_QUERIES.items():
+        if params is None:
+            params = (db.execute("SELECT MAX(TICKET_ID) FROM VISIT_HISTORY").fetchone()[0],)
+        plan = ' / '.join(r[3] for r in db.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            rows = db.execute(sql, params).fetchall()
+            times.append((time.perf_counter() - start) * 1000)
+        results[name] = (statistics.median(times), len(rows), plan)
+    return results
+
+
+def main():
+    visits = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    db = build_db(visits)
+    results = {}
+    for stage, migrations in STAGES:
+        apply(db, migrations)
+        results[stage] = run(db, repeats)
+    pages = index_pages(db)
+
+    print(f"{visits} visits ({OPEN_VISITS} open), median ms of {repeats} runs")
+    print(f"{'query':<22}" + ''.join(f"{stage:>11}" for stage, _ in STAGES) + f"{'rows':>7}")
+    for name in BENCH_QUERIES:
+        rows = {results[stage][name][1] for stage, _ in STAGES}
+        assert len(rows) == 1, f"{name}: row count changed"
+        print(f"{name:<22}" + ''.join(f"{results[stage][name][0]:>11.2f}" for stage, _ in STAGES)
+              + f"{rows.pop():>7}")
+    print()
+    print("index pages after migration:")
+    for name, count in sorted(pages.items()):
+        print(f"  {name:<46}{count:>8}")
+    print()
+    for name in BENCH_QUERIES:
+        print(f"{name}:")
+        for stage, _ in STAGES:
+            print(f"  {stage:<9} {results[stage][name][2]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Password Hash Benchmark
+Museum Management System
+
+Calibrates PASSWORD_HASH_METHOD for this machine: times werkzeug scrypt
+at increasing cost N (r=8, p=1) and recommends the largest N whose median
+hash time stays under the target. Then pushes a burst of verifications
+through the hashing pool at that cost to show throughput and queueing.
+
+Usage: python bench_password_hash.py [target_ms] [samples] [workers]
+"""
+
+import statistics
+import sys
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+import password_hashing
+from password_hashing import HashingPool, HashingBusy
+
+COSTS = tuple(2 ** n for n in range(12, 19))     # 4096 .. 262144
+SCRYPT_R = 8
+SCRYPT_P = 1
+PASSWORD = 'benchmark-password-123'
+
+
+def method_for(n):
+    return f'scrypt:{n}:{SCRYPT_R}:{SCRYPT_P}'
+
+
+def time_hash(method, samples):
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        generate_password_hash(PASSWORD, method=method)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def calibrate(target_ms, samples):
+    print(f"{'N':>8} {'memory':>8} {'median ms':>10}")
+    chosen = COSTS[0]
+    for n in COSTS:
+        ms = time_hash(method_for(n), samples)
+        memory_mb = 128 * n * SCRYPT_R / (1024 * 1024)
+        print(f"{n:>8} {memory_mb:>6.0f}MB {ms:>10.1f}")
+        if ms > target_ms:
+            break
+        chosen = n
+    return method_for(chosen)
+
+
+def burst(method, workers, requests):
+    """requests concurrent verifications through a pool of workers"""
+    pool = HashingPool(workers=workers, queue_limit=requests, method=method)
+    pwhash = generate_password_hash(PASSWORD, method=method)
+    pool.run(password_hashing._check, pwhash, PASSWORD)           # start the processes
+    latencies = []
+    rejected = [0]
+    lock = threading.Lock()
+
+    def one():
+        start = time.perf_counter()
+        try:
+            pool.run(password_hashing._check, pwhash, PASSWORD)
+        except HashingBusy:
+            with lock:
+                rejected[0] += 1
+            return
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=one) for _ in range(requests)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()
+    print(f"  {requests} verifications, {workers} workers: {elapsed:.2f}s, "
+          f"{len(latencies) / elapsed:.1f}/s, p50 {statistics.median(latencies):.1f} ms, "
+          f"max {max(latencies):.1f} ms, peak in flight {stats['peak_in_flight']}, "
+          f"rejected {rejected[0]}")
+
+
+def main():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 100.0
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else password_hashing.PASSWORD_HASH_WORKERS
+
+    print(f"Calibrating scrypt to {target_ms:.0f} ms per hash ({samples} samples per cost)")
+    method = calibrate(target_ms, samples)
+    print(f"\nRecommended: app.config['PASSWORD_HASH_METHOD'] = '{method}'\n")
+
+    print(f"Hashing pool at {method}")
+    burst(method, workers, workers * 8)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Row Encoder Benchmark
+Museum Management System
+
+Compares the old list-endpoint path (fetchall -> dict per row -> jsonify)
+with row_encoder.json_rows_response on a synthetic 10k-row ticket list.
+
+Usage: python bench_row_encoder.py [rows] [repeats]
+"""
+
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+
+from flask import Flask, jsonify
+
+from row_encoder import json_rows_response
+
+TICKET_LIST_KEYS = (
+    'id', 'code', 'status', 'quantity', 'total_price', 'purchase_date', 'valid_date',
+    'ticket_type', 'customer_name', 'customer_phone',
+)
+
+QUERY = """
+    SELECT TICKET_ID, TICKET_CODE, STATUS, QUANTITY, TOTAL_PRICE,
+           PURCHASE_DATE, VALID_DATE, TYPE_NAME, CUSTOMER_NAME, CUSTOMER_PHONE
+    FROM TICKET_LIST
+    ORDER BY TICKET_ID DESC
+"""
+
+
+def build_db(rows):
+    db = sqlite3.connect(':memory:')
+    db.execute("""
+        CREATE TABLE TICKET_LIST (
+            TICKET_ID INTEGER PRIMARY KEY, TICKET_CODE TEXT, STATUS TEXT,
+            QUANTITY INTEGER, TOTAL_PRICE REAL, PURCHASE_DATE TEXT, VALID_DATE TEXT,
+            TYPE_NAME TEXT, CUSTOMER_NAME TEXT, CUSTOMER_PHONE TEXT
+        )
+    """)
+    db.executemany(
+        "INSERT INTO TICKET_LIST VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(i, f"MT{i:08d}DEAD", ('valid', 'used', 'cancelled')[i % 3], 1 + i % 4,
+          40000.0 * (1 + i % 4), f"2026-01-{1 + i % 28:02d} 09:{i % 60:02d}:00",
+          f"2026-02-{1 + i % 28:02d}", 'Vé người lớn',
+          None if i % 7 == 0 else f"Nguyễn Văn Khách {i}", f"09{i:08d}")
+         for i in range(1, rows + 1)]
+    )
+    return db
+
+
+def baseline(db):
+    cursor = db.execute(QUERY)
+    tickets = []
+    for row in cursor.fetchall():
+        tickets.append({
+            'id': row[0],
+            'code': row[1],
+            'status': row[2],
+            'quantity': row[3],
+            'total_price': row[4],
+            'purchase_date': row[5],
+            'valid_date': row[6],
+            'ticket_type': row[7],
+            'customer_name': row[8],
+            'customer_phone': row[9]
+        })
+    return jsonify({'success': True, 'data': tickets}).get_data()
+
+
+def encoder(db):
+    cursor = db.execute(QUERY)
+    return json_rows_response(cursor, TICKET_LIST_KEYS, envelope={'success': True}).get_data()
+
+
+def measure(func, db, repeats):
+    cpu = []
+    for _ in range(repeats):
+        start = time.process_time()
+        func(db)
+        cpu.append((time.process_time() - start) * 1000)
+    tracemalloc.start()
+    body = func(db)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(cpu), peak / (1024 * 1024), len(body)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    app = Flask(__name__)
+    db = build_db(rows)
+    with app.app_context():
+        import json
+        assert json.loads(baseline(db)) == json.loads(encoder(db)), "outputs differ"
+        print(f"{rows} rows, median of {repeats} runs")
+        print(f"{'path':<12}{'cpu ms':>10}{'peak MB':>10}{'bytes':>12}")
+        for name, func in (('baseline', baseline), ('row_encoder', encoder)):
+            cpu, peak, size = measure(func, db, repeats)
+            print(f"{name:<12}{cpu:>10.1f}{peak:>10.2f}{size:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Dashboard Counters Module
+Museum Management System
+
+Reads the single DASHBOARD_COUNTERS row that triggers keep current on
+every write to TICKET, CUSTOMER, VISIT_HISTORY and "ORDER"
+(migrations/add_dashboard_counters.sql), and recomputes it from the base
+tables to detect or repair drift.
+
+Usage: python dashboard_counters.py [--rebuild]
+"""
+
+import logging
+import sys
+
+from database import get_read_connection, write_transaction
+
+logger = logging.getLogger(__name__)
+
+COUNTER_COLUMNS = (
+    'TICKETS_TOTAL', 'TICKETS_VALID', 'TICKETS_USED', 'TICKETS_CHECKED_OUT',
+    'TICKETS_COMPLETED', 'TICKETS_CANCELLED', 'TICKETS_OTHER',
+    'REVENUE', 'TICKET_AMOUNT',
+    'CUSTOMERS', 'VISITS', 'VISITS_CHECKED_IN',
+    'ORDERS_TOTAL', 'ORDERS_PENDING', 'ORDERS_WAITING_CONFIRMATION', 'ORDERS_PAID',
+    'ORDERS_CANCELLED', 'ORDERS_REJECTED', 'ORDERS_EXPIRED', 'ORDERS_OTHER',
+)
+
+# Same definitions as the triggers; columns in COUNTER_COLUMNS order
+COMPUTE_COUNTERS = """
+    SELECT t.total, t.valid, t.used, t.checked_out, t.completed, t.cancelled, t.other,
+           t.revenue, t.amount,
+           (SELECT COUNT(*) FROM CUSTOMER),
+           v.total, v.checked_in,
+           o.total, o.pending, o.waiting_confirmation, o.paid, o.cancelled, o.rejected,
+           o.expired, o.other
+    FROM (
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(STATUS = 'valid'), 0) AS valid,
+               COALESCE(SUM(STATUS = 'used'), 0) AS used,
+               COALESCE(SUM(STATUS = 'checked_out'), 0) AS checked_out,
+               COALESCE(SUM(STATUS = 'completed'), 0) AS completed,
+               COALESCE(SUM(STATUS = 'cancelled'), 0) AS cancelled,
+               COALESCE(SUM(COALESCE(STATUS NOT IN ('valid', 'used', 'checked_out',
+                                                    'completed', 'cancelled'), 1)), 0) AS other,
+               COALESCE(SUM(CASE WHEN STATUS IN ('valid', 'used', 'checked_out', 'completed')
+                                 THEN COALESCE(TOTAL_PRICE, 0) ELSE 0 END), 0) AS revenue,
+               COALESCE(SUM(TOTAL_PRICE), 0) AS amount
+        FROM TICKET
+    ) t, (
+        SELECT COUNT(*) AS total, COUNT(CHECK_IN_TIME) AS checked_in
+        FROM VISIT_HISTORY
+    ) v, (
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(STATUS = 'pending'), 0) AS pending,
+               COALESCE(SUM(STATUS = 'waiting_confirmation'), 0) AS waiting_confirmation,
+               COALESCE(SUM(STATUS = 'paid'), 0) AS paid,
+               COALESCE(SUM(STATUS = 'cancelled'), 0) AS cancelled,
+               COALESCE(SUM(STATUS = 'rejected'), 0) AS rejected,
+               COALESCE(SUM(STATUS = 'expired'), 0) AS expired,
+               COALESCE(SUM(COALESCE(STATUS NOT IN ('pending', 'waiting_confirmation', 'paid',
+                                                    'cancelled', 'rejected', 'expired'), 1)), 0) AS other
+        FROM "ORDER"
+    ) o
+"""
+
+SELECT_COUNTERS = f"""
+    SELECT {', '.join(COUNTER_COLUMNS)}, REBUILT_AT
+    FROM DASHBOARD_COUNTERS
+    WHERE COUNTER_ID = 1
+"""
+
+
+def read_counters(db):
+    """{'tickets_total': ..., 'revenue': ...}; zeros if the row is missing"""
+    row = db.execute(SELECT_COUNTERS).fetchone()
+    if row is None:
+        logger.warning("DASHBOARD_COUNTERS is empty; run dashboard_counters.py --rebuild")
+        return {column.lower(): 0 for column in COUNTER_COLUMNS}
+    counters = {column.lower(): row[i] for i, column in enumerate(COUNTER_COLUMNS)}
+    counters['rebuilt_at'] = row[len(COUNTER_COLUMNS)]
+    return counters
+
+
+def _drift(stored, actual):
+    """{column: (stored, actual)} for counters that disagree"""
+    drift = {}
+    for i, column in enumerate(COUNTER_COLUMNS):
+        have = stored[i] if stored else None
+        if have is None or abs(have - actual[i]) > 0.005:
+            drift[column] = (have, actual[i])
+    return drift
+
+
+def check_counters():
+    """Counters that drifted from the base tables (empty dict = consistent)"""
+    db = get_read_connection()
+    try:
+        # One read transaction, so the row and the recount see the same snapshot
+        db.execute("BEGIN")
+        stored = db.execute(SELECT_COUNTERS).fetchone()
+        actual = db.execute(COMPUTE_COUNTERS).fetchone()
+        db.execute("COMMIT")
+    finally:
+        db.close()
+    return _drift(stored, actual)
+
+
+def rebuild_counters():
+    """Recompute the row from scratch; returns the drift that was repaired"""
+    with write_transaction() as db:
+        stored = db.execute(SELECT_COUNTERS).fetchone()
+        actual = db.execute(COMPUTE_COUNTERS).fetchone()
+        db.execute(f"""
+            INSERT OR REPLACE INTO DASHBOARD_COUNTERS (COUNTER_ID, {', '.join(COUNTER_COLUMNS)}, REBUILT_AT)
+            VALUES (1, {', '.join('?' * len(COUNTER_COLUMNS))}, CURRENT_TIMESTAMP)
+        """, tuple(actual))
+    drift = _drift(stored, actual)
+    if drift:
+        logger.warning(f"Dashboard counters rebuilt, drift: {drift}")
+    return drift
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    rebuild = '--rebuild' in sys.argv[1:]
+    drift = rebuild_counters() if rebuild else check_counters()
+    if not drift:
+        print("✅ Dashboard counters match the base tables")
+    else:
+        print(f"{'counter':<30}{'stored':>14}{'actual':>14}")
+        for column, (stored, actual) in drift.items():
+            print(f"{column:<30}{str(stored):>14}{str(actual):>14}")
+        print("✅ Rebuilt" if rebuild else "⚠️  Drift found; run with --rebuild to repair")
+    sys.exit(0 if rebuild or not drift else 1)
@@ -1,29 +1,400 @@
+import hashlib
+import os
+import random
 import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+
+from queries import STATEMENT_CACHE_SIZE
 
 # Database path - using museum_bennharong.db
 DB_PATH = Path(__file__).parent.parent / 'data' / 'museum_bennharong.db'
 
+# Small files shared by all workers (generation counters, ...), kept in
+# shared memory when available
+SHARED_STATE_DIR = Path('/dev/shm') if os.access('/dev/shm', os.W_OK) else Path(tempfile.gettempdir())
+
+
+def shared_state_path(name):
+    """Path of a cross-worker state file, distinct per database"""
+    tag = hashlib.sha1(str(Path(DB_PATH).resolve()).encode()).hexdigest()[:10]
+    return SHARED_STATE_DIR / f"museum_{tag}_{name}"
+
+# ============================================================================
+# CONNECTION POOL
+# ============================================================================
+
+# Idle connections kept per worker process; extra connections opened during
+# bursts are closed on release instead of being pooled
+POOL_SIZE = 8
+
+# Applied once when a connection is opened, not on every checkout
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),          # ms
+    ('cache_size', -16000),          # 16 MB page cache per connection
+    ('mmap_size', 268435456),        # 256 MB
+    ('temp_store', 'MEMORY'),
+)
+
+# Read-only connections: journal_mode is a property of the file (set by the
+# writers) and cannot be changed from a mode=ro handle
+READ_ONLY_PRAGMAS = tuple(p for p in CONNECTION_PRAGMAS if p[0] != 'journal_mode') + (
+    ('query_only', 'ON'),
+)
+
+
+class PooledConnection:
+    """sqlite3 connection wrapper whose close() hands it back to the pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        elif self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        else:
+            setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    @property
+    def closed(self):
+        return self._conn is None
+
+    def close(self):
+        """Return connection to the pool (safe to call more than once)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """Per-process pool of pragma-tuned SQLite connections"""
+
+    def __init__(self, db_path, size=POOL_SIZE, pragmas=CONNECTION_PRAGMAS, read_only=False):
+        self.db_path = str(db_path)
+        self.size = size
+        self.pragmas = pragmas
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'released': 0,
+            'discarded': 0,
+            'reclaimed': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+        }
+
+    def _open(self):
+        if self.read_only:
+            uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def acquire(self):
+        """Check out a connection, opening a new one if none is idle"""
+        with self._lock:
+            # Connections must never cross a fork (gunicorn preload)
+            if self._pid != os.getpid():
+                self._reset()
+            conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self._stats['reused'] += 1
+            else:
+                self._stats['created'] += 1
+            self._stats['in_use'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._stats['in_use'])
+        if conn is None:
+            try:
+                conn = self._open()
+            except Exception:
+                with self._lock:
+                    self._stats['in_use'] -= 1
+                raise
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Take a connection back, discarding it if broken or over capacity"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._stats['in_use'] -= 1
+            if healthy and len(self._idle) < self.size:
+                self._idle.append(conn)
+                self._stats['released'] += 1
+                return
+            self._stats['discarded'] += 1
+        conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn in idle:
+            conn.close()
+
+    def note_reclaimed(self):
+        with self._lock:
+            self._stats['reclaimed'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        stats['size'] = self.size
+        stats['read_only'] = self.read_only
+        stats['pid'] = os.getpid()
+        return stats
+
+
+_pool = ConnectionPool(DB_PATH)
+_read_pool = ConnectionPool(DB_PATH, pragmas=READ_ONLY_PRAGMAS, read_only=True)
+
+
 def get_connection():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
+    """Get pooled database connection with row factory (close() returns it)"""
+    conn = _pool.acquire()
+    _track_request_connection(conn)
     return conn
 
 def get_db_connection():
     """Alias for get_connection - for compatibility with API routes"""
     return get_connection()
 
+def get_read_connection():
+    """Get pooled read-only connection (mode=ro, query_only) for GET/report endpoints"""
+    conn = _read_pool.acquire()
+    _track_request_connection(conn)
+    return conn
+
+def get_pool_stats():
+    """Connection pool statistics for this worker"""
+    return {
+        'read_write': _pool.stats(),
+        'read_only': _read_pool.stats(),
+    }
+
+def _track_request_connection(conn):
+    """Remember connections checked out during a request for teardown"""
+    try:
+        from flask import g, has_app_context
+    except ImportError:
+        return
+    if has_app_context():
+        g.setdefault('_db_connections', []).append(conn)
+
+def release_request_connections(exc=None):
+    """Teardown hook: return connections a handler forgot to close"""
+    from flask import g
+    for conn in g.pop('_db_connections', []):
+        if not conn.closed:
+            conn._pool.note_reclaimed()
+            conn.close()
+
+def init_app(app):
+    """Hand request-scoped connections back to the pool on teardown"""
+    _pool.size = app.config.get('DB_POOL_SIZE', _pool.size)
+    _read_pool.size = app.config.get('DB_READ_POOL_SIZE', _read_pool.size)
+    _write_gate.max_waiters = app.config.get('DB_WRITE_QUEUE_LIMIT', _write_gate.max_waiters)
+    app.teardown_appcontext(release_request_connections)
+
+# ============================================================================
+# SERIALIZED WRITER
+# ============================================================================
+
+# Writers in one worker queue behind a single gate; past this many waiting
+# requests new writes are refused instead of piling up
+WRITE_QUEUE_LIMIT = 32
+WRITE_QUEUE_TIMEOUT = 10.0       # seconds a writer may wait for the gate
+
+# Cross-process contention (other gunicorn workers): short busy_timeout on
+# BEGIN IMMEDIATE, then retry with exponential backoff + jitter
+WRITE_BUSY_TIMEOUT_MS = 200
+WRITE_RETRIES = 5
+WRITE_BACKOFF = 0.05             # seconds, doubled per retry
+
+
+class WriteQueueFull(sqlite3.OperationalError):
+    """Raised when the writer queue is saturated"""
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class WriteGate:
+    """Per-process writer queue with lock-wait accounting"""
+
+    def __init__(self, max_waiters=WRITE_QUEUE_LIMIT, timeout=WRITE_QUEUE_TIMEOUT):
+        self.max_waiters = max_waiters
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._writer = threading.Lock()
+        self._waiting = 0
+        self._stats = {
+            'writes': 0,
+            'failed': 0,
+            'rejected': 0,
+            'busy_retries': 0,
+            'waiting': 0,
+            'peak_waiting': 0,
+            'lock_wait_total_ms': 0.0,
+            'lock_wait_max_ms': 0.0,
+        }
+
+    def enter(self):
+        """Wait for the writer slot, refusing when the queue is full"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._waiting >= self.max_waiters:
+                self._stats['rejected'] += 1
+                raise WriteQueueFull('Write queue is full')
+            self._waiting += 1
+            self._stats['peak_waiting'] = max(self._stats['peak_waiting'], self._waiting)
+            writer = self._writer
+        acquired = writer.acquire(timeout=self.timeout)
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self._stats['rejected'] += 1
+        if not acquired:
+            raise WriteQueueFull('Timed out waiting for the write queue')
+        return writer
+
+    def note_retry(self):
+        with self._lock:
+            self._stats['busy_retries'] += 1
+
+    def record(self, waited, ok):
+        ms = waited * 1000
+        with self._lock:
+            self._stats['writes' if ok else 'failed'] += 1
+            self._stats['lock_wait_total_ms'] += ms
+            self._stats['lock_wait_max_ms'] = max(self._stats['lock_wait_max_ms'], ms)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['waiting'] = self._waiting
+        attempts = stats['writes'] + stats['failed']
+        stats['lock_wait_avg_ms'] = round(stats['lock_wait_total_ms'] / attempts, 3) if attempts else 0.0
+        stats['lock_wait_total_ms'] = round(stats['lock_wait_total_ms'], 3)
+        stats['lock_wait_max_ms'] = round(stats['lock_wait_max_ms'], 3)
+        stats['queue_limit'] = self.max_waiters
+        return stats
+
+
+_write_gate = WriteGate()
+
+
+def _begin_immediate(conn):
+    """BEGIN IMMEDIATE, retrying with backoff while another process holds the lock"""
+    default_timeout = dict(CONNECTION_PRAGMAS)['busy_timeout']
+    conn.execute(f"PRAGMA busy_timeout = {WRITE_BUSY_TIMEOUT_MS}")
+    try:
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == WRITE_RETRIES:
+                    raise
+                _write_gate.note_retry()
+                time.sleep(WRITE_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.0))
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {default_timeout}")
+
+
+@contextmanager
+def write_transaction():
+    """Run the block as one serialized write transaction (commit on success)
+
+    Usage:
+        with write_transaction() as db:
+            db.execute("UPDATE ...", params)
+    """
+    start = time.perf_counter()
+    writer = _write_gate.enter()
+    try:
+        conn = _pool.acquire()
+        try:
+            try:
+                _begin_immediate(conn)
+            except sqlite3.OperationalError:
+                _write_gate.record(time.perf_counter() - start, False)
+                raise
+            _write_gate.record(time.perf_counter() - start, True)
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+        finally:
+            conn.close()
+    finally:
+        writer.release()
+
+def get_write_stats():
+    """Writer queue and lock-wait statistics for this worker"""
+    return _write_gate.stats()
+
 def dict_factory(cursor, row):
     """Convert row to dictionary"""
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
 def fetch_all(query, params=()):
     """Fetch all rows as dictionaries"""
-    conn = get_connection()
-    conn.row_factory = dict_factory
+    conn = get_read_connection()
     cursor = conn.cursor()
+    cursor.row_factory = dict_factory
     cursor.execute(query, params)
     results = cursor.fetchall()
     conn.close()
@@ -31,9 +402,9 @@ def fetch_all(query, params=()):
 
 def fetch_one(query, params=()):
     """Fetch one row as dictionary"""
-    conn = get_connection()
-    conn.row_factory = dict_factory
+    conn = get_read_connection()
     cursor = conn.cursor()
+    cursor.row_factory = dict_factory
     cursor.execute(query, params)
     result = cursor.fetchone()
     conn.close()
@@ -41,21 +412,15 @@ def fetch_one(query, params=()):
 
 def execute_query(query, params=()):
     """Execute INSERT/UPDATE/DELETE query and return last insert id"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    conn.commit()
-    last_id = cursor.lastrowid
-    conn.close()
-    return last_id
+    with write_transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.lastrowid
 
 def execute_many(query, params_list):
     """Execute multiple INSERT/UPDATE/DELETE queries"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.executemany(query, params_list)
-    conn.commit()
-    conn.close()
+    with write_transaction() as conn:
+        conn.cursor().executemany(query, params_list)
     return True
 
 def execute_script(script):
@@ -200,30 +565,19 @@ def get_dashboard_stats():
     conn = get_connection()
     cursor = conn.cursor()
     
-    # Total tickets sold
-    cursor.execute("SELECT COUNT(*) FROM TICKET")
-    total_tickets = cursor.fetchone()[0]
-    
-    # Total revenue
-    cursor.execute("SELECT COALESCE(SUM(TOTAL_PRICE), 0) FROM TICKET")
-    total_revenue = cursor.fetchone()[0]
-    
-    # Total customers
-    cursor.execute("SELECT COUNT(*) FROM CUSTOMER")
-    total_customers = cursor.fetchone()[0]
-    
-    # Total visits (checked in)
-    cursor.execute("""
-        SELECT COUNT(*) FROM VISIT_HISTORY 
-        WHERE CHECK_IN_TIME IS NOT NULL
-    """)
-    total_visits = cursor.fetchone()[0]
+    # Running totals, kept current by triggers
+    from dashboard_counters import read_counters    # dashboard_counters imports this module
+    counters = read_counters(conn)
+    total_tickets = counters['tickets_total']
+    total_revenue = counters['ticket_amount']
+    total_customers = counters['customers']
+    total_visits = counters['visits_checked_in']
     
     # Active tickets (today)
     cursor.execute("""
         SELECT COUNT(*) FROM TICKET 
         WHERE STATUS = 'active' 
-        AND DATE(PURCHASE_DATE) = DATE('now')
+        AND PURCHASE_DATE >= DATE('now') AND PURCHASE_DATE < DATE('now', '+1 day')
     """)
     active_today = cursor.fetchone()[0]
     
@@ -238,28 +592,15 @@ def get_dashboard_stats():
     }
 
 def get_revenue_by_date(start_date=None, end_date=None):
-    """Get revenue by date range"""
-    query = """
-        SELECT 
-            DATE(PURCHASE_DATE) as date,
-            COUNT(*) as ticket_count,
-            SUM(TOTAL_PRICE) as revenue
-        FROM TICKET
-        WHERE 1=1
-    """
-    params = []
-    
-    if start_date:
-        query += " AND DATE(PURCHASE_DATE) >= ?"
-        params.append(start_date)
-    
-    if end_date:
-        query += " AND DATE(PURCHASE_DATE) <= ?"
-        params.append(end_date)
-    
-    query += " GROUP BY DATE(PURCHASE_DATE) ORDER BY date DESC"
-    
-    return fetch_all(query, tuple(params))
+    """Get revenue by date range (from the REVENUE_DAILY rollup)"""
+    from revenue_rollup import revenue_by_day    # revenue_rollup imports this module
+    conn = get_read_connection()
+    try:
+        rows = revenue_by_day(conn, start_date, end_date)
+    finally:
+        conn.close()
+    return [{'date': day, 'ticket_count': tickets, 'revenue': revenue}
+            for day, tickets, revenue in rows]
 
 def get_ticket_status_count():
     """Get count of tickets by status"""
@@ -270,16 +611,16 @@ def get_ticket_status_count():
     """)
 
 def get_top_customers(limit=10):
-    """Get top customers by total spent"""
+    """Get top customers by total spent (from the CUSTOMER_REVENUE rollup)"""
     return fetch_all("""
         SELECT 
             c.CUSTOMER_ID, c.FULLNAME, c.PHONE,
-            COUNT(t.TICKET_ID) as ticket_count,
-            SUM(t.TOTAL_PRICE) as total_spent
-        FROM CUSTOMER c
-        JOIN TICKET t ON c.CUSTOMER_ID = t.CUSTOMER_ID
-        GROUP BY c.CUSTOMER_ID
-        ORDER BY total_spent DESC
+            r.TICKETS as ticket_count,
+            r.TICKET_AMOUNT as total_spent
+        FROM CUSTOMER_REVENUE r
+        JOIN CUSTOMER c ON c.CUSTOMER_ID = r.CUSTOMER_ID
+        WHERE r.TICKETS > 0
+        ORDER BY r.TICKET_AMOUNT DESC
         LIMIT ?
     """, (limit,))
 
@@ -346,17 +687,9 @@ def check_duplicate_phone(phone, exclude_customer_id=None):
 
 def log_user_activity(user_id, action_type, target_type=None, target_id=None, 
                      description=None, ip_address=None):
-    """Log user activity"""
-    return execute_query("""
-        INSERT INTO USER_ACTIVITY_LOG (
-            USER_ID, ACTION_TYPE, TARGET_TYPE, TARGET_ID,
-            DESCRIPTION, IP_ADDRESS, CREATED_AT
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
-        user_id, action_type, target_type, target_id,
-        description, ip_address, 
-        datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    ))
+    """Log user activity (queued, written in batches by activity_log.py)"""
+    from activity_log import log_activity    # activity_log imports this module
+    log_activity(user_id, action_type, description, target_type, target_id, ip_address)
 
 # ============================================================================
 # DATABASE INITIALIZATION
@@ -0,0 +1,330 @@
+"""
+Event Stream Module
+Museum Management System
+
+Live feed for the dashboard, order and gate screens over Server-Sent
+Events (GET /api/stream). Handlers call publish() inside their write
+transaction, which adds a small row to EVENT_OUTBOX
+(migrations/add_event_outbox.sql); the event exists exactly when the
+change commits. One poller thread per worker tails the outbox by
+EVENT_ID while anyone is connected and fans new rows out to that
+worker's streams, so every screen sees events from every worker.
+
+Streams only receive the channels their role may read. Each stream has
+a bounded queue: a client that falls SSE_QUEUE_SIZE events behind gets a
+'resync' event and is disconnected instead of buffering without limit,
+and reloads its lists. Idle streams get a comment heartbeat every
+SSE_HEARTBEAT seconds; streams are recycled after SSE_MAX_STREAM_SECONDS
+and the browser resumes from Last-Event-ID.
+
+Every event means the dashboard counts changed, so the poller also
+invalidates this worker's response caches. Screens reloading on an
+event pass its id (?after=); caches versioned by latest_event_id()
+rebuild once for it even on a worker that has not polled yet.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from flask import Response, jsonify, request, session
+
+from authz import has_permission
+from database import get_read_connection
+from response_cache import invalidate_response_caches
+
+logger = logging.getLogger(__name__)
+
+SSE_POLL_INTERVAL = 0.5          # seconds between outbox reads per worker (only while streams are open)
+SSE_HEARTBEAT = 15               # seconds of silence before a keep-alive comment
+SSE_QUEUE_SIZE = 100             # events buffered per stream before it is told to resync
+SSE_MAX_STREAMS = 12             # open streams per worker; more get 503 and keep polling
+                                 # (each holds a gthread thread: keep below --threads)
+SSE_MAX_STREAM_SECONDS = 300     # a stream is closed after this; the browser reconnects
+SSE_RETRY_MS = 3000              # reconnect delay sent to the browser
+SSE_REPLAY_LIMIT = 500           # events replayed to a reconnecting client before resync
+EVENT_RETENTION_HOURS = 24       # outbox rows kept for replay (maintenance.py prunes)
+
+# channel -> permissions that may read it
+CHANNELS = {
+    'gate': ('checkin', 'checkout', 'dashboard'),
+    'orders': ('dashboard',),
+}
+
+# event -> channel
+EVENTS = {
+    'checkin': 'gate',
+    'checkout': 'gate',
+    'order_created': 'orders',
+    'order_submitted': 'orders',
+    'order_approved': 'orders',
+    'order_rejected': 'orders',
+}
+
+SELECT_EVENTS = """
+    SELECT EVENT_ID, CHANNEL, EVENT, DATA FROM EVENT_OUTBOX
+    WHERE EVENT_ID > ?
+    ORDER BY EVENT_ID
+    LIMIT ?
+"""
+
+_settings = {'max_streams': SSE_MAX_STREAMS}
+
+
+def publish(db, event, data):
+    """Queue an event in the caller's transaction; streams see it after commit"""
+    db.execute("INSERT INTO EVENT_OUTBOX (CHANNEL, EVENT, DATA) VALUES (?, ?, ?)",
+               (EVENTS[event], event, json.dumps(data, ensure_ascii=False, default=str)))
+
+
+def latest_event_id():
+    """Newest committed EVENT_ID (0 when the outbox is empty)"""
+    db = get_read_connection()
+    try:
+        return db.execute("SELECT COALESCE(MAX(EVENT_ID), 0) FROM EVENT_OUTBOX").fetchone()[0]
+    finally:
+        db.close()
+
+
+def _frame(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class Subscriber:
+    """One open stream: its channels and a bounded queue of (event_id, frame)"""
+
+    def __init__(self, channels):
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event_id, frame):
+        if self.overflowed:
+            return False
+        try:
+            self.queue.put_nowait((event_id, frame))
+            return True
+        except queue.Full:
+            # Slow client: stop buffering; the stream sends 'resync' and closes
+            self.overflowed = True
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait((None, None))
+            except (queue.Empty, queue.Full):
+                pass
+            return False
+
+
+class EventHub:
+    """Per-worker fan-out from EVENT_OUTBOX to the open streams"""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._poller = None
+        self._last_id = None
+        self._stats = {
+            'streams_opened': 0,
+            'peak_streams': 0,
+            'rejected': 0,
+            'events': 0,
+            'delivered': 0,
+            'overflows': 0,
+            'resyncs': 0,
+            'polls': 0,
+            'poll_errors': 0,
+        }
+
+    def subscribe(self, channels):
+        """Register a stream (None if the worker is at its stream limit)"""
+        if self._pid != os.getpid():
+            self._reset()
+        subscriber = Subscriber(channels)
+        # Read before registering: if it fails, nothing is left half set up.
+        # Live events start from now; reconnecting clients are replayed separately
+        latest = latest_event_id()
+        with self._lock:
+            if len(self._subscribers) >= _settings['max_streams']:
+                self._stats['rejected'] += 1
+                return None
+            self._subscribers.add(subscriber)
+            self._stats['streams_opened'] += 1
+            self._stats['peak_streams'] = max(self._stats['peak_streams'], len(self._subscribers))
+            start_poller = self._poller is None
+            if start_poller:
+                self._last_id = latest
+                self._poller = threading.Thread(target=self._poll, name='event-stream', daemon=True)
+        if start_poller:
+            try:
+                self._poller.start()
+            except Exception:
+                with self._lock:
+                    self._subscribers.discard(subscriber)
+                    self._poller = None
+                raise
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if subscriber.overflowed:
+                self._stats['overflows'] += 1
+
+    def _poll(self):
+        """Tail the outbox while streams are open; exits when the last one closes"""
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+                subscribers = list(self._subscribers)
+            try:
+                db = get_read_connection()
+                try:
+                    rows = db.execute(SELECT_EVENTS, (self._last_id, SSE_REPLAY_LIMIT)).fetchall()
+                finally:
+                    db.close()
+            except Exception as e:
+                logger.error(f"Event stream poll failed: {str(e)}")
+                with self._lock:
+                    self._stats['poll_errors'] += 1
+                time.sleep(SSE_POLL_INTERVAL * 4)
+                continue
+
+            if rows:
+                invalidate_response_caches()
+            delivered = 0
+            for event_id, channel, event, data in rows:
+                frame = _frame(event_id, event, data)
+                for subscriber in subscribers:
+                    if channel in subscriber.channels and subscriber.offer(event_id, frame):
+                        delivered += 1
+                self._last_id = event_id
+            with self._lock:
+                self._stats['polls'] += 1
+                self._stats['events'] += len(rows)
+                self._stats['delivered'] += delivered
+            if len(rows) < SSE_REPLAY_LIMIT:
+                time.sleep(SSE_POLL_INTERVAL)
+
+    def replay(self, channels, after_id):
+        """Frames after after_id for a reconnecting client; None if it must resync"""
+        db = get_read_connection()
+        try:
+            oldest = db.execute("SELECT MIN(EVENT_ID) FROM EVENT_OUTBOX").fetchone()[0]
+            if oldest is not None and oldest > after_id + 1:
+                return None          # pruned past the client's position
+            marks = ','.join('?' * len(channels))
+            rows = db.execute(f"""
+                SELECT EVENT_ID, EVENT, DATA FROM EVENT_OUTBOX
+                WHERE EVENT_ID > ? AND CHANNEL IN ({marks})
+                ORDER BY EVENT_ID
+                LIMIT ?
+            """, (after_id, *channels, SSE_REPLAY_LIMIT + 1)).fetchall()
+        finally:
+            db.close()
+        if len(rows) > SSE_REPLAY_LIMIT:
+            return None
+        return [(event_id, _frame(event_id, event, data)) for event_id, event, data in rows]
+
+    def last_id(self):
+        """Newest event id this worker has fanned out"""
+        return self._last_id or 0
+
+    def note_resync(self):
+        with self._lock:
+            self._stats['resyncs'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_streams'] = len(self._subscribers)
+        stats['last_event_id'] = self._last_id
+        stats['pid'] = os.getpid()
+        return stats
+
+
+_hub = EventHub()
+
+
+def _stream(subscriber, channels, last_event_id):
+    """SSE body: retry hint, replay, then live events and heartbeats"""
+    sent_id = last_event_id or 0
+    deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+
+        if last_event_id is not None:
+            replayed = _hub.replay(channels, last_event_id)
+            if replayed is None:
+                _hub.note_resync()
+                yield _frame(_hub.last_id(), 'resync', '{}')
+                return
+            for event_id, frame in replayed:
+                sent_id = event_id
+                yield frame
+
+        while time.monotonic() < deadline:
+            try:
+                event_id, frame = subscriber.queue.get(timeout=SSE_HEARTBEAT)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if subscriber.overflowed:
+                _hub.note_resync()
+                yield _frame(_hub.last_id(), 'resync', '{}')
+                return
+            if event_id <= sent_id:
+                continue             # already sent during replay
+            sent_id = event_id
+            yield frame
+    finally:
+        _hub.unsubscribe(subscriber)
+
+
+def get_event_stream_stats():
+    """Open streams, events fanned out, overflows and resyncs (this worker)"""
+    return _hub.stats()
+
+
+def register_event_stream(app):
+    """GET /api/stream?channels=gate,orders; stream limit from app.config (SSE_MAX_STREAMS)"""
+    _settings['max_streams'] = app.config.get('SSE_MAX_STREAMS', SSE_MAX_STREAMS)
+
+    @app.route('/api/stream', methods=['GET'])
+    def api_event_stream():
+        """Server-Sent Events feed of the channels this user may read"""
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'message': 'Vui lòng đăng nhập'}), 401
+
+        requested = request.args.get('channels', ','.join(CHANNELS)).split(',')
+        channels = [c for c in CHANNELS
+                    if c in requested and has_permission(session['user_id'], CHANNELS[c])]
+        if not channels:
+            return jsonify({'success': False, 'message': 'Bạn không có quyền truy cập'}), 403
+
+        last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+
+        try:
+            subscriber = _hub.subscribe(channels)
+        except Exception as e:
+            logger.error(f"Event stream subscribe failed: {str(e)}")
+            return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
+        if subscriber is None:
+            return jsonify({'success': False, 'message': 'Hệ thống đang bận, vui lòng thử lại'}), 503
+
+        response = Response(_stream(subscriber, channels, last_event_id), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'     # nginx: do not buffer the stream
+        return response
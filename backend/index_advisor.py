@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Index Advisor for museum_bennharong.db
+Runs EXPLAIN QUERY PLAN over every SQL statement the backend issues,
+flags full scans / temp B-trees / unusable indexes, proposes covering
+indexes (kept only if the planner actually uses them) and writes a
+ready-to-apply migration plus a before/after timing report measured on
+a scaled copy of the database.
+
+Usage:
+    python index_advisor.py [--db PATH] [--scale N] [--output FILE] [--no-timing]
+"""
+
+import argparse
+import ast
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Database path (same default as migration_db.py)
+DB_PATH = Path(__file__).parent.parent / 'data' / 'museum_bennharong.db'
+BACKEND_DIR = Path(__file__).parent
+MIGRATIONS_DIR = Path(__file__).parent.parent / 'migrations'
+
+# The running backend: only modules these import (directly or not) are
+# scanned, so scripts and route files app.py never loads do not count
+ENTRY_POINTS = ('app.py',)
+
+SQL_START = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(?:\[|")?(\w+)(?:\]|")?(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|INNER\b|ORDER\b|GROUP\b|SET\b|LIMIT\b|VALUES\b)(\w+))?', re.IGNORECASE)
+WRAPPED_COLUMN = re.compile(r"\b(DATE|DATETIME|STRFTIME|LOWER|UPPER|TRIM|SUBSTR)\s*\(\s*(?:'[^']*'\s*,\s*)?((?:\w+\.)?\w+)\s*[,)]", re.IGNORECASE)
+
+TIMING_RUNS = 5
+
+# Tables that grow with traffic; the rest are small lookup tables where a
+# scan is cheaper than an index and only the findings are reported
+GROWTH_TABLES = {
+    'TICKET', 'VISIT_HISTORY', 'ORDER', 'CUSTOMER', 'USER', 'USER_ROLE',
+    'USER_SESSION', 'USER_ACTIVITY_LOG', 'PAYMENT_LOG', 'INVOICE', 'INVOICE_DETAIL',
+    'PASSWORD_RESET',
+}
+
+# At most this many extra columns are appended to make an index covering
+MAX_COVERING_EXTRA = 2
+
+
+# ============================================================================
+# STATEMENT COLLECTION
+# ============================================================================
+
+def _imported_modules(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name.split('.')[0]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            yield node.module.split('.')[0]
+
+
+def reachable_modules():
+    """backend/*.py files imported, directly or not, from ENTRY_POINTS"""
+    local = {path.stem for path in BACKEND_DIR.glob('*.py')}
+    reachable, pending = set(), list(ENTRY_POINTS)
+    while pending:
+        name = pending.pop()
+        if name in reachable:
+            continue
+        reachable.add(name)
+        try:
+            tree = ast.parse((BACKEND_DIR / name).read_text(encoding='utf-8'))
+        except SyntaxError as e:
+            print(f"⚠️  Cannot parse {name}: {e}")
+            continue
+        pending.extend(f"{module}.py" for module in _imported_modules(tree) if module in local)
+    return reachable
+
+
+def _sql_constants(tree):
+    """(sql, scope) per SQL string constant; scope names where it lives
+
+    The enclosing function (route handler); at module level, the name it
+    is assigned to or registered with (register_query('name', sql)).
+    Names stay valid as the file changes, unlike line numbers.
+    """
+    def visit(node, scope):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            scope = node.name
+        elif isinstance(node, ast.Assign) and scope is None:
+            names = [target.id for target in node.targets if isinstance(target, ast.Name)]
+            scope = names[0] if names else None
+        elif (isinstance(node, ast.Call) and scope is None and node.args
+              and isinstance(node.args[0], ast.Constant)
+              and isinstance(node.args[0].value, str) and not SQL_START.match(node.args[0].value)):
+            scope = node.args[0].value
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_START.match(node.value):
+            yield node.value, scope
+        for child in ast.iter_child_nodes(node):
+            yield from visit(child, scope)
+
+    yield from visit(tree, None)
+
+
+def collect_statements():
+    """SQL string constants from the modules app.py loads plus the named-query catalog"""
+    statements = {}
+    modules = reachable_modules()
+
+    def add(sql, origin):
+        key = ' '.join(sql.split())
+        origins = statements.setdefault(key, {'sql': sql.strip(), 'origins': []})['origins']
+        if origin not in origins:
+            origins.append(origin)
+
+    for path in sorted(BACKEND_DIR.glob('*.py')):
+        if path.name not in modules:
+            continue
+        try:
+            tree = ast.parse(path.read_text(encoding='utf-8'))
+        except SyntaxError as e:
+            print(f"⚠️  Cannot parse {path.name}: {e}")
+            continue
+        for sql, scope in _sql_constants(tree):
+            add(sql, f"{path.name}:{scope}" if scope else path.name)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    try:
+        from queries import QUERIES
+        for name, sql in QUERIES.items():
+            add(sql, f"queries.py:{name}")
+    except ImportError:
+        pass
+    return list(statements.values())
+
+
+def count_params(sql):
+    return STRING_LITERAL.sub("''", sql).count('?')
+
+
+def table_aliases(sql):
+    """{alias_or_name: TABLE} for tables referenced in the statement"""
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[table.upper()] = table
+        if alias:
+            aliases[alias.upper()] = table
+    return aliases
+
+
+# ============================================================================
+# PLAN ANALYSIS
+# ============================================================================
+
+def explain(conn, sql):
+    params = [None] * count_params(sql)
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def plan_findings(sql, plan):
+    """Problems visible in a query plan"""
+    findings = []
+    upper = sql.upper()
+    for detail in plan:
+        if detail.startswith('SCAN '):
+            table = detail.split()[1]
+            if 'COVERING INDEX' in detail:
+                findings.append(('index_scan', table, detail))
+            elif 'INDEX' not in detail:
+                findings.append(('full_scan', table, detail))
+        elif 'USE TEMP B-TREE' in detail:
+            findings.append(('temp_btree', None, detail))
+        elif 'LIST SUBQUERY' in detail and 'NOT IN' in upper:
+            findings.append(('not_in', None, 'NOT IN (subquery): rewrite as NOT EXISTS'))
+
+    where = upper.split(' WHERE ', 1)[1] if ' WHERE ' in upper else ''
+    for func, column in WRAPPED_COLUMN.findall(where):
+        findings.append(('wrapped_column', column,
+                         f"{func.upper()}({column}) in predicate cannot use an index on {column}"))
+    return findings
+
+
+def table_columns(conn, table):
+    return {row[1].upper(): row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def candidate_index(conn, sql, table, inner):
+    """Equality columns, then one range/order column, then covering columns
+
+    inner: the table is scanned inside a join loop, so its join columns count
+    as equality lookups (for the outer table they do not help).
+    """
+    if table.upper() not in GROWTH_TABLES:
+        return None
+    aliases = [a for a, t in table_aliases(sql).items() if t.upper() == table.upper()]
+    columns = table_columns(conn, table)
+    single_table = len(set(t.upper() for t in table_aliases(sql).values())) == 1
+    text = STRING_LITERAL.sub("''", sql)
+
+    def column_refs(pattern, source=text):
+        found = []
+        for qualifier, column in re.findall(pattern, source, re.IGNORECASE):
+            qualifier = qualifier.rstrip('.').upper()
+            if (qualifier in aliases or (not qualifier and single_table)) and column.upper() in columns:
+                name = columns[column.upper()]
+                if name not in found:
+                    found.append(name)
+        return found
+
+    equality = column_refs(r"(\w+\.)?(\w+)\s*(?:=|\bIS\b|\bIN\b)\s*(?:\?|''|\d|NULL|\()")
+    if inner:
+        joined = column_refs(r"(\w+\.)(\w+)\s*=\s*\w+\.\w+") + column_refs(r"\w+\.\w+\s*=\s*(\w+\.)(\w+)")
+        equality += [c for c in joined if c not in equality]
+    ranged = column_refs(r"(\w+\.)?(\w+)\s*(?:>=|<=|>|<|\bBETWEEN\b|\bLIKE\b)")
+    upper = text.upper()
+    ordered = []
+    if 'ORDER BY' in upper:
+        order_part = re.split(r'\bLIMIT\b', upper.split('ORDER BY', 1)[1])[0]
+        ordered = column_refs(r"(\w+\.)?(\w+)", order_part)
+
+    index_columns = list(equality)
+    for column in (ranged[:1] or ordered[:1]):
+        if column not in index_columns:
+            index_columns.append(column)
+    pk = [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")') if r[5]]
+    if not index_columns or index_columns[:1] == pk[:1]:
+        return None                   # rowid / primary key lookups need no index
+    index_columns = [c for c in index_columns if c not in pk]   # rowid is in every index
+
+    # Covering: append the table's other referenced columns when there are few
+    referenced = column_refs(r"(\w+\.)?(\w+)")
+    extra = [c for c in referenced if c not in index_columns and c not in pk]
+    if extra and len(extra) <= MAX_COVERING_EXTRA:
+        index_columns += extra
+    return tuple(index_columns)
+
+
+def index_name(table, columns):
+    return 'idx_' + table.lower() + '_' + '_'.join(c.lower() for c in columns)
+
+
+def index_sql(table, columns):
+    quoted = '"ORDER"' if table.upper() == 'ORDER' else table
+    return f"CREATE INDEX IF NOT EXISTS {index_name(table, columns)} ON {quoted}({', '.join(columns)});"
+
+
+def existing_index_columns(conn, table):
+    result = []
+    for idx in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        cols = tuple(r[2] for r in conn.execute(f'PRAGMA index_info("{idx[1]}")').fetchall())
+        result.append(tuple(c.upper() for c in cols if c))
+    return result
+
+
+# ============================================================================
+# SCALED DATASET
+# ============================================================================
+
+def scale_database(source, target, factor):
+    """Copy the database and multiply every data table by `factor`"""
+    shutil.copy(source, target)
+    conn = sqlite3.connect(target)
+    # Triggers would fire once per copied row; the copy does not need them
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+        conn.execute(f'DROP TRIGGER "{name}"')
+    tables = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+        unique = set()
+        for idx in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+            if idx[2]:
+                unique.update(r[2] for r in conn.execute(f'PRAGMA index_info("{idx[1]}")'))
+        columns, exprs = [], []
+        for cid, name, col_type, notnull, default, pk in info:
+            if pk and col_type.upper() == 'INTEGER':
+                continue                      # let rowid assign new keys
+            columns.append(f'"{name}"')
+            upper = name.upper()
+            if name in unique or pk:
+                exprs.append(f'"{name}" || \'#\' || :k' if 'INT' not in col_type.upper()
+                             else f'"{name}" + :k * 1000000')
+            elif upper.endswith(('_DATE', '_AT', '_TIME')) or col_type.upper() in ('DATE', 'DATETIME', 'TIMESTAMP'):
+                # Spread copies over the previous year so date ranges stay selective
+                exprs.append(f"CASE WHEN length(\"{name}\") = 10 THEN date(\"{name}\", '-' || (:k % 365) || ' days') "
+                             f"ELSE datetime(\"{name}\", '-' || (:k % 365) || ' days') END")
+            else:
+                exprs.append(f'"{name}"')
+        if not columns:
+            continue
+        max_rowid = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0]
+        if max_rowid is None:
+            continue
+        insert = (f'INSERT INTO "{table}" ({", ".join(columns)}) '
+                  f'SELECT {", ".join(exprs)} FROM "{table}" WHERE rowid <= :max')
+        try:
+            for k in range(1, factor):
+                conn.execute(insert, {'k': k, 'max': max_rowid})
+        except sqlite3.Error as e:
+            print(f"   ⚠️  {table} not scaled: {e}")
+            conn.rollback()
+            continue
+        conn.commit()
+    return conn
+
+
+def sample_params(conn, sql):
+    """Realistic parameter values: a mid-table value of the compared column"""
+    aliases = table_aliases(sql)
+    text = STRING_LITERAL.sub("''", sql)
+    params = []
+    for match in re.finditer(r'\?', text):
+        before = text[:match.start()]
+        if re.search(r'\bLIMIT\s*$', before, re.IGNORECASE):
+            params.append(100)
+            continue
+        if re.search(r'\bOFFSET\s*$', before, re.IGNORECASE):
+            params.append(0)
+            continue
+        m = re.search(r'(?:(\w+)\.)?(\w+)\s*(?:=|>=|<=|>|<|!=|LIKE)\s*$', before, re.IGNORECASE)
+        value = None
+        if m:
+            table = aliases.get((m.group(1) or '').upper()) or next(iter(aliases.values()), None)
+            if table:
+                try:
+                    count = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                    row = conn.execute(f'SELECT "{m.group(2)}" FROM "{table}" WHERE "{m.group(2)}" IS NOT NULL '
+                                       f'LIMIT 1 OFFSET ?', (count // 2,)).fetchone()
+                    value = row[0] if row else None
+                except sqlite3.Error:
+                    value = None
+        params.append(value)
+    return params
+
+
+def time_query(conn, sql, params):
+    runs = []
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs)
+
+
+# ============================================================================
+# REPORT / MIGRATION
+# ============================================================================
+
+def write_migration(path, recommendations):
+    lines = [
+        "-- Museum System - Recommended indexes",
+        f"-- Generated by backend/index_advisor.py on {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        "-- Every index below was verified with EXPLAIN QUERY PLAN to remove a",
+        "-- full table scan or temp B-tree from at least one backend query.",
+        "",
+    ]
+    for (table, columns), rec in sorted(recommendations.items()):
+        lines.append("-- ============================================================================")
+        lines.append(f"-- {table}({', '.join(columns)})")
+        for origin in sorted(rec['origins'])[:6]:
+            lines.append(f"--   used by {origin}")
+        lines.append("-- ============================================================================")
+        lines.append(index_sql(table, columns))
+        lines.append("")
+    lines.append("-- Refresh planner statistics for the new indexes")
+    lines.append("PRAGMA optimize;")
+    Path(path).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN QUERY PLAN index advisor')
+    parser.add_argument('--db', default=str(DB_PATH), help='database to analyse (opened read-only)')
+    parser.add_argument('--scale', type=int, default=200, help='row multiplier for the timing copy')
+    parser.add_argument('--output', default=str(MIGRATIONS_DIR / 'add_advised_indexes.sql'),
+                        help='migration file to write')
+    parser.add_argument('--no-timing', action='store_true', help='skip the scaled before/after timing')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Museum Index Advisor")
+    print("=" * 60)
+
+    if not Path(args.db).exists():
+        print(f"❌ Database not found: {args.db}")
+        sys.exit(1)
+    live = sqlite3.connect(Path(args.db).resolve().as_uri() + '?mode=ro', uri=True)
+
+    statements = collect_statements()
+    print(f"\n🔎 {len(statements)} distinct statements collected")
+
+    # 1. Plans and findings against the live schema
+    flagged, skipped = [], 0
+    for stmt in statements:
+        try:
+            stmt['plan'] = explain(live, stmt['sql'])
+        except sqlite3.Error as e:
+            stmt['error'] = str(e)
+            skipped += 1
+            continue
+        stmt['findings'] = plan_findings(stmt['sql'], stmt['plan'])
+        if stmt['findings']:
+            flagged.append(stmt)
+    print(f"   {len(flagged)} flagged, {skipped} not explainable (fragments / missing tables)")
+
+    # 2. Candidate indexes, kept only when the planner uses them
+    scratch_dir = tempfile.mkdtemp(prefix='index_advisor_')
+    scratch = sqlite3.connect(str(Path(scratch_dir) / 'schema.db'))
+    scratch.executescript(';\n'.join(r[0] for r in live.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY type = 'table' DESC")) + ';')
+
+    recommendations = {}
+    for stmt in flagged:
+        stmt['indexes'] = []
+        aliases = table_aliases(stmt['sql'])
+        scanned = {}
+        loops = 0
+        for detail in stmt['plan']:
+            if detail.startswith(('SCAN ', 'SEARCH ')):
+                alias = detail.split()[1]
+                if detail.startswith('SCAN ') and 'INDEX' not in detail:
+                    scanned[aliases.get(alias.upper(), alias)] = loops > 0
+                loops += 1
+        if any(kind == 'temp_btree' for kind, _, _ in stmt['findings']):
+            for table in aliases.values():
+                scanned.setdefault(table, False)
+        for table, inner in sorted(scanned.items()):
+            columns = candidate_index(live, stmt['sql'], table, inner)
+            if not columns or tuple(c.upper() for c in columns) in existing_index_columns(live, table):
+                continue
+            name = index_name(table, columns)
+            scratch.execute(index_sql(table, columns))
+            after = explain(scratch, stmt['sql'])
+            scratch.execute(f'DROP INDEX "{name}"')
+            if any(name in detail for detail in after):
+                stmt['indexes'].append((table, columns))
+                stmt['plan_after'] = after
+                rec = recommendations.setdefault((table, columns), {'origins': set()})
+                rec['origins'].update(stmt['origins'])
+
+    # Drop indexes that are a prefix (or a reordering) of another recommendation
+    for table, columns in list(recommendations):
+        for other_table, other in recommendations:
+            if other_table != table or other == columns:
+                continue
+            if other[:len(columns)] == columns or (
+                    set(other) == set(columns)
+                    and len(recommendations[(other_table, other)]['origins'])
+                    >= len(recommendations[(table, columns)]['origins'])):
+                recommendations[(other_table, other)]['origins'].update(
+                    recommendations[(table, columns)]['origins'])
+                del recommendations[(table, columns)]
+                break
+
+    # 3. Report
+    print("\n" + "=" * 60)
+    print("FINDINGS")
+    print("=" * 60)
+    for stmt in flagged:
+        print(f"\n📍 {', '.join(stmt['origins'][:3])}{' ...' if len(stmt['origins']) > 3 else ''}")
+        print("   " + ' '.join(stmt['sql'].split())[:160])
+        for kind, _, detail in stmt['findings']:
+            print(f"   ⚠️  {kind}: {detail}")
+        for table, columns in stmt.get('indexes', []):
+            print(f"   ✅ {index_sql(table, columns)}")
+
+    if not recommendations:
+        print("\nℹ️  No index recommendations")
+        return
+
+    write_migration(args.output, recommendations)
+    print(f"\n📝 Migration written: {args.output}")
+
+    # 4. Before/after timing on a scaled copy
+    if args.no_timing:
+        return
+    print("\n" + "=" * 60)
+    print(f"TIMING (scaled x{args.scale}, median of {TIMING_RUNS} runs)")
+    print("=" * 60)
+    scaled_path = str(Path(scratch_dir) / 'scaled.db')
+    scaled = scale_database(args.db, scaled_path, args.scale)
+    for table in ('TICKET', 'VISIT_HISTORY', 'ORDER', 'CUSTOMER'):
+        count = scaled.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        print(f"   {table}: {count} rows")
+
+    timed = [s for s in flagged if s.get('indexes') and s['sql'].lstrip().upper().startswith(('SELECT', 'WITH'))]
+    before = {}
+    for stmt in timed:
+        stmt['params'] = sample_params(scaled, stmt['sql'])
+        before[id(stmt)] = time_query(scaled, stmt['sql'], stmt['params'])
+    for table, columns in recommendations:
+        scaled.execute(index_sql(table, columns))
+    scaled.execute("PRAGMA optimize")
+    print(f"\n{'before ms':>10}{'after ms':>10}  query")
+    for stmt in timed:
+        after = time_query(scaled, stmt['sql'], stmt['params'])
+        print(f"{before[id(stmt)]:>10.2f}{after:>10.2f}  {stmt['origins'][0]}")
+
+    scaled.close()
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    print("\n" + "=" * 60)
+
+
+if __name__ == '__main__':
+    main()
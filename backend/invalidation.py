@@ -0,0 +1,94 @@
+"""
+Invalidation Module
+Museum Management System
+
+Cross-worker cache invalidation without a database round trip: a small
+memory-mapped file of generation counters shared by all workers. A cache
+entry remembers the generation it was built under; bumping the counter
+makes every worker's entry stale on its next lookup. Keys hash onto a
+fixed number of slots, so a collision only costs an extra cache miss.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from database import shared_state_path
+
+GENERATION_SLOTS = 8192
+_SLOT = struct.Struct('<Q')
+_GLOBAL_SLOT = 0                 # bumped to invalidate every key at once
+
+
+class GenerationTable:
+    """Fixed-size array of 64-bit counters in a shared, memory-mapped file"""
+
+    def __init__(self, name, slots=GENERATION_SLOTS):
+        self.name = name
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+        self._pid = None
+
+    def _mapped(self):
+        if self._map is None or self._pid != os.getpid():
+            with self._lock:
+                if self._map is None or self._pid != os.getpid():
+                    path = shared_state_path(self.name)
+                    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                    size = self.slots * _SLOT.size
+                    if os.fstat(fd).st_size < size:
+                        os.ftruncate(fd, size)
+                    self._map = mmap.mmap(fd, size)
+                    self._fd = fd
+                    self._pid = os.getpid()
+        return self._map
+
+    def _slot(self, key):
+        return 1 + hash(key) % (self.slots - 1)
+
+    def get(self, key):
+        """(global, per-key) generation pair for key"""
+        table = self._mapped()
+        return (_SLOT.unpack_from(table, _GLOBAL_SLOT * _SLOT.size)[0],
+                _SLOT.unpack_from(table, self._slot(key) * _SLOT.size)[0])
+
+    def _bump(self, slot):
+        table = self._mapped()
+        offset = slot * _SLOT.size
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            value = _SLOT.unpack_from(table, offset)[0] + 1
+            _SLOT.pack_into(table, offset, value)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return value
+
+    def bump(self, key):
+        """Invalidate key in every worker"""
+        return self._bump(self._slot(key))
+
+    def bump_all(self):
+        """Invalidate every key in every worker"""
+        return self._bump(_GLOBAL_SLOT)
+
+
+# Per-user generation: sessions and anything else cached by user id
+user_generations = GenerationTable('user_generations')
+
+
+def user_generation(user_id):
+    return user_generations.get(int(user_id))
+
+
+def invalidate_user(user_id):
+    """Drop cached state for one user (logout, deactivation, role or profile change)"""
+    user_generations.bump(int(user_id))
+
+
+def invalidate_all_users():
+    """Drop cached state for every user (e.g. a role's permissions changed)"""
+    user_generations.bump_all()
@@ -0,0 +1,345 @@
+"""
+Maintenance Module
+Museum Management System
+
+Background reaper for tables that otherwise grow forever:
+- expires sessions idle longer than PERMANENT_SESSION_LIFETIME
+- deletes used or expired PASSWORD_RESET tokens
+- expires pending orders past their EXPIRES_AT
+- moves ended sessions and old cancelled / rejected / expired orders (with
+  their PAYMENT_LOG rows) to the archive tables (migrations/add_archive_tables.sql)
+- rolls USER_ACTIVITY_LOG rows older than ACTIVITY_LOG_RETENTION_DAYS into
+  monthly tables (USER_ACTIVITY_LOG_YYYYMM, created on demand)
+- deletes EVENT_OUTBOX rows older than EVENT_RETENTION_HOURS (live feed replay)
+
+Every step works in batches of BATCH_SIZE rows, one short write
+transaction each with a pause in between, so check-ins and logins never
+wait behind the reaper for long. One worker runs it at a time (flock);
+run it from cron with `python maintenance.py` or let each worker's
+scheduler thread pick it up every MAINTENANCE_INTERVAL seconds.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import jsonify, request
+
+from activity_log import ACTIVITY_LOG_RETENTION_DAYS, archive_table_name
+from auth import permission_required
+from database import get_read_connection, write_transaction, shared_state_path
+from event_stream import EVENT_RETENTION_HOURS
+from invalidation import invalidate_user
+from write_behind import flush_all as flush_write_behind
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL = 3600      # seconds between runs per worker (0 = cron only)
+SESSION_LIFETIME = 86400         # seconds idle before a session is expired
+SESSION_ARCHIVE_DAYS = 30        # ended sessions kept in USER_SESSION
+ORDER_ARCHIVE_DAYS = 180         # closed orders kept in "ORDER"
+BATCH_SIZE = 200                 # rows per write transaction
+BATCH_PAUSE = 0.05               # seconds between batches (lets other writers in)
+MAX_RUN_SECONDS = 60             # stop early; the next run continues
+
+CLOSED_ORDER_STATUSES = ('cancelled', 'rejected', 'expired')
+
+_lock = threading.Lock()
+_last_report = None
+_scheduler_pid = None
+
+
+def _utc(delta=timedelta()):
+    """UTC 'YYYY-MM-DD HH:MM:SS' (CURRENT_TIMESTAMP columns)"""
+    return (datetime.now(timezone.utc) - delta).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _local():
+    """Local 'YYYY-MM-DD HH:MM:SS' (EXPIRES_AT columns, written with datetime.now())"""
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _placeholders(ids):
+    return ','.join('?' * len(ids))
+
+
+def _archive_columns(db, table, archive):
+    """Columns present in both the live table and its archive, in live order"""
+    live = [row[1] for row in db.execute(f'PRAGMA table_info("{table}")')]
+    archived = {row[1] for row in db.execute(f'PRAGMA table_info("{archive}")')}
+    return ', '.join(f'"{name}"' for name in live if name in archived)
+
+
+def _move(db, table, archive, key, ids):
+    """Copy rows WHERE key IN ids into archive, then delete them; returns rows moved"""
+    columns = _archive_columns(db, table, archive)
+    marks = _placeholders(ids)
+    db.execute(f"""
+        INSERT INTO {archive} ({columns}, ARCHIVED_AT)
+        SELECT {columns}, CURRENT_TIMESTAMP FROM "{table}" WHERE {key} IN ({marks})
+    """, ids)
+    return db.execute(f'DELETE FROM "{table}" WHERE {key} IN ({marks})', ids).rowcount
+
+
+# ============================================================================
+# STEPS: each takes one batch inside the caller's write transaction
+# ============================================================================
+
+def _expire_sessions(db, lifetime, expired_users):
+    rows = db.execute("""
+        SELECT SESSION_ID, USER_ID FROM USER_SESSION
+        WHERE IS_ACTIVE = 1 AND LAST_ACTIVITY < ?
+        LIMIT ?
+    """, (_utc(timedelta(seconds=lifetime)), BATCH_SIZE)).fetchall()
+    if not rows:
+        return 0
+    ids = [row[0] for row in rows]
+    expired_users.update(row[1] for row in rows)
+    return db.execute(f"""
+        UPDATE USER_SESSION SET IS_ACTIVE = 0, LOGOUT_TIME = CURRENT_TIMESTAMP
+        WHERE SESSION_ID IN ({_placeholders(ids)}) AND IS_ACTIVE = 1
+    """, ids).rowcount
+
+
+def _delete_reset_tokens(db):
+    return db.execute("""
+        DELETE FROM PASSWORD_RESET WHERE RESET_ID IN (
+            SELECT RESET_ID FROM PASSWORD_RESET
+            WHERE USED = 1 OR EXPIRES_AT < ?
+            LIMIT ?
+        )
+    """, (_local(), BATCH_SIZE)).rowcount
+
+
+def _expire_orders(db):
+    # The log_order_status_change trigger records each one in PAYMENT_LOG
+    return db.execute("""
+        UPDATE "ORDER" SET STATUS = 'expired'
+        WHERE ORDER_ID IN (
+            SELECT ORDER_ID FROM "ORDER"
+            WHERE STATUS = 'pending' AND EXPIRES_AT < ?
+            LIMIT ?
+        )
+    """, (_local(), BATCH_SIZE)).rowcount
+
+
+def _archive_sessions(db):
+    ids = [row[0] for row in db.execute("""
+        SELECT SESSION_ID FROM USER_SESSION
+        WHERE IS_ACTIVE = 0 AND LOGOUT_TIME < ?
+        LIMIT ?
+    """, (_utc(timedelta(days=SESSION_ARCHIVE_DAYS)), BATCH_SIZE))]
+    if not ids:
+        return 0
+    return _move(db, 'USER_SESSION', 'USER_SESSION_ARCHIVE', 'SESSION_ID', ids)
+
+
+def _archive_orders(db):
+    ids = [row[0] for row in db.execute(f"""
+        SELECT o.ORDER_ID FROM "ORDER" o
+        WHERE o.STATUS IN ({_placeholders(CLOSED_ORDER_STATUSES)})
+          AND o.UPDATED_AT < ?
+          AND NOT EXISTS (SELECT 1 FROM TICKET t WHERE t.ORDER_ID = o.ORDER_ID)
+        LIMIT ?
+    """, (*CLOSED_ORDER_STATUSES, _utc(timedelta(days=ORDER_ARCHIVE_DAYS)), BATCH_SIZE))]
+    if not ids:
+        return 0
+    _move(db, 'PAYMENT_LOG', 'PAYMENT_LOG_ARCHIVE', 'ORDER_ID', ids)
+    return _move(db, 'ORDER', 'ORDER_ARCHIVE', 'ORDER_ID', ids)
+
+
+def _archive_activity_log(db):
+    rows = db.execute("""
+        SELECT LOG_ID, strftime('%Y%m', CREATED_AT) FROM USER_ACTIVITY_LOG
+        WHERE CREATED_AT < ? AND strftime('%Y%m', CREATED_AT) IS NOT NULL
+        ORDER BY CREATED_AT
+        LIMIT ?
+    """, (_utc(timedelta(days=ACTIVITY_LOG_RETENTION_DAYS)), BATCH_SIZE)).fetchall()
+    by_month = {}
+    for log_id, month in rows:
+        by_month.setdefault(month, []).append(log_id)
+    moved = 0
+    for month, ids in by_month.items():
+        archive = archive_table_name(month)
+        db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {archive} AS
+            SELECT *, CURRENT_TIMESTAMP AS ARCHIVED_AT FROM USER_ACTIVITY_LOG WHERE 0
+        """)
+        moved += _move(db, 'USER_ACTIVITY_LOG', archive, 'LOG_ID', ids)
+    return moved
+
+
+def _prune_event_outbox(db):
+    return db.execute("""
+        DELETE FROM EVENT_OUTBOX WHERE EVENT_ID IN (
+            SELECT EVENT_ID FROM EVENT_OUTBOX
+            WHERE CREATED_AT < ?
+            ORDER BY EVENT_ID
+            LIMIT ?
+        )
+    """, (_utc(timedelta(hours=EVENT_RETENTION_HOURS)), BATCH_SIZE)).rowcount
+
+
+def _has_event_outbox():
+    db = get_read_connection()
+    try:
+        return db.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'EVENT_OUTBOX'
+        """).fetchone() is not None
+    finally:
+        db.close()
+
+
+def _has_archive_tables():
+    db = get_read_connection()
+    try:
+        found = {row[0] for row in db.execute("""
+            SELECT name FROM sqlite_master WHERE type = 'table' AND name IN
+            ('USER_SESSION_ARCHIVE', 'ORDER_ARCHIVE', 'PAYMENT_LOG_ARCHIVE')
+        """)}
+    finally:
+        db.close()
+    return len(found) == 3
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def _run_step(step, deadline, *args):
+    """Repeat one step in separate transactions until it finds nothing or time runs out"""
+    rows = batches = 0
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        with write_transaction() as db:
+            changed = step(db, *args)
+        if not changed:
+            break
+        rows += changed
+        batches += 1
+        time.sleep(BATCH_PAUSE)
+    return {
+        'rows': rows,
+        'batches': batches,
+        'ms': round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def run_maintenance(session_lifetime=SESSION_LIFETIME, max_seconds=MAX_RUN_SECONDS):
+    """One reaper pass; returns the report (None if another process is running it)"""
+    global _last_report
+
+    lock_fd = os.open(shared_state_path('maintenance.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        started_at = _utc()
+        start = time.perf_counter()
+        deadline = start + max_seconds
+
+        # Pending LAST_ACTIVITY updates first, or busy sessions could look idle
+        flush_write_behind()
+
+        expired_users = set()
+        steps = {
+            'expired_sessions': _run_step(_expire_sessions, deadline, session_lifetime, expired_users),
+            'reset_tokens_deleted': _run_step(_delete_reset_tokens, deadline),
+            'expired_orders': _run_step(_expire_orders, deadline),
+        }
+        # Cached sessions of expired logins drop in every worker
+        for user_id in expired_users:
+            invalidate_user(user_id)
+
+        if _has_archive_tables():
+            steps['archived_sessions'] = _run_step(_archive_sessions, deadline)
+            steps['archived_orders'] = _run_step(_archive_orders, deadline)
+        else:
+            logger.warning("Archive tables missing; run migrations/add_archive_tables.sql")
+        steps['archived_activity_log'] = _run_step(_archive_activity_log, deadline)
+        if _has_event_outbox():
+            steps['event_outbox_pruned'] = _run_step(_prune_event_outbox, deadline)
+
+        report = {
+            'started_at': started_at,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+            'rows_reclaimed': sum(step['rows'] for step in steps.values()),
+            'complete': time.perf_counter() < deadline,
+            'steps': steps,
+        }
+    finally:
+        os.close(lock_fd)
+
+    with _lock:
+        _last_report = report
+    summary = ', '.join(f"{name}={step['rows']}" for name, step in steps.items())
+    logger.info(f"Maintenance: {report['rows_reclaimed']} rows in {report['elapsed_ms']} ms ({summary})")
+    return report
+
+
+def get_maintenance_stats():
+    """Last reaper report seen by this worker"""
+    with _lock:
+        return _last_report
+
+
+# ============================================================================
+# SCHEDULER + API
+# ============================================================================
+
+def _scheduler(interval, session_lifetime):
+    while True:
+        time.sleep(interval)
+        try:
+            run_maintenance(session_lifetime)
+        except Exception as e:
+            logger.error(f"Maintenance run failed: {str(e)}")
+
+
+def register_maintenance(app):
+    """Per-worker scheduler thread (started on the first request) and admin endpoints"""
+    interval = app.config.get('MAINTENANCE_INTERVAL', MAINTENANCE_INTERVAL)
+    session_lifetime = int(app.permanent_session_lifetime.total_seconds())
+
+    @app.before_request
+    def start_maintenance_scheduler():
+        global _scheduler_pid
+        if interval <= 0 or _scheduler_pid == os.getpid():
+            return
+        with _lock:
+            if _scheduler_pid == os.getpid():
+                return
+            _scheduler_pid = os.getpid()
+        threading.Thread(target=_scheduler, args=(interval, session_lifetime),
+                         name='maintenance', daemon=True).start()
+
+    @app.route('/api/admin/maintenance', methods=['GET', 'POST'])
+    @permission_required('all')
+    def api_maintenance():
+        """GET: last report; POST: run the reaper now"""
+        try:
+            if request.method == 'GET':
+                return jsonify({'success': True, 'data': get_maintenance_stats()})
+            report = run_maintenance(session_lifetime)
+            if report is None:
+                return jsonify({'success': False, 'message': 'Bảo trì đang chạy ở tiến trình khác'}), 409
+            return jsonify({'success': True, 'data': report})
+        except Exception as e:
+            logger.error(f"Maintenance error: {str(e)}")
+            return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    result = run_maintenance()
+    if result is None:
+        print("Another maintenance run is in progress")
+    else:
+        print(f"Reclaimed {result['rows_reclaimed']} rows in {result['elapsed_ms']} ms")
+        for name, step in result['steps'].items():
+            print(f"  {name:<22}{step['rows']:>8} rows {step['batches']:>5} batches {step['ms']:>9} ms")
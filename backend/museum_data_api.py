@@ -4,14 +4,153 @@ Returns beautifully formatted JSON
 """
 
 from flask import jsonify
+from pathlib import Path
 import sqlite3
 import logging
 import json
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 DATABASE_PATH = '/home/www/museum-system/data/museum_bennharong.db'
 
+# Public 3D-map tables served by this module (changed rarely, read anonymously)
+SNAPSHOT_TABLES = ('CONSTRUCTION', 'COORDINATES', 'TRIP', 'ORGANIZATION')
+
+# Seconds between PRAGMA data_version checks against the database file
+SNAPSHOT_CHECK_INTERVAL = 5.0
+
+
+# ==================== IN-MEMORY SNAPSHOT ====================
+class MuseumDataSnapshot:
+    """Per-process in-memory copy of SNAPSHOT_TABLES, rebuilt when the file changes"""
+
+    def __init__(self, db_path, tables=SNAPSHOT_TABLES, check_interval=SNAPSHOT_CHECK_INTERVAL):
+        self.db_path = str(db_path)
+        self.tables = tables
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._anchor = None          # keeps the shared-cache memory database alive
+        self._uri = None
+        self._watcher = None
+        self._data_version = None
+        self._next_check = 0.0
+        self._stats = {
+            'generation': 0,
+            'builds': 0,
+            'checks': 0,
+            'build_ms': 0.0,
+            'built_at': None,
+            'rows': {},
+        }
+
+    def _source_uri(self):
+        return Path(self.db_path).resolve().as_uri() + '?mode=ro'
+
+    def _build(self):
+        """Copy the tables (schema + rows) into a new shared-cache memory database"""
+        start = time.perf_counter()
+        if self._watcher is None:
+            self._watcher = sqlite3.connect(self._source_uri(), uri=True, check_same_thread=False)
+        # Read the version first: a write landing during the copy triggers another build
+        data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+        generation = self._stats['generation'] + 1
+        uri = f"file:museum_snapshot_{self._pid}_{id(self)}_{generation}?mode=memory&cache=shared"
+        anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        anchor.execute("ATTACH DATABASE ? AS src", (self._source_uri(),))
+        placeholders = ', '.join('?' * len(self.tables))
+        schema = anchor.execute(f"""
+            SELECT type, tbl_name, sql FROM src.sqlite_master
+            WHERE tbl_name IN ({placeholders}) AND type IN ('table', 'index') AND sql IS NOT NULL
+            ORDER BY type = 'index'
+        """, self.tables).fetchall()
+        rows = {}
+        for kind, table, sql in schema:
+            anchor.execute(sql)
+            if kind == 'table':
+                anchor.execute(f'INSERT INTO main."{table}" SELECT * FROM src."{table}"')
+                rows[table] = anchor.execute(f'SELECT COUNT(*) FROM main."{table}"').fetchone()[0]
+        anchor.commit()
+        anchor.execute("DETACH DATABASE src")
+
+        # Readers already holding the old generation finish on it; it is freed
+        # once their connections close
+        self._anchor, self._uri, self._data_version = anchor, uri, data_version
+        self._stats.update({
+            'generation': generation,
+            'builds': self._stats['builds'] + 1,
+            'build_ms': round((time.perf_counter() - start) * 1000, 3),
+            'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'rows': rows,
+        })
+        logger.info(f"Museum data snapshot #{generation} built: {rows}")
+
+    def refresh(self, force=False):
+        """Rebuild if the database file changed since the last build (throttled)"""
+        if self._pid != os.getpid():
+            # Never reuse connections inherited across a fork (gunicorn preload)
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        if not force and self._uri is not None and time.monotonic() < self._next_check:
+            return
+        # The first build waits; a periodic check is skipped if another thread runs it
+        if not self._lock.acquire(blocking=force or self._uri is None):
+            return
+        try:
+            if force or self._uri is None:
+                self._build()
+            elif time.monotonic() >= self._next_check:
+                self._stats['checks'] += 1
+                version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+                if version != self._data_version:
+                    self._build()
+            self._next_check = time.monotonic() + self.check_interval
+        finally:
+            self._lock.release()
+
+    def connect(self):
+        """New connection to the current snapshot (cheap: no file I/O)"""
+        self.refresh()
+        # Open it under the lock: a rebuild swaps _uri / _anchor, and a memory
+        # database whose anchor is gone would be recreated empty
+        with self._lock:
+            conn = sqlite3.connect(self._uri, uri=True)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['check_interval'] = self.check_interval
+        stats['pid'] = os.getpid()
+        return stats
+
+
+_snapshot = None
+
+
+def _connect():
+    """Connection for the museum data endpoints (snapshot if enabled, else the file)"""
+    if _snapshot is not None:
+        conn = _snapshot.connect()
+    else:
+        conn = sqlite3.connect(DATABASE_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def get_snapshot_stats():
+    """Snapshot statistics (None when snapshot mode is off)"""
+    return _snapshot.stats() if _snapshot is not None else None
+
 
 def pretty_json_response(data, status=200):
     """Return pretty formatted JSON"""
@@ -23,16 +162,27 @@ def pretty_json_response(data, status=200):
     )
 
 
-def register_museum_data_api(app):
-    """Register all museum data API endpoints"""
+def register_museum_data_api(app, snapshot=False):
+    """Register all museum data API endpoints
+
+    snapshot=True serves them from an in-memory copy of the 4 tables that is
+    refreshed when PRAGMA data_version of the database file changes.
+    """
+    global _snapshot
+    if snapshot:
+        _snapshot = MuseumDataSnapshot(DATABASE_PATH)
+        try:
+            _snapshot.refresh(force=True)
+        except Exception as e:
+            # Retried on the first request
+            logger.error(f"Museum data snapshot build failed: {str(e)}")
     
     # ==================== CONSTRUCTION API ====================
     @app.route('/api/construction', methods=['GET'])
     def get_constructions():
         """Get all construction/building data"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM CONSTRUCTION ORDER BY CONSTRUCTION_ID")
@@ -53,8 +203,7 @@ def register_museum_data_api(app):
     def get_construction_detail(construction_id):
         """Get single construction by ID"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM CONSTRUCTION WHERE CONSTRUCTION_ID = ?", (construction_id,))
@@ -83,8 +232,7 @@ def register_museum_data_api(app):
                 "trip": []
             }
 
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
 
             # 1️⃣ Get active constructions
@@ -144,8 +292,7 @@ def register_museum_data_api(app):
     def get_coordinate_detail(coordinate_id):
         """Get single coordinate by ID"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM COORDINATES WHERE COORDINATE_ID = ?", (coordinate_id,))
@@ -167,8 +314,7 @@ def register_museum_data_api(app):
     def get_trips():
         """Get all trip data"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM TRIP ORDER BY TRIP_ID")
@@ -189,8 +335,7 @@ def register_museum_data_api(app):
     def get_trip_detail(trip_id):
         """Get single trip by ID"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM TRIP WHERE TRIP_ID = ?", (trip_id,))
@@ -212,8 +357,7 @@ def register_museum_data_api(app):
     def get_organizations():
         """Get all organization data"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM ORGANIZATION ORDER BY ORGANIZATION_ID")
@@ -234,8 +378,7 @@ def register_museum_data_api(app):
     def get_organization_detail(org_id):
         """Get single organization by ID"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM ORGANIZATION WHERE ORGANIZATION_ID = ?", (org_id,))
@@ -257,8 +400,7 @@ def register_museum_data_api(app):
     def get_all_museum_data():
         """Get all data from 4 tables in one request"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = _connect()
             cursor = conn.cursor()
             
             # Fetch all 4 tables
@@ -298,5 +440,6 @@ def register_museum_data_api(app):
             return pretty_json_response({'error': str(e)}, 500)
     
     
-    logger.info("✅ Museum Data API routes registered (4 tables - Pretty JSON)")
+    logger.info("✅ Museum Data API routes registered (4 tables - Pretty JSON%s)"
+                % (", in-memory snapshot" if snapshot else ""))
 
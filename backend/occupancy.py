@@ -0,0 +1,305 @@
+"""
+Occupancy Module
+Museum Management System
+
+How many visitors are inside right now, per area, without counting open
+visits (migrations/add_occupancy.sql):
+- api_checkin / api_checkout call record_checkin() / record_checkout()
+  inside their transaction, so OCCUPANCY moves with the visit
+- every change also writes the current minute's slot of the
+  OCCUPANCY_MINUTE ring (24 hours per area, fixed size)
+- a per-worker scheduler fills minutes without check-ins and reconciles
+  OCCUPANCY against VISIT_HISTORY every OCCUPANCY_RECONCILE_INTERVAL
+  seconds (visits closed by other paths, manual edits)
+
+GET /api/occupancy returns the current counts and the last 24 hours;
+?breakdown=1 adds one entry per area (CONSTRUCTION).
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import jsonify, request
+
+from auth import permission_required
+from database import get_read_connection, write_transaction
+from response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+OCCUPANCY_HISTORY_MINUTES = 1440     # ring size per area (must match the migration's comment)
+OCCUPANCY_SAMPLE_INTERVAL = 60       # seconds between samples per worker (0 = off)
+OCCUPANCY_RECONCILE_INTERVAL = 300   # seconds between reconciliations per worker
+
+MUSEUM = 0                           # OCCUPANCY row for the whole museum
+
+# Count stays >= 0 even if a check-out races a reconciliation
+UPSERT_OCCUPANCY = """
+    INSERT INTO OCCUPANCY (CONSTRUCTION_ID, INSIDE, UPDATED_AT)
+    VALUES (?, MAX(?, 0), CURRENT_TIMESTAMP)
+    ON CONFLICT(CONSTRUCTION_ID) DO UPDATE
+    SET INSIDE = MAX(OCCUPANCY.INSIDE + ?, 0),
+        UPDATED_AT = CURRENT_TIMESTAMP
+    RETURNING INSIDE
+"""
+
+# A slot still holding an older minute starts over
+UPSERT_MINUTE = """
+    INSERT INTO OCCUPANCY_MINUTE (CONSTRUCTION_ID, SLOT, MINUTE, INSIDE, PEAK)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(CONSTRUCTION_ID, SLOT) DO UPDATE
+    SET PEAK = CASE WHEN OCCUPANCY_MINUTE.MINUTE = excluded.MINUTE
+                    THEN MAX(OCCUPANCY_MINUTE.PEAK, excluded.INSIDE)
+                    ELSE excluded.INSIDE END,
+        MINUTE = excluded.MINUTE,
+        INSIDE = excluded.INSIDE
+"""
+
+# Scheduler sample: only minutes nobody has written yet
+FILL_MINUTE = """
+    INSERT INTO OCCUPANCY_MINUTE (CONSTRUCTION_ID, SLOT, MINUTE, INSIDE, PEAK)
+    SELECT CONSTRUCTION_ID, ?, ?, INSIDE, INSIDE FROM OCCUPANCY
+    WHERE true                       -- lets SQLite parse ON CONFLICT after a SELECT
+    ON CONFLICT(CONSTRUCTION_ID, SLOT) DO UPDATE
+    SET MINUTE = excluded.MINUTE, INSIDE = excluded.INSIDE, PEAK = excluded.PEAK
+    WHERE OCCUPANCY_MINUTE.MINUTE < excluded.MINUTE
+"""
+
+COUNT_OPEN_VISITS = """
+    SELECT CONSTRUCTION_ID, COUNT(*)
+    FROM VISIT_HISTORY
+    WHERE CHECK_OUT_TIME IS NULL
+    GROUP BY CONSTRUCTION_ID
+"""
+
+_lock = threading.Lock()
+_scheduler_pid = None
+_stats = {
+    'reconciliations': 0,
+    'drift_corrections': 0,
+    'last_drift': None,
+    'last_reconciled_at': None,
+    'samples': 0,
+}
+
+
+def _minute(now=None):
+    """(ring slot, 'YYYY-MM-DD HH:MM' UTC) for a moment (default: now)"""
+    now = now or datetime.now(timezone.utc)
+    return int(now.timestamp() // 60) % OCCUPANCY_HISTORY_MINUTES, now.strftime('%Y-%m-%d %H:%M')
+
+
+def _adjust(db, construction_id, delta):
+    slot, minute = _minute()
+    areas = (MUSEUM,) if construction_id is None else (MUSEUM, construction_id)
+    for area in areas:
+        inside = db.execute(UPSERT_OCCUPANCY, (area, delta, delta)).fetchone()[0]
+        db.execute(UPSERT_MINUTE, (area, slot, minute, inside, inside))
+
+
+def record_checkin(db, construction_id=None):
+    """One more visitor inside (the museum and, if given, that area)"""
+    _adjust(db, construction_id, 1)
+
+
+def record_checkout(db, construction_id=None):
+    """One visitor fewer; pass the area the visit was checked in at"""
+    _adjust(db, construction_id, -1)
+
+
+# ============================================================================
+# RECONCILIATION + SAMPLING
+# ============================================================================
+
+def reconcile():
+    """Reset OCCUPANCY to the open visits; returns {area: (stored, actual)} that differed"""
+    with write_transaction() as db:
+        actual = {MUSEUM: 0}
+        for area, count in db.execute(COUNT_OPEN_VISITS):
+            actual[MUSEUM] += count
+            if area is not None:
+                actual[area] = count
+        stored = dict(db.execute("SELECT CONSTRUCTION_ID, INSIDE FROM OCCUPANCY").fetchall())
+
+        drift = {area: (stored.get(area), actual.get(area, 0))
+                 for area in sorted(set(stored) | set(actual))
+                 if stored.get(area) != actual.get(area, 0)}
+        slot, minute = _minute()
+        for area, (_, inside) in drift.items():
+            db.execute("""
+                INSERT OR REPLACE INTO OCCUPANCY (CONSTRUCTION_ID, INSIDE, UPDATED_AT, RECONCILED_AT)
+                VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            """, (area, inside))
+            db.execute(UPSERT_MINUTE, (area, slot, minute, inside, inside))
+        db.execute("UPDATE OCCUPANCY SET RECONCILED_AT = CURRENT_TIMESTAMP")
+
+    with _lock:
+        _stats['reconciliations'] += 1
+        _stats['last_reconciled_at'] = minute
+        if drift:
+            _stats['drift_corrections'] += 1
+            _stats['last_drift'] = {str(area): values for area, values in drift.items()}
+    if drift:
+        logger.warning(f"Occupancy drift corrected: {drift}")
+    return drift
+
+
+def sample():
+    """Record the current counts in this minute's slot unless a check-in already did"""
+    slot, minute = _minute()
+    with write_transaction() as db:
+        db.execute(FILL_MINUTE, (slot, minute))
+    with _lock:
+        _stats['samples'] += 1
+
+
+def _scheduler(interval, reconcile_interval):
+    last_reconcile = time.monotonic()
+    while True:
+        time.sleep(interval)
+        try:
+            if time.monotonic() - last_reconcile >= reconcile_interval:
+                last_reconcile = time.monotonic()
+                reconcile()
+            sample()
+        except Exception as e:
+            logger.error(f"Occupancy sampling failed: {str(e)}")
+
+
+# ============================================================================
+# READS
+# ============================================================================
+
+def current(db):
+    """{area: inside} from OCCUPANCY (area 0 = whole museum)"""
+    counts = dict(db.execute("SELECT CONSTRUCTION_ID, INSIDE FROM OCCUPANCY").fetchall())
+    counts.setdefault(MUSEUM, 0)
+    return counts
+
+
+def history(db, minutes=OCCUPANCY_HISTORY_MINUTES):
+    """({area: {'inside': [...], 'peak': [...]}}, first minute), one value per minute
+
+    Minutes without a sample repeat the previous count; minutes before the
+    first sample in the window are None.
+    """
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(minutes=minutes - 1)
+    labels = [_minute(start + timedelta(minutes=i))[1] for i in range(minutes)]
+    rows = db.execute("""
+        SELECT CONSTRUCTION_ID, MINUTE, INSIDE, PEAK FROM OCCUPANCY_MINUTE
+        WHERE MINUTE >= ?
+    """, (labels[0],)).fetchall()
+
+    samples = {}
+    for area, minute, inside, peak in rows:
+        samples.setdefault(area, {})[minute] = (inside, peak)
+
+    series = {}
+    for area, by_minute in samples.items():
+        inside_list, peak_list, last = [], [], None
+        for label in labels:
+            if label in by_minute:
+                last, peak = by_minute[label]
+            else:
+                peak = last
+            inside_list.append(last)
+            peak_list.append(peak)
+        series[area] = {'inside': inside_list, 'peak': peak_list}
+    return series, labels[0]
+
+
+def _load_history():
+    db = get_read_connection()
+    try:
+        series, start = history(db)
+        names = dict(db.execute("SELECT CONSTRUCTION_ID, NAME FROM CONSTRUCTION").fetchall())
+    finally:
+        db.close()
+    return {'start': start, 'interval_seconds': 60, 'series': series, 'names': names}
+
+
+_history_cache = response_cache('occupancy_history', _load_history)
+
+
+def get_occupancy_stats():
+    """Reconciliations, drift corrected and samples taken (this worker)"""
+    with _lock:
+        stats = dict(_stats)
+    stats['pid'] = os.getpid()
+    return stats
+
+
+# ============================================================================
+# SCHEDULER + API
+# ============================================================================
+
+def register_occupancy(app):
+    """Per-worker sampler thread (started on the first request) and GET /api/occupancy"""
+    interval = app.config.get('OCCUPANCY_SAMPLE_INTERVAL', OCCUPANCY_SAMPLE_INTERVAL)
+    reconcile_interval = app.config.get('OCCUPANCY_RECONCILE_INTERVAL', OCCUPANCY_RECONCILE_INTERVAL)
+
+    @app.before_request
+    def start_occupancy_scheduler():
+        global _scheduler_pid
+        if interval <= 0 or _scheduler_pid == os.getpid():
+            return
+        with _lock:
+            if _scheduler_pid == os.getpid():
+                return
+            _scheduler_pid = os.getpid()
+        threading.Thread(target=_scheduler, args=(interval, reconcile_interval),
+                         name='occupancy', daemon=True).start()
+
+    @app.route('/api/occupancy', methods=['GET'])
+    @permission_required(['dashboard', 'checkin', 'checkout'])
+    def api_occupancy():
+        """Visitors inside now and per minute over the last 24 hours"""
+        try:
+            db = get_read_connection()
+            try:
+                counts = current(db)
+            finally:
+                db.close()
+            cached, age, state = _history_cache.get()
+            empty = {'inside': [], 'peak': []}
+
+            data = {
+                'inside': counts[MUSEUM],
+                'history': {
+                    'start': cached['start'],
+                    'interval_seconds': cached['interval_seconds'],
+                    **cached['series'].get(MUSEUM, empty)
+                }
+            }
+            if request.args.get('breakdown') in ('1', 'true'):
+                data['constructions'] = [{
+                    'construction_id': area,
+                    'name': cached['names'].get(area),
+                    'inside': inside,
+                    'history': cached['series'].get(area, empty)
+                } for area, inside in sorted(counts.items()) if area != MUSEUM]
+                # Visits checked in without an area
+                data['unassigned'] = counts[MUSEUM] - sum(
+                    inside for area, inside in counts.items() if area != MUSEUM)
+
+            response = jsonify({'success': True, 'data': data})
+            response.headers['X-Cache'] = state
+            return response
+        except Exception as e:
+            logger.error(f"Occupancy error: {str(e)}")
+            return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
+
+    @app.route('/api/occupancy/reconcile', methods=['POST'])
+    @permission_required('all')
+    def api_occupancy_reconcile():
+        """Recount open visits now; returns the drift that was corrected"""
+        try:
+            drift = reconcile()
+            return jsonify({'success': True, 'data': {str(area): values for area, values in drift.items()}})
+        except Exception as e:
+            logger.error(f"Occupancy reconcile error: {str(e)}")
+            return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
@@ -0,0 +1,78 @@
+"""
+Password Audit Module
+Museum Management System
+
+Reports which password hash schemes and cost parameters are stored in
+USER, compared with the current policy (PASSWORD_HASH_METHOD). Outdated
+hashes are upgraded on the user's next login (password_hashing.py), so
+this shows how far a cost change has rolled out and who still logs in
+with a legacy hash.
+
+Usage: python password_audit.py [--db PATH] [--method scrypt:N:r:p] [--list]
+"""
+
+import argparse
+import sqlite3
+import sys
+from collections import Counter
+from pathlib import Path
+
+from password_hashing import PASSWORD_HASH_METHOD, hash_scheme
+
+DB_PATH = Path(__file__).parent.parent / 'data' / 'museum_bennharong.db'
+
+
+def audit(db, method):
+    """{scheme: Counter(user_type)} and the users whose hash is outdated"""
+    schemes = {}
+    outdated = []
+    for user_id, username, user_type, is_active, last_login, pwhash in db.execute("""
+        SELECT USER_ID, USERNAME, USER_TYPE, IS_ACTIVE, LAST_LOGIN, PASSWORD
+        FROM USER
+        ORDER BY USER_ID
+    """):
+        scheme = hash_scheme(pwhash)
+        schemes.setdefault(scheme, Counter())[user_type or '-'] += 1
+        if scheme != method:
+            outdated.append((user_id, username, user_type, is_active, last_login, scheme))
+    return schemes, outdated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Password hash scheme report')
+    parser.add_argument('--db', default=str(DB_PATH), help='database to read (opened read-only)')
+    parser.add_argument('--method', default=PASSWORD_HASH_METHOD,
+                        help='current policy, as in app.config PASSWORD_HASH_METHOD')
+    parser.add_argument('--list', action='store_true', help='list users with an outdated hash')
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ Database not found: {args.db}")
+        sys.exit(1)
+    db = sqlite3.connect(Path(args.db).resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        schemes, outdated = audit(db, args.method)
+    finally:
+        db.close()
+
+    total = sum(sum(counts.values()) for counts in schemes.values())
+    print("=" * 60)
+    print(f"Password hashes in USER ({total} users), policy {args.method}")
+    print("=" * 60)
+    print(f"{'scheme':<28}{'users':>7}{'share':>8}  by type")
+    for scheme, counts in sorted(schemes.items(), key=lambda item: -sum(item[1].values())):
+        users = sum(counts.values())
+        marker = '✅' if scheme == args.method else '⚠️ '
+        by_type = ', '.join(f"{t}={n}" for t, n in sorted(counts.items()))
+        print(f"{scheme:<28}{users:>7}{users / total:>8.0%}  {by_type} {marker}")
+
+    print(f"\n{len(outdated)} users will be rehashed on their next login")
+    if args.list and outdated:
+        print(f"\n{'id':>5}  {'username':<24}{'type':<10}{'active':<8}{'last login':<21}scheme")
+        for user_id, username, user_type, is_active, last_login, scheme in outdated:
+            print(f"{user_id:>5}  {username:<24}{user_type or '-':<10}{'yes' if is_active else 'no':<8}"
+                  f"{last_login or 'never':<21}{scheme}")
+
+
+if __name__ == '__main__':
+    main()
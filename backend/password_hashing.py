@@ -0,0 +1,307 @@
+"""
+Password Hashing Module
+Museum Management System
+
+Runs werkzeug scrypt hashing and verification in a small per-worker
+process pool instead of the request thread. At most PASSWORD_HASH_WORKERS
+hashes run at once and at most PASSWORD_HASH_QUEUE_LIMIT more wait;
+beyond that new requests are refused at once (HashingBusy) instead of
+queueing behind a burst of logins. PASSWORD_HASH_METHOD sets the scrypt
+cost for new hashes; calibrate it with bench_password_hash.py. Existing
+hashes carry their own parameters, so changing it never breaks logins.
+Pool processes are started by forkserver and import the entry script
+as __mp_main__, so scripts that hash must keep the __main__ guard.
+
+Hashes in another scheme (legacy unsalted MD5) or with other parameters
+still verify; after a successful login they are rehashed in the
+background with the current method (rehash_if_needed), so the cost can
+be raised or lowered without password resets. password_audit.py reports
+the schemes in use.
+"""
+
+import atexit
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import re
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from database import write_transaction
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'    # scrypt:N:r:p, werkzeug's default
+PASSWORD_HASH_WORKERS = 2        # hashing processes per worker (0 = hash inline)
+PASSWORD_HASH_QUEUE_LIMIT = 16   # requests waiting for a hashing process
+PASSWORD_HASH_TIMEOUT = 10.0     # seconds a request waits for its result
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the hashing pool is saturated"""
+
+
+_MD5_HEX = re.compile(r'^[0-9a-f]{32}$')
+
+
+def hash_scheme(pwhash):
+    """'scrypt:32768:8:1', 'pbkdf2:sha256:600000', 'md5' or 'unknown' for a stored hash"""
+    if not pwhash:
+        return 'unknown'
+    if _MD5_HEX.match(pwhash):
+        return 'md5'
+    if pwhash.count('$') == 2:
+        return pwhash.split('$', 1)[0]
+    return 'unknown'
+
+
+# Run in the pool processes
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _check(pwhash, password):
+    if _MD5_HEX.match(pwhash or ''):
+        # Legacy unsalted MD5 (migration_db.py sample accounts)
+        digest = hashlib.md5(password.encode('utf-8')).hexdigest()
+        return hmac.compare_digest(digest, pwhash)
+    return check_password_hash(pwhash, password)
+
+
+def _mp_context():
+    # Never fork a threaded request worker; forkserver starts clean children
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+class HashingPool:
+    """Bounded process pool with queue-depth accounting"""
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, queue_limit=PASSWORD_HASH_QUEUE_LIMIT,
+                 method=PASSWORD_HASH_METHOD, timeout=PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.method = method
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self.shutdown)
+
+    def _reset(self):
+        # Called again in a forked worker: the parent's executor is not ours
+        self._pid = os.getpid()
+        self._executor = None
+        self._in_flight = 0
+        self._stats = {
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'inline': 0,
+            'peak_in_flight': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+        }
+
+    def _executor_for(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+        return self._executor
+
+    def _done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _record(self, started, ok):
+        ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats['completed' if ok else 'failed'] += 1
+            self._stats['total_ms'] += ms
+            self._stats['max_ms'] = max(self._stats['max_ms'], ms)
+
+    def run(self, fn, *args):
+        """fn(*args) in a hashing process, refusing when the pool is full"""
+        started = time.perf_counter()
+        if self.workers <= 0:
+            with self._lock:
+                self._stats['inline'] += 1
+            result = fn(*args)
+            self._record(started, True)
+            return result
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._in_flight >= self.workers + self.queue_limit:
+                self._stats['rejected'] += 1
+                raise HashingBusy('Password hashing queue is full')
+            try:
+                future = self._executor_for().submit(fn, *args)
+            except BrokenProcessPool:
+                self._executor = None
+                future = self._executor_for().submit(fn, *args)
+            self._in_flight += 1
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._in_flight)
+        # Counted until the process finishes it, even if we stop waiting
+        future.add_done_callback(self._done)
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._stats['timed_out'] += 1
+            self._record(started, False)
+            raise HashingBusy('Timed out waiting for password hashing')
+        except BrokenProcessPool:
+            # A hashing process died; start a fresh pool next time
+            with self._lock:
+                self._executor = None
+            self._record(started, False)
+            logger.error("Password hashing pool broke, restarting it")
+            raise HashingBusy('Password hashing pool restarted')
+        self._record(started, True)
+        return result
+
+    def run_many(self, fn, arg_list):
+        """fn(*args) for each args, using every hashing process; one pool-sized window at a time"""
+        if self.workers <= 0:
+            return [self.run(fn, *args) for args in arg_list]
+        results = []
+        for i in range(0, len(arg_list), self.workers):
+            window = arg_list[i:i + self.workers]
+            started = time.perf_counter()
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+                if self._in_flight + len(window) > self.workers + self.queue_limit:
+                    self._stats['rejected'] += len(window)
+                    raise HashingBusy('Password hashing queue is full')
+                futures = [self._executor_for().submit(fn, *args) for args in window]
+                self._in_flight += len(futures)
+                self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._in_flight)
+            for future in futures:
+                future.add_done_callback(self._done)
+            try:
+                results.extend(future.result(timeout=self.timeout) for future in futures)
+            except FutureTimeout:
+                with self._lock:
+                    self._stats['timed_out'] += 1
+                self._record(started, False)
+                raise HashingBusy('Timed out waiting for password hashing')
+            except BrokenProcessPool:
+                with self._lock:
+                    self._executor = None
+                self._record(started, False)
+                logger.error("Password hashing pool broke, restarting it")
+                raise HashingBusy('Password hashing pool restarted')
+            for _ in window:
+                self._record(started, True)
+        return results
+
+    def shutdown(self):
+        """Stop this process's hashing processes (atexit; a worker never stops its parent's)"""
+        with self._lock:
+            executor = self._executor if self._pid == os.getpid() else None
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            in_flight = self._in_flight if self._pid == os.getpid() else 0
+        stats['in_flight'] = in_flight
+        stats['queued'] = max(0, in_flight - self.workers)
+        stats['workers'] = self.workers
+        stats['queue_limit'] = self.queue_limit
+        stats['method'] = self.method
+        done = stats['completed'] + stats['failed']
+        stats['avg_ms'] = round(stats['total_ms'] / done, 3) if done else 0.0
+        stats['total_ms'] = round(stats['total_ms'], 3)
+        stats['max_ms'] = round(stats['max_ms'], 3)
+        return stats
+
+
+_pool = HashingPool()
+
+
+def hash_password(password):
+    """scrypt hash of password with the configured cost"""
+    return _pool.run(_hash, password, _pool.method)
+
+
+def hash_passwords(passwords):
+    """Hashes for many passwords (bulk import), spread over all hashing processes"""
+    return _pool.run_many(_hash, [(password, _pool.method) for password in passwords])
+
+
+def check_password(pwhash, password):
+    """True if password matches pwhash (same argument order as check_password_hash)"""
+    return _pool.run(_check, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """True if pwhash is not in the current method (scheme or cost parameters)"""
+    return hash_scheme(pwhash) != _pool.method
+
+
+_rehash_lock = threading.Lock()
+_rehashing = set()               # user ids with a rehash in progress
+_rehash_stats = {'rehashed': 0, 'rehash_skipped': 0, 'rehash_failed': 0}
+
+
+def _rehash(user_id, old_hash, password):
+    try:
+        new_hash = hash_password(password)
+        with write_transaction() as db:
+            # Only if the password was not changed meanwhile
+            cursor = db.execute("""
+                UPDATE USER SET PASSWORD = ? WHERE USER_ID = ? AND PASSWORD = ?
+            """, (new_hash, user_id, old_hash))
+        outcome = 'rehashed' if cursor.rowcount else 'rehash_skipped'
+        logger.info(f"Password hash of user {user_id}: {hash_scheme(old_hash)} -> "
+                    f"{_pool.method} ({outcome})")
+    except Exception as e:
+        # HashingBusy or a write failure: the next login tries again
+        outcome = 'rehash_failed'
+        logger.warning(f"Password rehash failed for user {user_id}: {str(e)}")
+    finally:
+        with _rehash_lock:
+            _rehashing.discard(user_id)
+    with _rehash_lock:
+        _rehash_stats[outcome] += 1
+
+
+def rehash_if_needed(user_id, pwhash, password):
+    """After a successful verify: move an outdated hash to the current method, in the background"""
+    if not needs_rehash(pwhash):
+        return False
+    with _rehash_lock:
+        if user_id in _rehashing:
+            return False
+        _rehashing.add(user_id)
+    threading.Thread(target=_rehash, args=(user_id, pwhash, password),
+                     name=f"password-rehash-{user_id}", daemon=True).start()
+    return True
+
+
+def get_password_hash_stats():
+    """Hashing pool and rehash counters for this worker"""
+    stats = _pool.stats()
+    with _rehash_lock:
+        stats.update(_rehash_stats)
+    return stats
+
+
+def init_password_hashing(app):
+    """Pool size, queue limit and scrypt cost from app.config"""
+    _pool.workers = app.config.get('PASSWORD_HASH_WORKERS', _pool.workers)
+    _pool.queue_limit = app.config.get('PASSWORD_HASH_QUEUE_LIMIT', _pool.queue_limit)
+    _pool.method = app.config.get('PASSWORD_HASH_METHOD', _pool.method)
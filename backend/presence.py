@@ -0,0 +1,139 @@
+"""
+Presence Module
+Museum Management System
+
+Who is online, without scanning USER_SESSION: login, logout and request
+activity keep one USER_PRESENCE row per user (LAST_SEEN / LOGOUT_AT).
+Activity is throttled in memory per worker and written behind in
+batches; the table is shared by all workers through the database.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import jsonify
+
+from auth import permission_required
+from database import get_read_connection
+from write_behind import WriteBehindBuffer, DEFAULT_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_WINDOW_MINUTES = 30     # seen within this window = online
+PRESENCE_RESOLUTION = 15.0       # seconds between recorded sightings per user
+
+# LAST_SEEN only moves forward (workers flush out of order)
+UPSERT_LAST_SEEN = """
+    INSERT INTO USER_PRESENCE (USER_ID, LAST_SEEN) VALUES (?, ?)
+    ON CONFLICT(USER_ID) DO UPDATE
+    SET LAST_SEEN = MAX(USER_PRESENCE.LAST_SEEN, excluded.LAST_SEEN)
+"""
+
+# A new login clears any earlier logout
+UPSERT_LOGIN = """
+    INSERT INTO USER_PRESENCE (USER_ID, LAST_SEEN) VALUES (?, ?)
+    ON CONFLICT(USER_ID) DO UPDATE
+    SET LAST_SEEN = excluded.LAST_SEEN, LOGOUT_AT = NULL
+"""
+
+# SQL condition on a USER_PRESENCE alias; bind online_cutoff() once
+ONLINE_CONDITION = (
+    "{p}.LAST_SEEN >= ? AND ({p}.LOGOUT_AT IS NULL OR {p}.LAST_SEEN > {p}.LOGOUT_AT)"
+)
+
+_lock = threading.Lock()
+_recent = {}                     # user_id -> time.monotonic() of last sighting queued
+_buffer = WriteBehindBuffer('presence', UPSERT_LAST_SEEN)
+
+
+def _utc_now():
+    """UTC 'YYYY-MM-DD HH:MM:SS', the CURRENT_TIMESTAMP format"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def online_cutoff():
+    """Oldest LAST_SEEN that still counts as online"""
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=PRESENCE_WINDOW_MINUTES)
+    return cutoff.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def online_condition(alias='p'):
+    """ONLINE_CONDITION for a USER_PRESENCE alias (one ? for online_cutoff())"""
+    return ONLINE_CONDITION.format(p=alias)
+
+
+def configure(flush_interval=DEFAULT_FLUSH_INTERVAL):
+    """Flush interval for activity sightings (0 = write through)"""
+    _buffer.flush_interval = flush_interval
+
+
+def record_activity(user_id):
+    """Request activity: queued at most once per PRESENCE_RESOLUTION per user"""
+    now = time.monotonic()
+    with _lock:
+        last = _recent.get(user_id)
+        if last is not None and now - last < PRESENCE_RESOLUTION:
+            return
+        _recent[user_id] = now
+    _buffer.add((user_id, _utc_now()), key=user_id)
+
+
+def record_login(db, user_id):
+    """Mark online inside the caller's login transaction"""
+    with _lock:
+        _recent[user_id] = time.monotonic()
+    db.execute(UPSERT_LOGIN, (user_id, _utc_now()))
+
+
+def record_logout(db, user_id):
+    """Mark offline inside the caller's transaction (activity from another session brings it back)"""
+    with _lock:
+        _recent.pop(user_id, None)
+    db.execute("""
+        UPDATE USER_PRESENCE SET LOGOUT_AT = ? WHERE USER_ID = ?
+    """, (_utc_now(), user_id))
+
+
+def get_online_users():
+    """Users online now, most recently seen first"""
+    db = get_read_connection()
+    try:
+        cursor = db.cursor()
+        cursor.execute(f"""
+            SELECT p.USER_ID, u.USERNAME, u.FULLNAME, u.USER_TYPE, p.LAST_SEEN
+            FROM USER_PRESENCE p
+            JOIN USER u ON p.USER_ID = u.USER_ID
+            WHERE {online_condition('p')}
+            ORDER BY p.LAST_SEEN DESC
+        """, (online_cutoff(),))
+        return [{
+            'user_id': row[0],
+            'username': row[1],
+            'fullname': row[2],
+            'user_type': row[3],
+            'last_seen': row[4]
+        } for row in cursor.fetchall()]
+    finally:
+        db.close()
+
+
+def register_presence_api(app):
+    """GET /api/admin/presence"""
+
+    @app.route('/api/admin/presence', methods=['GET'])
+    @permission_required('all')
+    def api_get_presence():
+        """Users online now (seen in the last PRESENCE_WINDOW_MINUTES)"""
+        try:
+            users = get_online_users()
+            return jsonify({
+                'success': True,
+                'data': users,
+                'total': len(users),
+                'window_minutes': PRESENCE_WINDOW_MINUTES
+            })
+        except Exception as e:
+            logger.error(f"Get presence error: {str(e)}")
+            return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
@@ -0,0 +1,258 @@
+"""
+Named Query Catalog
+Museum Management System
+
+Hot SQL statements are declared once here by name and executed through
+query_all / query_one / execute. Using one canonical SQL text per name
+keeps each statement in sqlite3's per-connection statement cache, and
+every execution is counted (calls, rows, time) per name.
+"""
+
+import threading
+import time
+
+# Statement cache size passed to sqlite3.connect(); leaves headroom above
+# the catalog for ad-hoc statements still built inline in handlers
+STATEMENT_CACHE_SIZE = 256
+
+QUERIES = {}
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def register_query(name, sql):
+    """Declare a named statement (names must be unique)"""
+    if name in QUERIES:
+        raise ValueError(f"Query already registered: {name}")
+    QUERIES[name] = sql
+    return name
+
+
+# ============================================================================
+# CUSTOMER
+# ============================================================================
+
+register_query('customer_id_by_user', """
+    SELECT CUSTOMER_ID FROM CUSTOMER WHERE USER_ID = ?
+""")
+
+# ============================================================================
+# USER / ROLE
+# ============================================================================
+
+register_query('user_for_login', """
+    SELECT u.USER_ID, u.USERNAME, u.PASSWORD, u.FULLNAME, u.EMAIL, u.PHONE,
+           u.IS_ACTIVE, u.USER_TYPE, r.ROLE_NAME, r.PERMISSIONS
+    FROM USER u
+    LEFT JOIN USER_ROLE ur ON u.USER_ID = ur.USER_ID
+    LEFT JOIN ROLE r ON ur.ROLE_ID = r.ROLE_ID
+    WHERE u.USERNAME = ? AND u.USER_TYPE = ?
+""")
+
+# first role of an active user (authorization cache, see authz.py)
+register_query('user_role_permissions', """
+    SELECT r.ROLE_NAME, r.PERMISSIONS
+    FROM USER u
+    JOIN USER_ROLE ur ON u.USER_ID = ur.USER_ID
+    JOIN ROLE r ON ur.ROLE_ID = r.ROLE_ID
+    WHERE u.USER_ID = ? AND u.IS_ACTIVE = 1
+    ORDER BY r.ROLE_ID ASC
+    LIMIT 1
+""")
+
+register_query('session_user', """
+    SELECT USER_ID FROM USER_SESSION WHERE SESSION_TOKEN = ? AND IS_ACTIVE = 1
+""")
+
+# identity carried by a server-side session (see session_store.py)
+register_query('session_identity', """
+    SELECT u.USER_ID, u.USERNAME, u.FULLNAME, u.EMAIL, u.PHONE,
+           r.ROLE_NAME, r.PERMISSIONS, u.USER_TYPE
+    FROM USER_SESSION s
+    JOIN USER u ON s.USER_ID = u.USER_ID
+    LEFT JOIN USER_ROLE ur ON u.USER_ID = ur.USER_ID
+    LEFT JOIN ROLE r ON ur.ROLE_ID = r.ROLE_ID
+    WHERE s.SESSION_TOKEN = ? AND s.IS_ACTIVE = 1 AND u.IS_ACTIVE = 1
+""")
+
+# ============================================================================
+# TICKET
+# ============================================================================
+
+register_query('ticket_type_price', """
+    SELECT PRICE, TYPE_NAME FROM TICKET_TYPE WHERE TICKET_TYPE_ID = ?
+""")
+
+# ticket + ticket_type + customer, looked up by code at the gate
+register_query('ticket_by_code', """
+    SELECT t.TICKET_ID, t.STATUS, t.CUSTOMER_ID, t.VALID_DATE,
+           c.FULLNAME, c.PHONE,
+           tt.TYPE_NAME
+    FROM TICKET t
+    JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
+    JOIN TICKET_TYPE tt ON t.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
+    WHERE t.TICKET_CODE = ?
+""")
+
+# ticket + ticket_type + customer, by id (email / receipt data)
+register_query('ticket_with_customer', """
+    SELECT t.TICKET_ID, t.TICKET_CODE, t.QUANTITY, t.TOTAL_PRICE,
+           t.VALID_DATE, t.STATUS, t.PAYMENT_METHOD,
+           tt.TYPE_NAME, tt.PRICE,
+           c.FULLNAME, c.PHONE, c.EMAIL, c.USER_ID,
+           t.PURCHASE_DATE
+    FROM TICKET t
+    JOIN TICKET_TYPE tt ON t.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
+    JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
+    WHERE t.TICKET_ID = ?
+""")
+
+# ticket + ticket_type + customer + visit, scoped to the owning customer
+register_query('customer_ticket_detail', """
+    SELECT
+        t.TICKET_ID, t.TICKET_CODE, t.QUANTITY, t.TOTAL_PRICE,
+        t.VALID_DATE, t.PURCHASE_DATE, t.STATUS, t.PAYMENT_METHOD, t.NOTES,
+        tt.TYPE_NAME, tt.PRICE, tt.DESCRIPTION,
+        c.FULLNAME, c.PHONE, c.EMAIL,
+        vh.CHECK_IN_TIME, vh.CHECK_OUT_TIME, vh.DURATION_MINUTES,
+        vh.RATING, vh.FEEDBACK
+    FROM TICKET t
+    JOIN TICKET_TYPE tt ON t.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
+    JOIN CUSTOMER c ON t.CUSTOMER_ID = c.CUSTOMER_ID
+    LEFT JOIN VISIT_HISTORY vh ON t.TICKET_ID = vh.TICKET_ID
+    WHERE t.TICKET_ID = ? AND t.CUSTOMER_ID = ?
+""")
+
+# ============================================================================
+# VISIT_HISTORY
+# ============================================================================
+
+register_query('open_visit_by_ticket', """
+    SELECT HISTORY_ID, CHECK_IN_TIME, CONSTRUCTION_ID
+    FROM VISIT_HISTORY
+    WHERE TICKET_ID = ? AND CHECK_OUT_TIME IS NULL
+""")
+
+# ============================================================================
+# ORDER
+# ============================================================================
+
+# order + customer + ticket_type, for approve / reject
+register_query('order_for_review', """
+    SELECT
+        o.ORDER_ID,
+        o.ORDER_CODE,
+        o.CUSTOMER_ID,
+        o.TICKET_TYPE_ID,
+        o.QUANTITY,
+        o.UNIT_PRICE,
+        o.TOTAL_PRICE,
+        o.STATUS,
+        c.FULLNAME,
+        c.EMAIL,
+        c.PHONE,
+        tt.TYPE_NAME
+    FROM "ORDER" o
+    JOIN CUSTOMER c ON o.CUSTOMER_ID = c.CUSTOMER_ID
+    JOIN TICKET_TYPE tt ON o.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
+    WHERE o.ORDER_ID = ?
+""")
+
+_ORDER_LIST_SELECT = """
+    SELECT
+        o.ORDER_ID,
+        o.ORDER_CODE,
+        o.STATUS,
+        o.QUANTITY,
+        o.TOTAL_PRICE,
+        o.PAYMENT_PROOF_PATH,
+        o.TRANSACTION_REF,
+        o.CREATED_AT,
+        o.UPDATED_AT,
+        c.CUSTOMER_ID,
+        c.FULLNAME as CUSTOMER_NAME,
+        c.PHONE as CUSTOMER_PHONE,
+        c.EMAIL as CUSTOMER_EMAIL,
+        tt.TYPE_NAME,
+        tt.PRICE as UNIT_PRICE,
+        o.CUSTOMER_NOTE,
+        o.BANK_NAME,
+        o.BANK_ACCOUNT,
+        o.BANK_ACCOUNT_NAME,
+        o.REJECTION_REASON,
+        u.USERNAME as CONFIRMED_BY_NAME,
+        o.CONFIRMED_AT
+    FROM "ORDER" o
+    JOIN CUSTOMER c ON o.CUSTOMER_ID = c.CUSTOMER_ID
+    JOIN TICKET_TYPE tt ON o.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
+    LEFT JOIN USER u ON o.CONFIRMED_BY = u.USER_ID
+"""
+
+# order + customer + ticket_type + confirming user (admin order list)
+register_query('order_list_all', _ORDER_LIST_SELECT + """
+    ORDER BY o.CREATED_AT DESC
+""")
+
+register_query('order_list_by_status', _ORDER_LIST_SELECT + """
+    WHERE o.STATUS = ?
+    ORDER BY o.CREATED_AT DESC
+""")
+
+# Literal status so the partial index idx_order_waiting_created_at applies
+register_query('order_list_waiting', _ORDER_LIST_SELECT + """
+    WHERE o.STATUS = 'waiting_confirmation'
+    ORDER BY o.CREATED_AT DESC
+""")
+
+
+# ============================================================================
+# EXECUTION
+# ============================================================================
+
+def _record(name, rows, elapsed):
+    with _stats_lock:
+        entry = _stats.get(name)
+        if entry is None:
+            entry = _stats[name] = {'calls': 0, 'rows': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        entry['calls'] += 1
+        entry['rows'] += rows
+        ms = elapsed * 1000
+        entry['total_ms'] += ms
+        if ms > entry['max_ms']:
+            entry['max_ms'] = ms
+
+
+def execute(db, name, params=()):
+    """Run a named statement and return the cursor (rows counted by rowcount)"""
+    start = time.perf_counter()
+    cursor = db.execute(QUERIES[name], params)
+    _record(name, max(cursor.rowcount, 0), time.perf_counter() - start)
+    return cursor
+
+
+def query_all(db, name, params=()):
+    """Run a named SELECT and return all rows"""
+    start = time.perf_counter()
+    rows = db.execute(QUERIES[name], params).fetchall()
+    _record(name, len(rows), time.perf_counter() - start)
+    return rows
+
+
+def query_one(db, name, params=()):
+    """Run a named SELECT and return the first row (or None)"""
+    start = time.perf_counter()
+    row = db.execute(QUERIES[name], params).fetchone()
+    _record(name, 0 if row is None else 1, time.perf_counter() - start)
+    return row
+
+
+def get_query_stats():
+    """Per-query counters, busiest (by total time) first"""
+    with _stats_lock:
+        snapshot = {name: dict(entry) for name, entry in _stats.items()}
+    for entry in snapshot.values():
+        entry['avg_ms'] = round(entry['total_ms'] / entry['calls'], 3) if entry['calls'] else 0.0
+        entry['total_ms'] = round(entry['total_ms'], 3)
+        entry['max_ms'] = round(entry['max_ms'], 3)
+    return dict(sorted(snapshot.items(), key=lambda item: item[1]['total_ms'], reverse=True))
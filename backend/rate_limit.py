@@ -0,0 +1,151 @@
+"""
+Rate Limit Module
+Museum Management System
+
+Token buckets for the unauthenticated auth endpoints (login, forgot
+password, register), checked before any database query or password hash.
+Buckets live in a small memory-mapped file per limiter, shared by all
+workers like the generation counters (invalidation.py). Keys hash onto a
+fixed number of slots; a slot is only handed to a new key once its old
+bucket has refilled, so a collision throttles two keys together rather
+than resetting anyone's budget.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from flask import jsonify, request
+
+from database import shared_state_path
+
+RATE_LIMIT_SLOTS = 16384
+_BUCKET = struct.Struct('<Qdd')  # key fingerprint, tokens, updated (epoch seconds)
+_HEADER = struct.Struct('<Q')    # slot 0: throttled attempts, all workers
+
+# name -> (burst, seconds to refill a full bucket); override with app.config['RATE_LIMITS']
+DEFAULT_LIMITS = {
+    'login_ip': (30, 300),
+    'login_user': (10, 600),
+    'forgot_password_ip': (5, 3600),
+    'forgot_password_email': (3, 3600),
+    'register_ip': (10, 3600),
+}
+
+
+def _fingerprint(key):
+    # Stable across workers (str hash() is randomized per process); 0 = empty slot
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class RateLimiter:
+    """Shared token buckets: burst attempts at once, refilled over period seconds"""
+
+    def __init__(self, name, burst, period, slots=RATE_LIMIT_SLOTS):
+        self.name = name
+        self.burst = burst
+        self.period = period
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+        self._pid = None
+        self._stats = {'allowed': 0, 'throttled': 0}
+
+    def _mapped(self):
+        if self._map is None or self._pid != os.getpid():
+            with self._lock:
+                if self._map is None or self._pid != os.getpid():
+                    path = shared_state_path(f"ratelimit_{self.name}")
+                    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                    size = self.slots * _BUCKET.size
+                    if os.fstat(fd).st_size < size:
+                        os.ftruncate(fd, size)
+                    self._map = mmap.mmap(fd, size)
+                    self._fd = fd
+                    self._pid = os.getpid()
+                    self._stats = {'allowed': 0, 'throttled': 0}
+        return self._map
+
+    def hit(self, key):
+        """Take one token for key; 0 if allowed, else seconds until one is available"""
+        table = self._mapped()
+        fingerprint = _fingerprint(key)
+        offset = (1 + fingerprint % (self.slots - 1)) * _BUCKET.size
+        rate = self.burst / self.period
+        now = time.time()
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            owner, tokens, updated = _BUCKET.unpack_from(table, offset)
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * rate)
+            if owner != fingerprint and (owner == 0 or tokens >= self.burst):
+                owner, tokens = fingerprint, float(self.burst)
+            if tokens >= 1:
+                _BUCKET.pack_into(table, offset, owner, tokens - 1, now)
+                retry_after = 0
+            else:
+                _BUCKET.pack_into(table, offset, owner, tokens, now)
+                _HEADER.pack_into(table, 0, _HEADER.unpack_from(table, 0)[0] + 1)
+                retry_after = max(1, math.ceil((1 - tokens) / rate))
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        with self._lock:
+            self._stats['throttled' if retry_after else 'allowed'] += 1
+        return retry_after
+
+    def stats(self):
+        table = self._mapped()
+        with self._lock:
+            stats = dict(self._stats)
+        stats['throttled_all_workers'] = _HEADER.unpack_from(table, 0)[0]
+        stats['burst'] = self.burst
+        stats['period'] = self.period
+        return stats
+
+
+limiters = {name: RateLimiter(name, burst, period) for name, (burst, period) in DEFAULT_LIMITS.items()}
+
+
+def client_ip():
+    """Client address (behind nginx this relies on ProxyFix in app.py)"""
+    return request.remote_addr or 'unknown'
+
+
+def throttle(**keys):
+    """
+    Spend one token per limiter, e.g. throttle(login_ip=ip, login_user=username).
+    Returns a 429 response if any bucket is empty, else None. Empty keys are skipped.
+    """
+    for name, key in keys.items():
+        if not key:
+            continue
+        retry_after = limiters[name].hit(str(key).strip().lower())
+        if retry_after:
+            response = jsonify({
+                'success': False,
+                'message': 'Quá nhiều yêu cầu, vui lòng thử lại sau'
+            })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+    return None
+
+
+def get_rate_limit_stats():
+    """Allowed / throttled counters per limiter (this worker, plus all-worker throttled)"""
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def init_rate_limits(app):
+    """Bucket sizes from app.config['RATE_LIMITS'] (name -> (burst, period seconds))"""
+    for name, (burst, period) in app.config.get('RATE_LIMITS', {}).items():
+        limiters[name].burst = burst
+        limiters[name].period = period
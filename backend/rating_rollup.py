@@ -0,0 +1,213 @@
+"""
+Rating Rollup Module
+Museum Management System
+
+Reads and rebuilds RATING_DAILY, the rating / feedback aggregates per
+(DAY, GUIDE_ID, TICKET_TYPE_ID) that triggers keep current on every
+VISIT_HISTORY write (migrations/add_rating_rollup.sql). Count, sum and
+sum of squares add up across rows, so average and standard deviation
+for any guide, ticket type or date range come from a few hundred rollup
+rows instead of every visit.
+
+GET /api/analytics/ratings serves them to managers.
+
+Usage: python rating_rollup.py [--rebuild]
+"""
+
+import logging
+import math
+import sys
+
+from flask import jsonify, request
+
+from auth import permission_required
+from database import get_read_connection, write_transaction
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEYS = ('DAY', 'GUIDE_ID', 'TICKET_TYPE_ID')
+ROLLUP_MEASURES = (
+    'RATINGS', 'RATING_SUM', 'RATING_SUM_SQ',
+    'STARS_1', 'STARS_2', 'STARS_3', 'STARS_4', 'STARS_5', 'FEEDBACKS',
+)
+
+# Same buckets and measures as the triggers; columns in ROLLUP_KEYS + ROLLUP_MEASURES order
+ROLLUP_SOURCE = """
+    SELECT COALESCE(DATE(vh.CHECK_IN_TIME), '') AS DAY,
+           COALESCE(vh.GUIDE_ID, 0) AS GUIDE_ID,
+           COALESCE(t.TICKET_TYPE_ID, 0) AS TICKET_TYPE_ID,
+           SUM(COALESCE(vh.RATING IN (1, 2, 3, 4, 5), 0)) AS RATINGS,
+           SUM(CASE WHEN vh.RATING IN (1, 2, 3, 4, 5) THEN vh.RATING ELSE 0 END) AS RATING_SUM,
+           SUM(CASE WHEN vh.RATING IN (1, 2, 3, 4, 5) THEN vh.RATING * vh.RATING ELSE 0 END) AS RATING_SUM_SQ,
+           SUM(vh.RATING IS 1) AS STARS_1, SUM(vh.RATING IS 2) AS STARS_2,
+           SUM(vh.RATING IS 3) AS STARS_3, SUM(vh.RATING IS 4) AS STARS_4,
+           SUM(vh.RATING IS 5) AS STARS_5,
+           SUM(COALESCE(TRIM(vh.FEEDBACK), '') <> '') AS FEEDBACKS
+    FROM VISIT_HISTORY vh
+    LEFT JOIN TICKET t ON vh.TICKET_ID = t.TICKET_ID
+    WHERE vh.RATING IN (1, 2, 3, 4, 5) OR COALESCE(TRIM(vh.FEEDBACK), '') <> ''
+    GROUP BY 1, 2, 3
+"""
+
+# Measures summed over any grouping of RATING_DAILY (alias r)
+SUMMED_MEASURES = ', '.join(f"SUM(r.{column})" for column in ROLLUP_MEASURES)
+
+
+def _nonzero_rows(source):
+    return f"""
+        SELECT {', '.join(ROLLUP_KEYS + ROLLUP_MEASURES)} FROM ({source})
+        WHERE RATINGS <> 0 OR FEEDBACKS <> 0
+    """
+
+
+# ============================================================================
+# CONSISTENCY CHECK + REBUILD
+# ============================================================================
+
+def check_rollup():
+    """Rollup rows that differ from VISIT_HISTORY (0 = consistent)"""
+    computed = _nonzero_rows(ROLLUP_SOURCE)
+    rolled = _nonzero_rows("SELECT * FROM RATING_DAILY")
+    db = get_read_connection()
+    try:
+        return db.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT * FROM ({computed} EXCEPT {rolled})
+                UNION ALL
+                SELECT * FROM ({rolled} EXCEPT {computed})
+            )
+        """).fetchone()[0]
+    finally:
+        db.close()
+
+
+def rebuild_rollup():
+    """Recompute RATING_DAILY from VISIT_HISTORY; returns the number of buckets"""
+    columns = ', '.join(ROLLUP_KEYS + ROLLUP_MEASURES)
+    with write_transaction() as db:
+        db.execute("DELETE FROM RATING_DAILY")
+        cursor = db.execute(f"INSERT INTO RATING_DAILY ({columns}) {ROLLUP_SOURCE}")
+        buckets = cursor.rowcount
+    logger.info(f"Rating rollup rebuilt: {buckets} buckets")
+    return buckets
+
+
+# ============================================================================
+# REPORT QUERIES
+# ============================================================================
+
+def summarize(row):
+    """Measures in ROLLUP_MEASURES order -> count, average, stddev, distribution"""
+    count, total, total_sq = (value or 0 for value in row[:3])
+    stars = [value or 0 for value in row[3:8]]
+    summary = {
+        'count': count,
+        'average': round(total / count, 2) if count else None,
+        'stddev': None,
+        'distribution': {str(star): stars[star - 1] for star in range(1, 6)},
+        'feedbacks': row[8] or 0,
+    }
+    if count > 1:
+        # Sample standard deviation from the running sums
+        variance = max(total_sq - total * total / count, 0) / (count - 1)
+        summary['stddev'] = round(math.sqrt(variance), 2)
+    return summary
+
+
+def rating_report(db, start_date=None, end_date=None):
+    """Overall, per guide, per ticket type and per day; dates inclusive 'YYYY-MM-DD'"""
+    conditions, params = ["r.DAY <> ''"], []
+    if start_date:
+        conditions.append("r.DAY >= DATE(?)")
+        params.append(start_date)
+    if end_date:
+        conditions.append("r.DAY < DATE(?, '+1 day')")
+        params.append(end_date)
+    where = ' AND '.join(conditions)
+
+    overall = db.execute(f"SELECT {SUMMED_MEASURES} FROM RATING_DAILY r WHERE {where}", params).fetchone()
+
+    by_guide = []
+    for row in db.execute(f"""
+        SELECT r.GUIDE_ID, u.FULLNAME, {SUMMED_MEASURES}
+        FROM RATING_DAILY r
+        LEFT JOIN USER u ON r.GUIDE_ID = u.USER_ID
+        WHERE {where}
+        GROUP BY r.GUIDE_ID
+        HAVING SUM(r.RATINGS) > 0 OR SUM(r.FEEDBACKS) > 0
+    """, params):
+        by_guide.append({'guide_id': row[0] or None, 'guide_name': row[1], **summarize(row[2:])})
+
+    by_ticket_type = []
+    for row in db.execute(f"""
+        SELECT r.TICKET_TYPE_ID, tt.TYPE_NAME, {SUMMED_MEASURES}
+        FROM RATING_DAILY r
+        LEFT JOIN TICKET_TYPE tt ON r.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
+        WHERE {where}
+        GROUP BY r.TICKET_TYPE_ID
+        HAVING SUM(r.RATINGS) > 0 OR SUM(r.FEEDBACKS) > 0
+    """, params):
+        by_ticket_type.append({'ticket_type_id': row[0] or None, 'type_name': row[1], **summarize(row[2:])})
+
+    by_day = []
+    for row in db.execute(f"""
+        SELECT r.DAY, {SUMMED_MEASURES}
+        FROM RATING_DAILY r
+        WHERE {where}
+        GROUP BY r.DAY
+        HAVING SUM(r.RATINGS) > 0 OR SUM(r.FEEDBACKS) > 0
+        ORDER BY r.DAY
+    """, params):
+        by_day.append({'date': row[0], **summarize(row[1:])})
+
+    # Best rated first; guides without ratings (feedback only) last
+    by_guide.sort(key=lambda g: (g['average'] is None, -(g['average'] or 0), -g['count']))
+    by_ticket_type.sort(key=lambda t: -t['count'])
+    return {
+        'overall': summarize(overall),
+        'by_guide': by_guide,
+        'by_ticket_type': by_ticket_type,
+        'by_day': by_day,
+    }
+
+
+# ============================================================================
+# API
+# ============================================================================
+
+def register_rating_analytics(app):
+    """GET /api/analytics/ratings?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD"""
+
+    @app.route('/api/analytics/ratings', methods=['GET'])
+    @permission_required('dashboard')
+    def api_rating_analytics():
+        """Average score, spread and star distribution per guide, ticket type and day"""
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        try:
+            db = get_read_connection()
+            try:
+                for value in (start_date, end_date):
+                    if value and db.execute("SELECT DATE(?)", (value,)).fetchone()[0] is None:
+                        return jsonify({'success': False, 'message': 'Ngày không hợp lệ (YYYY-MM-DD)'}), 400
+                data = rating_report(db, start_date, end_date)
+            finally:
+                db.close()
+            data['start_date'] = start_date
+            data['end_date'] = end_date
+            return jsonify({'success': True, 'data': data})
+        except Exception as e:
+            logger.error(f"Rating analytics error: {str(e)}")
+            return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if '--rebuild' in sys.argv[1:]:
+        print(f"✅ Rebuilt {rebuild_rollup()} rating buckets")
+    drift = check_rollup()
+    if not drift:
+        print("✅ Rating rollup matches VISIT_HISTORY")
+    else:
+        print(f"⚠️  {drift} rollup rows differ; run with --rebuild to repair")
+    sys.exit(1 if drift else 0)
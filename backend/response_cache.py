@@ -0,0 +1,209 @@
+"""
+Response Cache Module
+Museum Management System
+
+Per-worker cache for dashboard payloads that many screens poll
+(/api/statistics, /api/admin/orders/statistics). A payload younger than
+RESPONSE_CACHE_TTL is served as is; an older one is still served while
+one background thread rebuilds it (stale-while-revalidate), up to
+RESPONSE_CACHE_MAX_STALE seconds, after which the next request rebuilds
+it inline. Concurrent misses wait for a single rebuild instead of each
+running the queries. Permission checks still run on every request; only
+the payload is shared.
+
+Handlers that change the counts call invalidate_response_caches() after
+their commit; the next request rebuilds inline instead of being served
+the old payload. A request sent with Cache-Control: no-cache (a screen
+reloading right after its own action, possibly on another worker) does
+the same for its cache. Screens reloading on a live event pass ?after=
+with the event id instead: a cache created with version= remembers the
+newest event id its payload includes and rebuilds only when it is older,
+so many screens reloading on one event share one rebuild.
+
+Responses carry Age (seconds since the payload was built) and X-Cache
+(HIT / STALE / MISS).
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL = 5.0         # seconds a payload is served without a refresh
+RESPONSE_CACHE_MAX_STALE = 60.0  # seconds a stale payload may still be served
+
+_caches = {}
+_settings = {'ttl': RESPONSE_CACHE_TTL, 'max_stale': RESPONSE_CACHE_MAX_STALE}
+
+
+class ResponseCache:
+    """One cached payload, rebuilt by loader() (no arguments, no request context)
+
+    version(): optional, the newest change id (event id) committed so far;
+    read before each build, so the payload includes at least that change.
+    """
+
+    def __init__(self, name, loader, version=None):
+        self.name = name
+        self.loader = loader
+        self.version = version
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._loaded = threading.Condition(self._lock)
+        self._payload = None
+        self._built_at = None        # time.monotonic() of the last successful build
+        self._version = None         # version() read before that build
+        self._loading = False
+        self._generation = 0         # bumped by invalidate(); older builds are not fresh
+        self._stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'invalidations': 0,
+            'behind': 0,
+            'load_ms': 0.0,
+        }
+
+    def _load(self):
+        """Run the loader and store its payload (caller has set _loading)"""
+        start = time.perf_counter()
+        with self._lock:
+            generation = self._generation
+        try:
+            version = self.version() if self.version else None
+            payload = self.loader()
+        except Exception:
+            with self._lock:
+                self._loading = False
+                self._stats['refresh_failures'] += 1
+                self._loaded.notify_all()
+            raise
+        with self._lock:
+            self._payload = payload
+            self._version = version
+            # Invalidated while loading: the payload may predate the change
+            self._built_at = time.monotonic() if generation == self._generation else None
+            self._loading = False
+            self._stats['refreshes'] += 1
+            self._stats['load_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            self._loaded.notify_all()
+
+    def _refresh_in_background(self):
+        try:
+            self._load()
+        except Exception as e:
+            # Keep serving the stale payload; the next request past the TTL retries
+            logger.error(f"Response cache refresh failed ({self.name}): {str(e)}")
+
+    def get(self, min_version=None):
+        """(payload, age seconds, 'HIT' | 'STALE' | 'MISS')
+
+        min_version: rebuild unless the payload includes this change id.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+        behind = False
+        with self._lock:
+            while True:
+                age = time.monotonic() - self._built_at if self._built_at is not None else None
+                if (age is not None and min_version is not None
+                        and self._version is not None and self._version < min_version):
+                    # Built before the change the client has seen: as good as cold
+                    if not behind:
+                        self._stats['behind'] += 1
+                        behind = True
+                    age = None
+                if age is not None and age < _settings['ttl']:
+                    self._stats['hits'] += 1
+                    return self._payload, age, 'HIT'
+                if age is not None and age < _settings['ttl'] + _settings['max_stale']:
+                    self._stats['stale_hits'] += 1
+                    if not self._loading:
+                        self._loading = True
+                        threading.Thread(target=self._refresh_in_background,
+                                         name=f"cache-{self.name}", daemon=True).start()
+                    return self._payload, age, 'STALE'
+                if not self._loading:
+                    # Cold or too stale: this request rebuilds, the others wait for it
+                    self._loading = True
+                    self._stats['misses'] += 1
+                    break
+                # Another request is rebuilding; if it fails, the next waiter tries
+                self._loaded.wait()
+
+        self._load()
+        with self._lock:
+            return self._payload, 0.0, 'MISS'
+
+    def invalidate(self):
+        """Drop the payload's freshness; the next get() rebuilds inline"""
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            self._generation += 1
+            self._built_at = None
+            self._stats['invalidations'] += 1
+
+    def response(self):
+        """jsonify({'success': True, 'data': payload}) with Age / X-Cache headers
+
+        Honors Cache-Control: no-cache on the request by rebuilding first,
+        and ?after=<change id> (see get()).
+        """
+        if 'no-cache' in request.headers.get('Cache-Control', ''):
+            self.invalidate()
+        payload, age, state = self.get(request.args.get('after', type=int))
+        response = jsonify({'success': True, 'data': payload})
+        response.headers['Age'] = str(math.floor(age))
+        response.headers['X-Cache'] = state
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            age = time.monotonic() - self._built_at if self._built_at is not None else None
+        served = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / served, 4) if served else None
+        stats['age'] = round(age, 2) if age is not None else None
+        stats['pid'] = os.getpid()
+        return stats
+
+
+def response_cache(name, loader, version=None):
+    """Create (or replace) the named cache"""
+    _caches[name] = ResponseCache(name, loader, version)
+    return _caches[name]
+
+
+def invalidate_response_caches(*names):
+    """Invalidate the named caches (all when no name is given) in this worker"""
+    for name in names or list(_caches):
+        cache = _caches.get(name)
+        if cache is not None:
+            cache.invalidate()
+
+
+def get_response_cache_stats():
+    """Hits / stale hits / misses and hit rate per cache (this worker)"""
+    stats = {name: cache.stats() for name, cache in _caches.items()}
+    stats['ttl'] = _settings['ttl']
+    stats['max_stale'] = _settings['max_stale']
+    return stats
+
+
+def init_response_cache(app):
+    """TTL and stale window from app.config (RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_STALE)"""
+    _settings['ttl'] = app.config.get('RESPONSE_CACHE_TTL', RESPONSE_CACHE_TTL)
+    _settings['max_stale'] = app.config.get('RESPONSE_CACHE_MAX_STALE', RESPONSE_CACHE_MAX_STALE)
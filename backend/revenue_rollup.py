@@ -0,0 +1,281 @@
+"""
+Revenue Rollup Module
+Museum Management System
+
+Reads and rebuilds the revenue rollups kept current by triggers
+(migrations/add_revenue_rollup.sql):
+- REVENUE_DAILY: tickets, cancellations and orders per
+  (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL)
+- CUSTOMER_REVENUE: tickets and amount per customer
+
+Reports read a few hundred rollup rows per year instead of every ticket.
+The backfill recomputes one month per write transaction, so it can run
+while the app is serving; the triggers keep each month current once it
+has been rebuilt.
+
+Usage: python revenue_rollup.py [--backfill]
+"""
+
+import logging
+import sys
+import time
+
+from database import get_read_connection, write_transaction
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_PAUSE = 0.05            # seconds between months (lets other writers in)
+
+ROLLUP_COLUMNS = (
+    'DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL, TICKETS, TICKET_AMOUNT, '
+    'CANCELLED_TICKETS, CANCELLED_AMOUNT, ORDERS, ORDER_AMOUNT'
+)
+
+# Same bucket keys as the triggers; {ticket_filter} / {order_filter} pick the rows
+ROLLUP_SOURCE = """
+    SELECT DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL,
+           SUM(TICKETS) AS TICKETS, SUM(TICKET_AMOUNT) AS TICKET_AMOUNT,
+           SUM(CANCELLED_TICKETS) AS CANCELLED_TICKETS, SUM(CANCELLED_AMOUNT) AS CANCELLED_AMOUNT,
+           SUM(ORDERS) AS ORDERS, SUM(ORDER_AMOUNT) AS ORDER_AMOUNT
+    FROM (
+        SELECT COALESCE(DATE(PURCHASE_DATE), '') AS DAY,
+               COALESCE(TICKET_TYPE_ID, 0) AS TICKET_TYPE_ID,
+               COALESCE(PAYMENT_METHOD, '') AS PAYMENT_METHOD,
+               CASE WHEN ORDER_ID IS NULL THEN 'counter' ELSE 'online' END AS CHANNEL,
+               1 AS TICKETS,
+               COALESCE(TOTAL_PRICE, 0) AS TICKET_AMOUNT,
+               STATUS IS 'cancelled' AS CANCELLED_TICKETS,
+               CASE WHEN STATUS IS 'cancelled' THEN COALESCE(TOTAL_PRICE, 0) ELSE 0 END AS CANCELLED_AMOUNT,
+               0 AS ORDERS,
+               0 AS ORDER_AMOUNT
+        FROM TICKET
+        WHERE {ticket_filter}
+        UNION ALL
+        SELECT COALESCE(DATE(CREATED_AT), ''),
+               COALESCE(TICKET_TYPE_ID, 0),
+               COALESCE(PAYMENT_METHOD, ''),
+               'online',
+               0, 0, 0, 0,
+               1,
+               COALESCE(TOTAL_PRICE, 0)
+        FROM "ORDER"
+        WHERE {order_filter}
+    )
+    GROUP BY DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL
+"""
+
+# Month batches use the PURCHASE_DATE / CREATED_AT indexes; rows whose
+# date does not parse land in the '' bucket and are rebuilt separately
+MONTH_FILTER = "{column} >= ? AND {column} < ? AND DATE({column}) IS NOT NULL"
+UNDATED_FILTER = "DATE({column}) IS NULL"
+
+CUSTOMER_SOURCE = """
+    SELECT CUSTOMER_ID, COUNT(*) AS TICKETS, SUM(COALESCE(TOTAL_PRICE, 0)) AS TICKET_AMOUNT
+    FROM TICKET
+    WHERE CUSTOMER_ID IS NOT NULL
+    GROUP BY CUSTOMER_ID
+"""
+
+
+def _source(ticket_filter, order_filter):
+    return ROLLUP_SOURCE.format(
+        ticket_filter=ticket_filter.format(column='PURCHASE_DATE'),
+        order_filter=order_filter.format(column='CREATED_AT'))
+
+
+def _months(db):
+    """First days of every month with tickets or orders, as 'YYYY-MM-01'"""
+    bounds = db.execute("""
+        SELECT MIN(first), MAX(last) FROM (
+            SELECT MIN(DATE(PURCHASE_DATE, 'start of month')) AS first,
+                   MAX(DATE(PURCHASE_DATE, 'start of month')) AS last
+            FROM TICKET WHERE PURCHASE_DATE IS NOT NULL
+            UNION ALL
+            SELECT MIN(DATE(CREATED_AT, 'start of month')), MAX(DATE(CREATED_AT, 'start of month'))
+            FROM "ORDER" WHERE CREATED_AT IS NOT NULL
+        )
+    """).fetchone()
+    first, last = bounds
+    if not first:
+        return []
+    months = [first]
+    while months[-1] < last:
+        months.append(db.execute("SELECT DATE(?, '+1 month')", (months[-1],)).fetchone()[0])
+    return months
+
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+
+def _rebuild_month(start):
+    with write_transaction() as db:
+        end = db.execute("SELECT DATE(?, '+1 month')", (start,)).fetchone()[0]
+        db.execute("DELETE FROM REVENUE_DAILY WHERE DAY >= ? AND DAY < ?", (start, end))
+        cursor = db.execute(
+            f"INSERT INTO REVENUE_DAILY ({ROLLUP_COLUMNS}) {_source(MONTH_FILTER, MONTH_FILTER)}",
+            (start, end, start, end))
+        return cursor.rowcount
+
+
+def _rebuild_undated():
+    with write_transaction() as db:
+        db.execute("DELETE FROM REVENUE_DAILY WHERE DAY = ''")
+        cursor = db.execute(
+            f"INSERT INTO REVENUE_DAILY ({ROLLUP_COLUMNS}) {_source(UNDATED_FILTER, UNDATED_FILTER)}")
+        return cursor.rowcount
+
+
+def _rebuild_customers():
+    with write_transaction() as db:
+        db.execute("DELETE FROM CUSTOMER_REVENUE")
+        cursor = db.execute(
+            f"INSERT INTO CUSTOMER_REVENUE (CUSTOMER_ID, TICKETS, TICKET_AMOUNT) {CUSTOMER_SOURCE}")
+        return cursor.rowcount
+
+
+def backfill():
+    """Recompute both rollups from TICKET and "ORDER"; returns a report"""
+    start = time.perf_counter()
+    db = get_read_connection()
+    try:
+        months = _months(db)
+    finally:
+        db.close()
+
+    buckets = 0
+    for month in months:
+        buckets += _rebuild_month(month)
+        time.sleep(BACKFILL_PAUSE)
+    buckets += _rebuild_undated()
+    customers = _rebuild_customers()
+
+    # Buckets emptied by cancellations / archiving are left at zero by the triggers
+    with write_transaction() as db:
+        db.execute("DELETE FROM REVENUE_DAILY WHERE TICKETS = 0 AND ORDERS = 0")
+        db.execute("DELETE FROM CUSTOMER_REVENUE WHERE TICKETS = 0")
+
+    report = {
+        'months': len(months),
+        'buckets': buckets,
+        'customers': customers,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+    }
+    logger.info(f"Revenue rollup backfilled: {report}")
+    return report
+
+
+# ============================================================================
+# CONSISTENCY CHECK
+# ============================================================================
+
+def check_rollup():
+    """Months whose rollup totals differ from the base tables: {month: (rollup, actual)}"""
+    totals = """
+        SELECT SUBSTR(DAY, 1, 7), SUM(TICKETS), ROUND(SUM(TICKET_AMOUNT), 2),
+               SUM(CANCELLED_TICKETS), ROUND(SUM(CANCELLED_AMOUNT), 2),
+               SUM(ORDERS), ROUND(SUM(ORDER_AMOUNT), 2)
+        FROM ({source})
+        GROUP BY 1
+        HAVING SUM(TICKETS) <> 0 OR SUM(ORDERS) <> 0
+    """
+    db = get_read_connection()
+    try:
+        # One read transaction, so the rollup and the recount see the same snapshot
+        db.execute("BEGIN")
+        actual = {row[0]: tuple(row[1:]) for row in
+                  db.execute(totals.format(source=_source('1', '1')))}
+        stored = {row[0]: tuple(row[1:]) for row in
+                  db.execute(totals.format(source=f"SELECT {ROLLUP_COLUMNS} FROM REVENUE_DAILY"))}
+        customer_rows = """
+            SELECT CUSTOMER_ID, TICKETS, ROUND(TICKET_AMOUNT, 2) FROM ({source})
+            WHERE TICKETS <> 0
+        """
+        computed = customer_rows.format(source=CUSTOMER_SOURCE)
+        rolled = customer_rows.format(source="SELECT * FROM CUSTOMER_REVENUE")
+        customers = db.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT * FROM ({computed} EXCEPT {rolled})
+                UNION ALL
+                SELECT * FROM ({rolled} EXCEPT {computed})
+            )
+        """).fetchone()[0]
+        db.execute("COMMIT")
+    finally:
+        db.close()
+
+    drift = {month: (stored.get(month), actual.get(month))
+             for month in sorted(set(actual) | set(stored))
+             if stored.get(month) != actual.get(month)}
+    if customers:
+        drift['customers'] = (customers, 0)
+    return drift
+
+
+# ============================================================================
+# REPORT QUERIES
+# ============================================================================
+
+def revenue_by_day(db, start_date=None, end_date=None):
+    """[(day, tickets, ticket_amount)] newest first; dates inclusive 'YYYY-MM-DD'"""
+    conditions, params = ["DAY <> ''"], []
+    if start_date:
+        conditions.append("DAY >= DATE(?)")
+        params.append(start_date)
+    if end_date:
+        conditions.append("DAY < DATE(?, '+1 day')")
+        params.append(end_date)
+    return db.execute(f"""
+        SELECT DAY, SUM(TICKETS), SUM(TICKET_AMOUNT)
+        FROM REVENUE_DAILY
+        WHERE {' AND '.join(conditions)}
+        GROUP BY DAY
+        HAVING SUM(TICKETS) > 0
+        ORDER BY DAY DESC
+    """, params).fetchall()
+
+
+def revenue_by_ticket_type(db, start_date=None, end_date=None):
+    """[(type_name, tickets, ticket_amount)] highest revenue first"""
+    conditions, params = ["r.DAY <> ''"], []
+    if start_date:
+        conditions.append("r.DAY >= DATE(?)")
+        params.append(start_date)
+    if end_date:
+        conditions.append("r.DAY < DATE(?, '+1 day')")
+        params.append(end_date)
+    return db.execute(f"""
+        SELECT tt.TYPE_NAME, SUM(r.TICKETS), SUM(r.TICKET_AMOUNT) AS type_revenue
+        FROM REVENUE_DAILY r
+        JOIN TICKET_TYPE tt ON r.TICKET_TYPE_ID = tt.TICKET_TYPE_ID
+        WHERE {' AND '.join(conditions)}
+        GROUP BY tt.TYPE_NAME
+        HAVING SUM(r.TICKETS) > 0
+        ORDER BY type_revenue DESC
+    """, params).fetchall()
+
+
+def orders_between(db, start, end):
+    """(orders, order_amount) created in [start, end) by day, e.g. DATE('now')"""
+    return db.execute("""
+        SELECT COALESCE(SUM(ORDERS), 0), COALESCE(SUM(ORDER_AMOUNT), 0)
+        FROM REVENUE_DAILY
+        WHERE DAY >= ? AND DAY < ?
+    """, (start, end)).fetchone()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if '--backfill' in sys.argv[1:]:
+        report = backfill()
+        print(f"✅ Rebuilt {report['months']} months ({report['buckets']} buckets, "
+              f"{report['customers']} customers) in {report['elapsed_ms']} ms")
+    drift = check_rollup()
+    if not drift:
+        print("✅ Revenue rollup matches TICKET and \"ORDER\"")
+    else:
+        print(f"{'month':<12}{'rollup':<60}actual")
+        for month, (stored, actual) in drift.items():
+            print(f"{month:<12}{str(stored):<60}{actual}")
+        print("⚠️  Drift found; run with --backfill to repair")
+    sys.exit(1 if drift else 0)
@@ -0,0 +1,117 @@
+"""
+Row Encoder Module
+Museum Management System
+
+Encodes query results straight to JSON text: rows are taken from the
+cursor in chunks, encoded column by column and formatted through a
+per-mapping row template, so no dict is built per row.
+"""
+
+import json
+from functools import lru_cache
+from itertools import chain
+from json.encoder import encode_basestring_ascii
+from math import isfinite
+
+from flask import Response, stream_with_context
+
+# Rows fetched / encoded per step (also the unit of a streamed chunk)
+CHUNK_ROWS = 500
+
+
+def _encode_other(value):
+    """Non-str, non-None values: numbers as json spells them, bytes as text"""
+    if value.__class__ is float:
+        return float.__repr__(value) if isfinite(value) else json.dumps(value)
+    if isinstance(value, bytes):
+        return encode_basestring_ascii(value.decode('utf-8', 'replace'))
+    return json.dumps(value, ensure_ascii=True, default=str)
+
+
+def _encode_column(values):
+    enc = encode_basestring_ascii
+    int_repr = int.__repr__
+    return [
+        enc(v) if v.__class__ is str
+        else 'null' if v is None
+        else int_repr(v) if v.__class__ is int
+        else _encode_other(v)
+        for v in values
+    ]
+
+
+@lru_cache(maxsize=64)
+def _row_template(keys):
+    """'{"k1":%s,"k2":%s,...}' for a tuple of output keys"""
+    parts = (encode_basestring_ascii(key).replace('%', '%%') + ':%s' for key in keys)
+    return '{' + ','.join(parts) + '}'
+
+
+def _resolve_keys(keys, description):
+    """Sequence of keys (column order) or {COLUMN_NAME: key} via cursor.description"""
+    if isinstance(keys, dict):
+        return tuple(keys[col[0]] for col in description)
+    return tuple(keys)
+
+
+def iter_json_rows(rows, keys):
+    """Yield the JSON array of rows as str chunks
+
+    rows: an executed cursor (read with fetchmany, row_factory dropped to
+    plain tuples) or any sequence of row tuples.
+    keys: output key per column, or {COLUMN_NAME: key} for a cursor.
+    """
+    if hasattr(rows, 'fetchmany'):
+        cursor = rows
+        cursor.row_factory = None
+        key_tuple = _resolve_keys(keys, cursor.description)
+        chunks = iter(lambda: cursor.fetchmany(CHUNK_ROWS), [])
+    else:
+        key_tuple = tuple(keys)
+        rows = list(rows)
+        chunks = (rows[i:i + CHUNK_ROWS] for i in range(0, len(rows), CHUNK_ROWS))
+
+    template = _row_template(key_tuple)
+    width = len(key_tuple)
+    first = True
+    for chunk in chunks:
+        columns = [_encode_column(col) for col in zip(*chunk)]
+        if len(columns) != width:
+            raise ValueError(f"Row has {len(columns)} columns, expected {width} keys")
+        body = ','.join([template % values for values in zip(*columns)])
+        yield ('[' if first else ',') + body
+        first = False
+    yield '[]' if first else ']'
+
+
+def encode_rows(rows, keys):
+    """Whole JSON array as str"""
+    return ''.join(iter_json_rows(rows, keys))
+
+
+def json_rows_response(rows, keys, envelope=None, data_key='data', stream=False, on_close=None):
+    """Response '{...envelope, "data": [rows]}' encoded without per-row dicts
+
+    stream=True sends the array in chunks as rows are fetched (the cursor's
+    connection must stay open: pass its close as on_close).
+    """
+    head = json.dumps(envelope or {}, ensure_ascii=True, separators=(',', ':'))[:-1]
+    head += (',' if len(head) > 1 else '') + encode_basestring_ascii(data_key) + ':'
+
+    if not stream:
+        try:
+            body = head + encode_rows(rows, keys) + '}'
+        finally:
+            if on_close is not None:
+                on_close()
+        return Response(body, mimetype='application/json')
+
+    def generate():
+        try:
+            for part in chain((head,), iter_json_rows(rows, keys), ('}',)):
+                yield part
+        finally:
+            if on_close is not None:
+                on_close()
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
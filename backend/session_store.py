@@ -0,0 +1,189 @@
+"""
+Session Store Module
+Museum Management System
+
+Server-side sessions keyed by USER_SESSION.SESSION_TOKEN. The cookie
+carries only the token; the session contents are the user's identity
+(role, permissions, email, phone, ...), loaded from USER_SESSION / USER /
+ROLE once and kept in a per-worker LRU. An entry is trusted while the
+user's generation (invalidation.py) is unchanged, so logout, deactivation
+and role or profile changes take effect in every worker on the next
+request, and a normal request does not touch the database.
+"""
+
+import threading
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from database import get_read_connection
+from invalidation import user_generation, invalidate_user
+from queries import query_one
+
+SESSION_CACHE_SIZE = 4096        # sessions cached per worker
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers the token it was loaded from"""
+
+    def __init__(self, initial=None, token=None):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.token = token
+        self.modified = False
+
+
+class SessionCache:
+    """token -> (identity, user_id, generation), least recently used evicted"""
+
+    def __init__(self, size=SESSION_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'revoked': 0}
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(token)
+        if user_generation(entry[1]) != entry[2]:
+            with self._lock:
+                self._stats['stale'] += 1
+                self._entries.pop(token, None)
+            return None
+        with self._lock:
+            self._stats['hits'] += 1
+        return entry[0]
+
+    def put(self, token, identity, user_id, generation):
+        with self._lock:
+            self._entries[token] = (identity, user_id, generation)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def pop(self, token, revoked=False):
+        with self._lock:
+            if revoked:
+                self._stats['revoked'] += 1
+            return self._entries.pop(token, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['capacity'] = self.size
+        lookups = stats['hits'] + stats['misses'] + stats['stale']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache = SessionCache()
+
+
+def _identity_from_row(row, token):
+    """Session contents, as set at login"""
+    return {
+        'user_id': row['USER_ID'],
+        'username': row['USERNAME'],
+        'fullname': row['FULLNAME'] or row['USERNAME'],
+        'email': row['EMAIL'],
+        'phone': row['PHONE'],
+        'role': row['ROLE_NAME'],
+        'user_type': row['USER_TYPE'],
+        'permissions': row['PERMISSIONS'].split(',') if row['PERMISSIONS'] else [],
+        'session_token': token
+    }
+
+
+def load_identity(token):
+    """Identity for an active session token (cache first), or None"""
+    identity = _cache.get(token)
+    if identity is not None:
+        return dict(identity)
+
+    db = get_read_connection()
+    try:
+        user_id = query_one(db, 'session_user', (token,))
+        if user_id is None:
+            return None
+        # Generation taken before the identity is read: an invalidation
+        # that lands in between leaves this entry stale, never wrong
+        generation = user_generation(user_id[0])
+        row = query_one(db, 'session_identity', (token,))
+    finally:
+        db.close()
+    if row is None:
+        return None
+    identity = _identity_from_row(row, token)
+    _cache.put(token, identity, row['USER_ID'], generation)
+    return dict(identity)
+
+
+def revoke_session(token, user_id=None):
+    """Forget a session now (after USER_SESSION is marked inactive)"""
+    _cache.pop(token, revoked=True)
+    if user_id is not None:
+        invalidate_user(user_id)
+
+
+def get_session_cache_stats():
+    """Session cache counters for this worker"""
+    return _cache.stats()
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface backed by USER_SESSION + the session cache"""
+
+    def open_session(self, app, request):
+        token = request.cookies.get(self.get_cookie_name(app))
+        if not token:
+            return ServerSession()
+        identity = load_identity(token)
+        if identity is None:
+            # Unknown, logged-out or deactivated: empty session, cookie dropped on save
+            return ServerSession(token=token)
+        return ServerSession(identity, token=token)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        token = session.get('session_token')
+        if not token:
+            # Only logged-in identities are stored server-side
+            if session.token is not None:
+                _cache.pop(session.token)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        response.vary.add('Cookie')
+        if token != session.token or session.modified:
+            user_id = session['user_id']
+            _cache.put(token, dict(session), user_id, user_generation(user_id))
+        if token != session.token or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name, token,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+
+def init_session_store(app):
+    """Use server-side sessions for app"""
+    _cache.size = app.config.get('SESSION_CACHE_SIZE', _cache.size)
+    app.session_interface = ServerSessionInterface()
@@ -15,6 +15,8 @@ import logging
 from flask import jsonify, request, session
 from functools import wraps
 
+from authz import get_role
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -26,10 +28,10 @@ def admin_only(f):
     """Decorator to ensure only Admin can access"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'role' not in session:
+        if 'user_id' not in session:
             return jsonify({'success': False, 'message': 'Unauthorized'}), 401
         
-        if session.get('role') != 'Admin':
+        if get_role(session['user_id']) != 'Admin':
             logger.warning(f"Non-admin user {session.get('username')} tried to access SQL console")
             return jsonify({'success': False, 'message': 'Admin only'}), 403
         
@@ -0,0 +1,259 @@
+"""
+Visit Analytics Module
+Museum Management System
+
+Dwell time and throughput over any date range (GET /api/analytics/visits):
+duration percentiles and distribution, arrivals / departures per hour of
+day, peak concurrency and a per-day series.
+
+Check-in / check-out times are loaded in bulk as NumPy arrays: SQLite
+concatenates the fixed-width timestamps into one string (read from the
+covering index in migrations/add_visit_analytics.sql) and the digits are
+converted to epoch seconds in a few vectorized passes. Converting
+timestamps row by row in SQL or Python costs several times more than
+everything else combined.
+
+Timestamps are stored in UTC (CURRENT_TIMESTAMP); date ranges and hours
+are reported in museum local time (ANALYTICS_UTC_OFFSET_HOURS).
+"""
+
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from flask import jsonify, request
+
+from auth import permission_required
+from database import get_read_connection
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_UTC_OFFSET_HOURS = 7       # museum local time (Asia/Ho_Chi_Minh, no DST)
+ANALYTICS_DEFAULT_DAYS = 30          # range when no dates are given
+DURATION_PERCENTILES = (50, 75, 90, 95, 99)
+DURATION_BINS = (0, 15, 30, 45, 60, 90, 120, 180, 240)   # minutes; last bin is open-ended
+
+TIMESTAMP_WIDTH = 19                 # 'YYYY-MM-DD HH:MM:SS'
+MISSING = '0000-00-00 00:00:00'      # parses to month 0 = invalid
+
+# One string of (check-in, check-out) pairs; {where} picks the visits
+LOAD_VISITS = f"""
+    SELECT COUNT(*), group_concat(CHECK_IN_TIME || COALESCE(CHECK_OUT_TIME, '{MISSING}'), '')
+    FROM VISIT_HISTORY
+    WHERE {{where}}
+"""
+
+# Same, forcing every value to the fixed width (used when some timestamp is not)
+LOAD_VISITS_PADDED = f"""
+    SELECT COUNT(*), group_concat(
+        CASE WHEN length(CHECK_IN_TIME) >= {TIMESTAMP_WIDTH}
+             THEN substr(CHECK_IN_TIME, 1, {TIMESTAMP_WIDTH}) ELSE '{MISSING}' END ||
+        CASE WHEN length(CHECK_OUT_TIME) >= {TIMESTAMP_WIDTH}
+             THEN substr(CHECK_OUT_TIME, 1, {TIMESTAMP_WIDTH}) ELSE '{MISSING}' END, '')
+    FROM VISIT_HISTORY
+    WHERE {{where}}
+"""
+
+# Digit positions in 'YYYY-MM-DD HH:MM:SS'
+_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+
+_settings = {'utc_offset_hours': ANALYTICS_UTC_OFFSET_HOURS}
+
+
+def _to_epoch(chars):
+    """uint8 array (..., 19) of timestamps -> epoch seconds; -1 where unparseable"""
+    d = chars[..., _DIGITS] - np.uint8(48)          # non-digits wrap above 9
+    valid = (d <= 9).all(axis=-1)
+    d = d.astype(np.int32)
+    year = d[..., 0] * 1000 + d[..., 1] * 100 + d[..., 2] * 10 + d[..., 3]
+    month = d[..., 4] * 10 + d[..., 5]
+    day = d[..., 6] * 10 + d[..., 7]
+    seconds = (d[..., 8] * 10 + d[..., 9]) * 3600 + (d[..., 10] * 10 + d[..., 11]) * 60 \
+        + d[..., 12] * 10 + d[..., 13]
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+
+    # Days since 1970-01-01 (proleptic Gregorian, years starting in March)
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+    return np.where(valid, days.astype(np.int64) * 86400 + seconds, -1)
+
+
+def load_visits(db, where, params=()):
+    """(check_in, check_out) epoch-second arrays; check_out is -1 for open visits"""
+    count, text = db.execute(LOAD_VISITS.format(where=where), params).fetchone()
+    if not count:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    if text is None or len(text) != count * 2 * TIMESTAMP_WIDTH:
+        count, text = db.execute(LOAD_VISITS_PADDED.format(where=where), params).fetchone()
+    # 'replace' keeps one byte per character, so the fixed width holds
+    chars = np.frombuffer(text.encode('ascii', 'replace'), dtype=np.uint8)
+    epochs = _to_epoch(chars.reshape(count, 2, TIMESTAMP_WIDTH))
+    return epochs[:, 0], epochs[:, 1]
+
+
+def _utc(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+# ============================================================================
+# ANALYSIS
+# ============================================================================
+
+def _durations(check_in, check_out):
+    """Completed visit lengths in minutes"""
+    done = (check_in >= 0) & (check_out >= check_in)
+    return (check_out[done] - check_in[done]) / 60.0
+
+
+def _duration_summary(minutes):
+    if not minutes.size:
+        return None, None
+    values = np.percentile(minutes, DURATION_PERCENTILES)
+    summary = {f"p{p}": round(float(v), 1) for p, v in zip(DURATION_PERCENTILES, values)}
+    summary.update({
+        'mean': round(float(minutes.mean()), 1),
+        'min': round(float(minutes.min()), 1),
+        'max': round(float(minutes.max()), 1),
+    })
+    bins = np.searchsorted(np.array(DURATION_BINS[1:]), minutes, side='right')
+    histogram = {
+        'bins': list(DURATION_BINS),
+        'counts': np.bincount(bins, minlength=len(DURATION_BINS)).tolist(),
+    }
+    return summary, histogram
+
+
+def _hour_histogram(epochs, offset):
+    hours = ((epochs + offset) // 3600) % 24
+    return np.bincount(hours, minlength=24).tolist()
+
+
+def _concurrency(check_in, check_out, earlier_out, end, offset):
+    """Peak visitors inside, and [(epoch day, peak)] for days with arrivals or departures
+
+    earlier_out: check-out times (-1 = still open) of visitors who arrived
+    before the range and were still inside when it started.
+    """
+    inside_at_start = int(earlier_out.size)
+    arrived = check_in >= 0
+    left = arrived & (check_out >= 0)
+    leaving = np.concatenate([np.maximum(check_out[left], check_in[left]), earlier_out])
+    leaving = leaving[(leaving >= 0) & (leaving < end)]
+    arrivals = check_in[arrived]
+
+    times = np.concatenate([arrivals, leaving])
+    deltas = np.concatenate([np.ones(arrivals.size, dtype=np.int64),
+                             -np.ones(leaving.size, dtype=np.int64)])
+    if not times.size:
+        return {'visitors': inside_at_start, 'at': None}, []
+
+    # Departures before arrivals at the same second
+    order = np.argsort(times * 2 + (deltas > 0))
+    times = times[order]
+    level = inside_at_start + np.cumsum(deltas[order])
+
+    top = int(level.argmax())
+    peak = {'visitors': inside_at_start, 'at': None}
+    if level[top] > inside_at_start:
+        at = datetime.fromtimestamp(int(times[top]) + offset, timezone.utc)
+        peak = {'visitors': int(level[top]), 'at': at.strftime('%Y-%m-%d %H:%M:%S')}
+
+    days = (times + offset) // 86400
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    return peak, list(zip(days[starts].tolist(), np.maximum.reduceat(level, starts).tolist()))
+
+
+def analyze_visits(db, start_date, end_date):
+    """Statistics for visits checked in between two local dates (inclusive)"""
+    started = time.perf_counter()
+    offset = _settings['utc_offset_hours'] * 3600
+    local = timezone(timedelta(seconds=offset))
+    range_start = datetime.combine(start_date, datetime.min.time(), local)
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time(), local)
+    start_utc = _utc(range_start.astimezone(timezone.utc))
+    end_utc = _utc(range_end.astimezone(timezone.utc))
+    end = int(min(range_end, datetime.now(timezone.utc)).timestamp())
+
+    check_in, check_out = load_visits(
+        db, "CHECK_IN_TIME >= ? AND CHECK_IN_TIME < ?", (start_utc, end_utc))
+    # Visitors already inside when the range starts
+    _, earlier_out = load_visits(
+        db, "CHECK_IN_TIME < ? AND (CHECK_OUT_TIME IS NULL OR CHECK_OUT_TIME >= ?)",
+        (start_utc, start_utc))
+
+    arrived = check_in[check_in >= 0]
+    departed = np.concatenate([check_out[(check_in >= 0) & (check_out >= 0)], earlier_out[earlier_out >= 0]])
+    departed = departed[(departed >= range_start.timestamp()) & (departed < end)]
+    minutes = _durations(check_in, check_out)
+    summary, histogram = _duration_summary(minutes)
+    peak, daily_peaks = _concurrency(check_in, check_out, earlier_out, end, offset)
+
+    day_numbers, day_arrivals = np.unique((arrived + offset) // 86400, return_counts=True)
+    arrivals_by_day = dict(zip(day_numbers.tolist(), day_arrivals.tolist()))
+    epoch_day = date(1970, 1, 1)
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'utc_offset_hours': _settings['utc_offset_hours'],
+        'visits': int(arrived.size),
+        'completed': int(minutes.size),
+        'open': int(((check_in >= 0) & (check_out < 0)).sum()),
+        'duration_minutes': summary,
+        'duration_histogram': histogram,
+        'arrivals_by_hour': _hour_histogram(arrived, offset),
+        'departures_by_hour': _hour_histogram(departed, offset),
+        'peak_concurrency': peak,
+        'daily': [{
+            'date': (epoch_day + timedelta(days=day)).isoformat(),
+            'arrivals': arrivals_by_day.get(day, 0),
+            'peak': day_peak,
+        } for day, day_peak in daily_peaks],
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+# ============================================================================
+# API
+# ============================================================================
+
+def _parse_date(value, default):
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def register_visit_analytics(app):
+    """GET /api/analytics/visits?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD"""
+    _settings['utc_offset_hours'] = app.config.get('ANALYTICS_UTC_OFFSET_HOURS', ANALYTICS_UTC_OFFSET_HOURS)
+
+    @app.route('/api/analytics/visits', methods=['GET'])
+    @permission_required('dashboard')
+    def api_visit_analytics():
+        """Dwell time, hourly throughput and peak concurrency for a date range"""
+        today = datetime.now(timezone(timedelta(hours=_settings['utc_offset_hours']))).date()
+        try:
+            end_date = _parse_date(request.args.get('end_date'), today)
+            start_date = _parse_date(request.args.get('start_date'),
+                                     end_date - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Ngày không hợp lệ (YYYY-MM-DD)'}), 400
+        if start_date > end_date:
+            return jsonify({'success': False, 'message': 'Ngày bắt đầu phải trước ngày kết thúc'}), 400
+
+        try:
+            db = get_read_connection()
+            try:
+                data = analyze_visits(db, start_date, end_date)
+            finally:
+                db.close()
+            return jsonify({'success': True, 'data': data})
+        except Exception as e:
+            logger.error(f"Visit analytics error: {str(e)}")
+            return jsonify({'success': False, 'message': f'Lỗi: {str(e)}'}), 500
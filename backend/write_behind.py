@@ -0,0 +1,137 @@
+"""
+Write-Behind Module
+Museum Management System
+
+Buffers small, frequent writes in memory and applies them in one
+executemany on a background flush (every few seconds, when the buffer
+grows past a limit, and at process exit). With a key, only the latest
+parameters per key are kept, so repeated updates of the same row
+coalesce into one.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from database import write_transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 5.0     # seconds
+DEFAULT_MAX_PENDING = 1000       # flush early past this many buffered rows
+
+_buffers = []
+
+
+class WriteBehindBuffer:
+    """Coalescing buffer for one parameterized statement"""
+
+    def __init__(self, name, sql, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_pending=DEFAULT_MAX_PENDING):
+        self.name = name
+        self.sql = sql
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+        _buffers.append(self)
+
+    def _reset(self):
+        # Called again in a forked worker: the parent's rows and thread stay behind
+        self._pid = os.getpid()
+        self._pending = {}
+        self._seq = 0
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stats = {
+            'queued': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'failed_flushes': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def add(self, params, key=None):
+        """Queue one row of parameters (replacing any pending row with the same key)"""
+        if self.flush_interval <= 0:
+            self._write([params])
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if key is None:
+                self._seq += 1
+                key = (None, self._seq)
+            elif key in self._pending:
+                self._stats['coalesced'] += 1
+            self._pending[key] = params
+            self._stats['queued'] += 1
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"write-behind-{self.name}", daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                if self._pid != os.getpid() or not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+            start = time.perf_counter()
+            try:
+                self._write(list(batch.values()))
+            except Exception as e:
+                # Keep the rows for the next flush, unless newer ones replaced them
+                with self._lock:
+                    for key, params in batch.items():
+                        self._pending.setdefault(key, params)
+                    self._stats['failed_flushes'] += 1
+                logger.error(f"Write-behind flush failed ({self.name}): {str(e)}")
+                return 0
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['rows_written'] += len(batch)
+                self._stats['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            return len(batch)
+
+    def _write(self, rows):
+        with write_transaction() as db:
+            db.executemany(self.sql, rows)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending) if self._pid == os.getpid() else 0
+        stats['flush_interval'] = self.flush_interval
+        return stats
+
+
+def flush_all():
+    """Flush every buffer (process exit / shutdown)"""
+    for buffer in _buffers:
+        try:
+            buffer.flush()
+        except Exception as e:
+            logger.error(f"Write-behind flush failed ({buffer.name}): {str(e)}")
+
+
+def get_write_behind_stats():
+    """Per-buffer counters for this worker"""
+    return {buffer.name: buffer.stats() for buffer in _buffers}
+
+
+atexit.register(flush_all)
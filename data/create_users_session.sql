@@ -23,16 +23,8 @@ CREATE INDEX IF NOT EXISTS idx_session_token ON USER_SESSION(SESSION_TOKEN);
 CREATE INDEX IF NOT EXISTS idx_session_active ON USER_SESSION(IS_ACTIVE);
 CREATE INDEX IF NOT EXISTS idx_session_last_activity ON USER_SESSION(LAST_ACTIVITY);
 
--- Trigger: Auto update LAST_ACTIVITY
-CREATE TRIGGER IF NOT EXISTS update_session_activity
-AFTER UPDATE ON USER_SESSION
-FOR EACH ROW
-WHEN NEW.IS_ACTIVE = 1 AND OLD.LAST_ACTIVITY = NEW.LAST_ACTIVITY
-BEGIN
-    UPDATE USER_SESSION
-    SET LAST_ACTIVITY = CURRENT_TIMESTAMP
-    WHERE SESSION_ID = NEW.SESSION_ID;
-END;
+-- LAST_ACTIVITY is set by the backend (batched, see backend/write_behind.py);
+-- no trigger, so each update is a single write
 
 -- View: Active sessions
 CREATE VIEW IF NOT EXISTS v_active_sessions AS
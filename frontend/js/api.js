@@ -93,8 +93,9 @@ const API = {
         return this.request('/api/attractions' + query);
     },
 
-    getStatistics() {
-        return this.request('/api/statistics');
+    // afterEventId: số liệu phải bao gồm sự kiện live này (server dựng lại bộ đệm nếu cũ hơn)
+    getStatistics(afterEventId = null) {
+        return this.request('/api/statistics' + (afterEventId ? `?after=${afterEventId}` : ''));
     }
 };
 
@@ -19,6 +19,11 @@ const CheckoutManager = {
         console.log('Checkout Manager initialized - Option C');
         this.setupEventListeners();
         await this.loadActiveCheckouts();
+
+        // Danh sách đang tham quan thay đổi khi có check-in / check-out
+        if (typeof LiveFeed !== 'undefined') {
+            LiveFeed.on('checkout', ['checkin', 'checkout'], () => this.loadActiveCheckouts(true));
+        }
     },
 
     setupEventListeners() {
@@ -38,8 +43,9 @@ const CheckoutManager = {
         }
     },
 
-    async loadActiveCheckouts() {
-        showLoading();
+    async loadActiveCheckouts(quiet = false) {
+        // quiet: tải lại từ live feed, không hiện loading và giữ trang hiện tại
+        if (!quiet) showLoading();
         try {
             const response = await fetch(`/api/checkout/active`, {
                 credentials: 'include'
@@ -51,7 +57,9 @@ const CheckoutManager = {
             if (data.success) {
                 this.customers = data.data || [];
                 console.log('Loaded customers:', this.customers.length);
-                this.currentPage = 1;
+                // Giữ trang đang xem, trừ khi danh sách đã ngắn lại
+                const lastPage = Math.max(1, Math.ceil(this.customers.length / this.itemsPerPage));
+                this.currentPage = quiet ? Math.min(this.currentPage, lastPage) : 1;
                 this.renderCustomerList();
             } else {
                 throw new Error(data.message || 'Lỗi tải danh sách');
@@ -8,6 +8,12 @@ const DashboardManager = {
         this.setupTimeFilters();
         await this.loadStatistics();
         await this.loadCharts();
+
+        // Cập nhật số liệu khi có check-in / check-out / đơn hàng mới
+        if (typeof LiveFeed !== 'undefined') {
+            LiveFeed.on('dashboard', ['checkin', 'checkout', 'order_approved'],
+                (event, data, eventId) => this.loadStatistics(eventId));
+        }
     },
     
     setupTimeFilters() {
@@ -22,9 +28,9 @@ const DashboardManager = {
         });
     },
     
-    async loadStatistics() {
+    async loadStatistics(afterEventId = null) {
         try {
-            const response = await API.getStatistics();
+            const response = await API.getStatistics(afterEventId);
             console.log('Statistics response:', response);
             
             if (response.success && response.data && response.data.overview) {
@@ -0,0 +1,73 @@
+// ==========================================
+// LIVE.JS - Live feed (Server-Sent Events)
+// Một kết nối /api/stream cho cả trang; các manager đăng ký
+// sự kiện cần theo dõi thay vì tự gọi lại API theo chu kỳ
+// ==========================================
+
+const LiveFeed = {
+    source: null,
+    listening: new Set(),
+    subscriptions: {},
+    reconnectTimer: null,
+    RECONNECT_DELAY: 30000,   // khi server từ chối (403 / 503): thử lại sau 30s
+    DEBOUNCE: 500,            // gom nhiều sự kiện liên tiếp thành một lần tải lại
+
+    /**
+     * Đăng ký handler cho các sự kiện; gọi lại cùng name sẽ thay handler cũ
+     * (các manager có thể init() nhiều lần khi chuyển trang)
+     * 'resync' luôn được chuyển tới mọi handler: dữ liệu cần tải lại toàn bộ
+     */
+    on(name, events, handler) {
+        const previous = this.subscriptions[name];
+        if (previous) clearTimeout(previous.timer);
+
+        this.subscriptions[name] = { events, handler, timer: null };
+        this.connect();
+        events.forEach(event => this.listen(event));
+    },
+
+    connect() {
+        if (this.source || typeof EventSource === 'undefined') return;
+
+        this.source = new EventSource('/api/stream?channels=gate,orders', { withCredentials: true });
+        this.listening = new Set();
+        this.listen('resync');
+        Object.values(this.subscriptions).forEach(sub => sub.events.forEach(event => this.listen(event)));
+
+        this.source.onerror = () => {
+            // Lỗi mạng: trình duyệt tự kết nối lại với Last-Event-ID
+            // HTTP lỗi (401 / 403 / 503): EventSource đóng hẳn, tự thử lại sau
+            if (this.source && this.source.readyState === EventSource.CLOSED) {
+                this.source = null;
+                clearTimeout(this.reconnectTimer);
+                this.reconnectTimer = setTimeout(() => this.connect(), this.RECONNECT_DELAY);
+            }
+        };
+    },
+
+    listen(event) {
+        if (!this.source || this.listening.has(event)) return;
+        this.listening.add(event);
+
+        this.source.addEventListener(event, (e) => {
+            let data = {};
+            try {
+                data = JSON.parse(e.data);
+            } catch (error) {
+                console.error('Live feed parse error:', error);
+            }
+            this.dispatch(event, data, Number(e.lastEventId) || null);
+        });
+    },
+
+    // eventId: id của sự kiện (handler gửi kèm ?after= để server không trả số liệu cũ hơn)
+    dispatch(event, data, eventId) {
+        Object.values(this.subscriptions).forEach(sub => {
+            if (event !== 'resync' && !sub.events.includes(event)) return;
+            clearTimeout(sub.timer);
+            sub.timer = setTimeout(() => sub.handler(event, data, eventId), this.DEBOUNCE);
+        });
+    }
+};
+
+console.log('Live.js loaded successfully');
@@ -12,6 +12,14 @@ const OrderManager = {
         this.loadOrders();
         this.loadStatistics();
         this.checkSession();
+
+        // Đơn mới / đã thanh toán / đã duyệt: tải lại thay vì bấm Làm mới
+        if (typeof LiveFeed !== 'undefined') {
+            LiveFeed.on('orders', ['order_created', 'order_submitted', 'order_approved', 'order_rejected'], (event, data, eventId) => {
+                this.loadOrders(true);
+                this.loadStatistics({ after: eventId });
+            });
+        }
     },
 
     async checkSession() {
@@ -61,10 +69,15 @@ const OrderManager = {
         }
     },
 
-    async loadStatistics() {
+    /**
+     * fresh: bỏ qua bộ đệm thống kê của server (ngay sau thao tác duyệt / từ chối)
+     * after: id sự kiện live; server chỉ dựng lại bộ đệm nếu số liệu cũ hơn sự kiện đó
+     */
+    async loadStatistics({ fresh = false, after = null } = {}) {
         try {
-            const response = await fetch('/api/admin/orders/statistics', {
-                credentials: 'include'
+            const response = await fetch('/api/admin/orders/statistics' + (after ? `?after=${after}` : ''), {
+                credentials: 'include',
+                headers: fresh ? { 'Cache-Control': 'no-cache' } : {}
             });
             const data = await response.json();
 
@@ -86,8 +99,8 @@ const OrderManager = {
         }
     },
 
-    async loadOrders() {
-        showLoading();
+    async loadOrders(quiet = false) {
+        if (!quiet) showLoading();
         try {
             const response = await fetch('/api/admin/orders/list?status=all', {
                 credentials: 'include'
@@ -362,7 +375,7 @@ const OrderManager = {
                 showToast('Đã duyệt đơn hàng thành công', 'success');
                 closeModal();
                 this.loadOrders();
-                this.loadStatistics();
+                this.loadStatistics({ fresh: true });
             } else {
                 showToast(data.message || 'Duyệt đơn hàng thất bại', 'error');
             }
@@ -429,7 +442,7 @@ const OrderManager = {
                 showToast('Đã từ chối đơn hàng', 'success');
                 closeRejectModal();
                 this.loadOrders();
-                this.loadStatistics();
+                this.loadStatistics({ fresh: true });
                 this.currentRejectOrderId = null;
             } else {
                 showToast(data.message || 'Từ chối đơn hàng thất bại', 'error');
@@ -0,0 +1,16 @@
+-- ========================================
+-- USER_ACTIVITY_LOG INDEXES
+-- Museum Management System
+-- ========================================
+-- The audit view (GET /api/admin/activity-log) lists the newest events,
+-- optionally for one user; the maintenance reaper rolls rows older than
+-- 90 days into monthly USER_ACTIVITY_LOG_YYYYMM tables by CREATED_AT.
+-- Rows are inserted in batches by backend/activity_log.py.
+
+CREATE INDEX IF NOT EXISTS idx_user_activity_log_created
+ON USER_ACTIVITY_LOG(CREATED_AT);
+
+CREATE INDEX IF NOT EXISTS idx_user_activity_log_user_created
+ON USER_ACTIVITY_LOG(USER_ID, CREATED_AT);
+
+PRAGMA optimize;
@@ -0,0 +1,51 @@
+-- Museum System - Recommended indexes
+-- Generated by backend/index_advisor.py on 2026-10-18 08:43
+-- Every index below was verified with EXPLAIN QUERY PLAN to remove a
+-- full table scan or temp B-tree from at least one backend query.
+
+-- ============================================================================
+-- ORDER(STATUS, CREATED_AT)
+--   used by queries.py:order_list_by_status
+-- ============================================================================
+CREATE INDEX IF NOT EXISTS idx_order_status_created_at ON "ORDER"(STATUS, CREATED_AT);
+
+-- ============================================================================
+-- TICKET(CUSTOMER_ID, STATUS, PURCHASE_DATE)
+--   used by database.py:get_active_tickets
+-- ============================================================================
+CREATE INDEX IF NOT EXISTS idx_ticket_customer_id_status_purchase_date ON TICKET(CUSTOMER_ID, STATUS, PURCHASE_DATE);
+
+-- ============================================================================
+-- USER_ROLE(ROLE_ID, USER_ID)
+--   used by app.py:api_admin_change_user_role
+--   used by app.py:api_auth_verify
+--   used by app.py:api_get_admin_users
+--   used by app.py:api_get_all_users
+--   used by app.py:api_get_user
+--   used by auth.py:get_user_role
+-- ============================================================================
+CREATE INDEX IF NOT EXISTS idx_user_role_role_id_user_id ON USER_ROLE(ROLE_ID, USER_ID);
+
+-- ============================================================================
+-- VISIT_HISTORY(CHECK_IN_TIME)
+--   used by app.py:api_get_visit_history
+-- ============================================================================
+CREATE INDEX IF NOT EXISTS idx_visit_history_check_in_time ON VISIT_HISTORY(CHECK_IN_TIME);
+
+-- ============================================================================
+-- VISIT_HISTORY(CHECK_OUT_TIME, CHECK_IN_TIME)
+--   used by app.py:api_get_active_checkout
+--   used by app.py:api_get_active_visits
+-- ============================================================================
+CREATE INDEX IF NOT EXISTS idx_visit_history_check_out_time_check_in_time ON VISIT_HISTORY(CHECK_OUT_TIME, CHECK_IN_TIME);
+
+-- ============================================================================
+-- VISIT_HISTORY(TICKET_ID, CHECK_OUT_TIME, CHECK_IN_TIME)
+--   used by app.py:api_get_customer_tickets
+--   used by queries.py:customer_ticket_detail
+--   used by queries.py:open_visit_by_ticket
+-- ============================================================================
+CREATE INDEX IF NOT EXISTS idx_visit_history_ticket_id_check_out_time_check_in_time ON VISIT_HISTORY(TICKET_ID, CHECK_OUT_TIME, CHECK_IN_TIME);
+
+-- Refresh planner statistics for the new indexes
+PRAGMA optimize;
@@ -0,0 +1,42 @@
+-- ========================================
+-- ARCHIVE TABLES FOR THE MAINTENANCE REAPER
+-- Museum Management System
+-- ========================================
+-- backend/maintenance.py moves old rows out of the live tables in small
+-- batches so the indexes touched by every login, session check and order
+-- listing stay small:
+--   USER_SESSION  ended more than 30 days ago       -> USER_SESSION_ARCHIVE
+--   "ORDER"       cancelled / rejected / expired,
+--                 untouched for 180 days, no tickets -> ORDER_ARCHIVE
+--   PAYMENT_LOG   rows of those orders               -> PAYMENT_LOG_ARCHIVE
+-- Archive tables copy the live columns (same order) plus ARCHIVED_AT.
+
+CREATE TABLE IF NOT EXISTS USER_SESSION_ARCHIVE AS
+SELECT *, CURRENT_TIMESTAMP AS ARCHIVED_AT FROM USER_SESSION WHERE 0;
+
+CREATE TABLE IF NOT EXISTS ORDER_ARCHIVE AS
+SELECT *, CURRENT_TIMESTAMP AS ARCHIVED_AT FROM "ORDER" WHERE 0;
+
+CREATE TABLE IF NOT EXISTS PAYMENT_LOG_ARCHIVE AS
+SELECT *, CURRENT_TIMESTAMP AS ARCHIVED_AT FROM PAYMENT_LOG WHERE 0;
+
+CREATE INDEX IF NOT EXISTS idx_user_session_archive_user ON USER_SESSION_ARCHIVE(USER_ID);
+CREATE INDEX IF NOT EXISTS idx_order_archive_order ON ORDER_ARCHIVE(ORDER_ID);
+CREATE INDEX IF NOT EXISTS idx_order_archive_customer ON ORDER_ARCHIVE(CUSTOMER_ID);
+CREATE INDEX IF NOT EXISTS idx_payment_log_archive_order ON PAYMENT_LOG_ARCHIVE(ORDER_ID);
+
+-- Ended sessions are archived by LOGOUT_TIME; older rows may lack it
+UPDATE USER_SESSION
+SET LOGOUT_TIME = COALESCE(LAST_ACTIVITY, LOGIN_TIME, CREATED_AT)
+WHERE IS_ACTIVE = 0 AND LOGOUT_TIME IS NULL;
+
+-- Reaper lookups: idle active sessions, ended sessions by age
+CREATE INDEX IF NOT EXISTS idx_user_session_active_activity
+ON USER_SESSION(LAST_ACTIVITY) WHERE IS_ACTIVE = 1;
+
+CREATE INDEX IF NOT EXISTS idx_user_session_ended_logout
+ON USER_SESSION(LOGOUT_TIME) WHERE IS_ACTIVE = 0;
+
+CREATE INDEX IF NOT EXISTS idx_password_reset_expires ON PASSWORD_RESET(EXPIRES_AT);
+
+PRAGMA optimize;
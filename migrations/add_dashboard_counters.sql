@@ -0,0 +1,254 @@
+-- ========================================
+-- DASHBOARD COUNTERS
+-- Museum Management System
+-- ========================================
+-- One row of running totals for the dashboard (/api/statistics and
+-- database.get_dashboard_stats), kept current by the triggers below on
+-- every INSERT / UPDATE / DELETE of TICKET, CUSTOMER, VISIT_HISTORY and
+-- "ORDER", so a dashboard load reads one row instead of seven COUNT/SUM
+-- scans. Writes outside the triggers' reach (restores, manual edits with
+-- triggers dropped) are repaired with:
+--     python backend/dashboard_counters.py            (check for drift)
+--     python backend/dashboard_counters.py --rebuild  (recompute)
+--
+-- REVENUE counts tickets in a paid status (valid, used, checked_out,
+-- completed); TICKET_AMOUNT is TOTAL_PRICE over all tickets.
+
+CREATE TABLE IF NOT EXISTS DASHBOARD_COUNTERS (
+    COUNTER_ID INTEGER PRIMARY KEY CHECK (COUNTER_ID = 1),
+    TICKETS_TOTAL INTEGER NOT NULL DEFAULT 0,
+    TICKETS_VALID INTEGER NOT NULL DEFAULT 0,
+    TICKETS_USED INTEGER NOT NULL DEFAULT 0,
+    TICKETS_CHECKED_OUT INTEGER NOT NULL DEFAULT 0,
+    TICKETS_COMPLETED INTEGER NOT NULL DEFAULT 0,
+    TICKETS_CANCELLED INTEGER NOT NULL DEFAULT 0,
+    TICKETS_OTHER INTEGER NOT NULL DEFAULT 0,
+    REVENUE REAL NOT NULL DEFAULT 0,
+    TICKET_AMOUNT REAL NOT NULL DEFAULT 0,
+    CUSTOMERS INTEGER NOT NULL DEFAULT 0,
+    VISITS INTEGER NOT NULL DEFAULT 0,
+    VISITS_CHECKED_IN INTEGER NOT NULL DEFAULT 0,
+    ORDERS_TOTAL INTEGER NOT NULL DEFAULT 0,
+    ORDERS_PENDING INTEGER NOT NULL DEFAULT 0,
+    ORDERS_WAITING_CONFIRMATION INTEGER NOT NULL DEFAULT 0,
+    ORDERS_PAID INTEGER NOT NULL DEFAULT 0,
+    ORDERS_CANCELLED INTEGER NOT NULL DEFAULT 0,
+    ORDERS_REJECTED INTEGER NOT NULL DEFAULT 0,
+    ORDERS_EXPIRED INTEGER NOT NULL DEFAULT 0,
+    ORDERS_OTHER INTEGER NOT NULL DEFAULT 0,
+    REBUILT_AT DATETIME
+);
+
+-- Seed from the current data (same definitions as dashboard_counters.py)
+INSERT OR REPLACE INTO DASHBOARD_COUNTERS
+SELECT 1,
+       t.total, t.valid, t.used, t.checked_out, t.completed, t.cancelled, t.other,
+       t.revenue, t.amount,
+       (SELECT COUNT(*) FROM CUSTOMER),
+       v.total, v.checked_in,
+       o.total, o.pending, o.waiting_confirmation, o.paid, o.cancelled, o.rejected, o.expired, o.other,
+       CURRENT_TIMESTAMP
+FROM (
+    SELECT COUNT(*) AS total,
+           COALESCE(SUM(STATUS = 'valid'), 0) AS valid,
+           COALESCE(SUM(STATUS = 'used'), 0) AS used,
+           COALESCE(SUM(STATUS = 'checked_out'), 0) AS checked_out,
+           COALESCE(SUM(STATUS = 'completed'), 0) AS completed,
+           COALESCE(SUM(STATUS = 'cancelled'), 0) AS cancelled,
+           COALESCE(SUM(COALESCE(STATUS NOT IN ('valid', 'used', 'checked_out', 'completed', 'cancelled'), 1)), 0) AS other,
+           COALESCE(SUM(CASE WHEN STATUS IN ('valid', 'used', 'checked_out', 'completed')
+                             THEN COALESCE(TOTAL_PRICE, 0) ELSE 0 END), 0) AS revenue,
+           COALESCE(SUM(TOTAL_PRICE), 0) AS amount
+    FROM TICKET
+) t, (
+    SELECT COUNT(*) AS total, COUNT(CHECK_IN_TIME) AS checked_in
+    FROM VISIT_HISTORY
+) v, (
+    SELECT COUNT(*) AS total,
+           COALESCE(SUM(STATUS = 'pending'), 0) AS pending,
+           COALESCE(SUM(STATUS = 'waiting_confirmation'), 0) AS waiting_confirmation,
+           COALESCE(SUM(STATUS = 'paid'), 0) AS paid,
+           COALESCE(SUM(STATUS = 'cancelled'), 0) AS cancelled,
+           COALESCE(SUM(STATUS = 'rejected'), 0) AS rejected,
+           COALESCE(SUM(STATUS = 'expired'), 0) AS expired,
+           COALESCE(SUM(COALESCE(STATUS NOT IN ('pending', 'waiting_confirmation', 'paid',
+                                                'cancelled', 'rejected', 'expired'), 1)), 0) AS other
+    FROM "ORDER"
+) o;
+
+-- ----------------------------------------
+-- TICKET: counts by status, revenue
+-- ----------------------------------------
+DROP TRIGGER IF EXISTS dashboard_ticket_insert;
+CREATE TRIGGER dashboard_ticket_insert
+AFTER INSERT ON TICKET
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET TICKETS_TOTAL = TICKETS_TOTAL + 1,
+        TICKETS_VALID = TICKETS_VALID + (NEW.STATUS IS 'valid'),
+        TICKETS_USED = TICKETS_USED + (NEW.STATUS IS 'used'),
+        TICKETS_CHECKED_OUT = TICKETS_CHECKED_OUT + (NEW.STATUS IS 'checked_out'),
+        TICKETS_COMPLETED = TICKETS_COMPLETED + (NEW.STATUS IS 'completed'),
+        TICKETS_CANCELLED = TICKETS_CANCELLED + (NEW.STATUS IS 'cancelled'),
+        TICKETS_OTHER = TICKETS_OTHER
+            + COALESCE(NEW.STATUS NOT IN ('valid', 'used', 'checked_out', 'completed', 'cancelled'), 1),
+        REVENUE = REVENUE + CASE WHEN NEW.STATUS IN ('valid', 'used', 'checked_out', 'completed')
+                                 THEN COALESCE(NEW.TOTAL_PRICE, 0) ELSE 0 END,
+        TICKET_AMOUNT = TICKET_AMOUNT + COALESCE(NEW.TOTAL_PRICE, 0)
+    WHERE COUNTER_ID = 1;
+END;
+
+DROP TRIGGER IF EXISTS dashboard_ticket_update;
+CREATE TRIGGER dashboard_ticket_update
+AFTER UPDATE OF STATUS, TOTAL_PRICE ON TICKET
+WHEN OLD.STATUS IS NOT NEW.STATUS OR OLD.TOTAL_PRICE IS NOT NEW.TOTAL_PRICE
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET TICKETS_VALID = TICKETS_VALID + (NEW.STATUS IS 'valid') - (OLD.STATUS IS 'valid'),
+        TICKETS_USED = TICKETS_USED + (NEW.STATUS IS 'used') - (OLD.STATUS IS 'used'),
+        TICKETS_CHECKED_OUT = TICKETS_CHECKED_OUT
+            + (NEW.STATUS IS 'checked_out') - (OLD.STATUS IS 'checked_out'),
+        TICKETS_COMPLETED = TICKETS_COMPLETED
+            + (NEW.STATUS IS 'completed') - (OLD.STATUS IS 'completed'),
+        TICKETS_CANCELLED = TICKETS_CANCELLED
+            + (NEW.STATUS IS 'cancelled') - (OLD.STATUS IS 'cancelled'),
+        TICKETS_OTHER = TICKETS_OTHER
+            + COALESCE(NEW.STATUS NOT IN ('valid', 'used', 'checked_out', 'completed', 'cancelled'), 1)
+            - COALESCE(OLD.STATUS NOT IN ('valid', 'used', 'checked_out', 'completed', 'cancelled'), 1),
+        REVENUE = REVENUE
+            + CASE WHEN NEW.STATUS IN ('valid', 'used', 'checked_out', 'completed')
+                   THEN COALESCE(NEW.TOTAL_PRICE, 0) ELSE 0 END
+            - CASE WHEN OLD.STATUS IN ('valid', 'used', 'checked_out', 'completed')
+                   THEN COALESCE(OLD.TOTAL_PRICE, 0) ELSE 0 END,
+        TICKET_AMOUNT = TICKET_AMOUNT + COALESCE(NEW.TOTAL_PRICE, 0) - COALESCE(OLD.TOTAL_PRICE, 0)
+    WHERE COUNTER_ID = 1;
+END;
+
+DROP TRIGGER IF EXISTS dashboard_ticket_delete;
+CREATE TRIGGER dashboard_ticket_delete
+AFTER DELETE ON TICKET
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET TICKETS_TOTAL = TICKETS_TOTAL - 1,
+        TICKETS_VALID = TICKETS_VALID - (OLD.STATUS IS 'valid'),
+        TICKETS_USED = TICKETS_USED - (OLD.STATUS IS 'used'),
+        TICKETS_CHECKED_OUT = TICKETS_CHECKED_OUT - (OLD.STATUS IS 'checked_out'),
+        TICKETS_COMPLETED = TICKETS_COMPLETED - (OLD.STATUS IS 'completed'),
+        TICKETS_CANCELLED = TICKETS_CANCELLED - (OLD.STATUS IS 'cancelled'),
+        TICKETS_OTHER = TICKETS_OTHER
+            - COALESCE(OLD.STATUS NOT IN ('valid', 'used', 'checked_out', 'completed', 'cancelled'), 1),
+        REVENUE = REVENUE - CASE WHEN OLD.STATUS IN ('valid', 'used', 'checked_out', 'completed')
+                                 THEN COALESCE(OLD.TOTAL_PRICE, 0) ELSE 0 END,
+        TICKET_AMOUNT = TICKET_AMOUNT - COALESCE(OLD.TOTAL_PRICE, 0)
+    WHERE COUNTER_ID = 1;
+END;
+
+-- ----------------------------------------
+-- CUSTOMER, VISIT_HISTORY
+-- ----------------------------------------
+DROP TRIGGER IF EXISTS dashboard_customer_insert;
+CREATE TRIGGER dashboard_customer_insert
+AFTER INSERT ON CUSTOMER
+BEGIN
+    UPDATE DASHBOARD_COUNTERS SET CUSTOMERS = CUSTOMERS + 1 WHERE COUNTER_ID = 1;
+END;
+
+DROP TRIGGER IF EXISTS dashboard_customer_delete;
+CREATE TRIGGER dashboard_customer_delete
+AFTER DELETE ON CUSTOMER
+BEGIN
+    UPDATE DASHBOARD_COUNTERS SET CUSTOMERS = CUSTOMERS - 1 WHERE COUNTER_ID = 1;
+END;
+
+DROP TRIGGER IF EXISTS dashboard_visit_insert;
+CREATE TRIGGER dashboard_visit_insert
+AFTER INSERT ON VISIT_HISTORY
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET VISITS = VISITS + 1,
+        VISITS_CHECKED_IN = VISITS_CHECKED_IN + (NEW.CHECK_IN_TIME IS NOT NULL)
+    WHERE COUNTER_ID = 1;
+END;
+
+DROP TRIGGER IF EXISTS dashboard_visit_update;
+CREATE TRIGGER dashboard_visit_update
+AFTER UPDATE OF CHECK_IN_TIME ON VISIT_HISTORY
+WHEN (OLD.CHECK_IN_TIME IS NULL) != (NEW.CHECK_IN_TIME IS NULL)
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET VISITS_CHECKED_IN = VISITS_CHECKED_IN
+        + (NEW.CHECK_IN_TIME IS NOT NULL) - (OLD.CHECK_IN_TIME IS NOT NULL)
+    WHERE COUNTER_ID = 1;
+END;
+
+DROP TRIGGER IF EXISTS dashboard_visit_delete;
+CREATE TRIGGER dashboard_visit_delete
+AFTER DELETE ON VISIT_HISTORY
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET VISITS = VISITS - 1,
+        VISITS_CHECKED_IN = VISITS_CHECKED_IN - (OLD.CHECK_IN_TIME IS NOT NULL)
+    WHERE COUNTER_ID = 1;
+END;
+
+-- ----------------------------------------
+-- ORDER: counts by status (the reaper's archive DELETEs go through here)
+-- ----------------------------------------
+DROP TRIGGER IF EXISTS dashboard_order_insert;
+CREATE TRIGGER dashboard_order_insert
+AFTER INSERT ON "ORDER"
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET ORDERS_TOTAL = ORDERS_TOTAL + 1,
+        ORDERS_PENDING = ORDERS_PENDING + (NEW.STATUS IS 'pending'),
+        ORDERS_WAITING_CONFIRMATION = ORDERS_WAITING_CONFIRMATION
+            + (NEW.STATUS IS 'waiting_confirmation'),
+        ORDERS_PAID = ORDERS_PAID + (NEW.STATUS IS 'paid'),
+        ORDERS_CANCELLED = ORDERS_CANCELLED + (NEW.STATUS IS 'cancelled'),
+        ORDERS_REJECTED = ORDERS_REJECTED + (NEW.STATUS IS 'rejected'),
+        ORDERS_EXPIRED = ORDERS_EXPIRED + (NEW.STATUS IS 'expired'),
+        ORDERS_OTHER = ORDERS_OTHER
+            + COALESCE(NEW.STATUS NOT IN ('pending', 'waiting_confirmation', 'paid',
+                                          'cancelled', 'rejected', 'expired'), 1)
+    WHERE COUNTER_ID = 1;
+END;
+
+DROP TRIGGER IF EXISTS dashboard_order_update;
+CREATE TRIGGER dashboard_order_update
+AFTER UPDATE OF STATUS ON "ORDER"
+WHEN OLD.STATUS IS NOT NEW.STATUS
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET ORDERS_PENDING = ORDERS_PENDING + (NEW.STATUS IS 'pending') - (OLD.STATUS IS 'pending'),
+        ORDERS_WAITING_CONFIRMATION = ORDERS_WAITING_CONFIRMATION
+            + (NEW.STATUS IS 'waiting_confirmation') - (OLD.STATUS IS 'waiting_confirmation'),
+        ORDERS_PAID = ORDERS_PAID + (NEW.STATUS IS 'paid') - (OLD.STATUS IS 'paid'),
+        ORDERS_CANCELLED = ORDERS_CANCELLED + (NEW.STATUS IS 'cancelled') - (OLD.STATUS IS 'cancelled'),
+        ORDERS_REJECTED = ORDERS_REJECTED + (NEW.STATUS IS 'rejected') - (OLD.STATUS IS 'rejected'),
+        ORDERS_EXPIRED = ORDERS_EXPIRED + (NEW.STATUS IS 'expired') - (OLD.STATUS IS 'expired'),
+        ORDERS_OTHER = ORDERS_OTHER
+            + COALESCE(NEW.STATUS NOT IN ('pending', 'waiting_confirmation', 'paid',
+                                          'cancelled', 'rejected', 'expired'), 1)
+            - COALESCE(OLD.STATUS NOT IN ('pending', 'waiting_confirmation', 'paid',
+                                          'cancelled', 'rejected', 'expired'), 1)
+    WHERE COUNTER_ID = 1;
+END;
+
+DROP TRIGGER IF EXISTS dashboard_order_delete;
+CREATE TRIGGER dashboard_order_delete
+AFTER DELETE ON "ORDER"
+BEGIN
+    UPDATE DASHBOARD_COUNTERS
+    SET ORDERS_TOTAL = ORDERS_TOTAL - 1,
+        ORDERS_PENDING = ORDERS_PENDING - (OLD.STATUS IS 'pending'),
+        ORDERS_WAITING_CONFIRMATION = ORDERS_WAITING_CONFIRMATION
+            - (OLD.STATUS IS 'waiting_confirmation'),
+        ORDERS_PAID = ORDERS_PAID - (OLD.STATUS IS 'paid'),
+        ORDERS_CANCELLED = ORDERS_CANCELLED - (OLD.STATUS IS 'cancelled'),
+        ORDERS_REJECTED = ORDERS_REJECTED - (OLD.STATUS IS 'rejected'),
+        ORDERS_EXPIRED = ORDERS_EXPIRED - (OLD.STATUS IS 'expired'),
+        ORDERS_OTHER = ORDERS_OTHER
+            - COALESCE(OLD.STATUS NOT IN ('pending', 'waiting_confirmation', 'paid',
+                                          'cancelled', 'rejected', 'expired'), 1)
+    WHERE COUNTER_ID = 1;
+END;
@@ -0,0 +1,21 @@
+-- ========================================
+-- EVENT OUTBOX FOR THE LIVE FEED
+-- Museum Management System
+-- ========================================
+-- Check-in / check-out and order handlers insert one small row here in
+-- the same transaction as their change (backend/event_stream.py). Each
+-- worker tails the table by EVENT_ID and pushes new rows to the screens
+-- connected to /api/stream, so an event written by one worker reaches
+-- clients of every worker, and a reconnecting client resumes from its
+-- Last-Event-ID. The maintenance reaper deletes rows older than
+-- EVENT_RETENTION_HOURS.
+
+CREATE TABLE IF NOT EXISTS EVENT_OUTBOX (
+    EVENT_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CHANNEL TEXT NOT NULL,
+    EVENT TEXT NOT NULL,
+    DATA TEXT NOT NULL,
+    CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_outbox_created ON EVENT_OUTBOX(CREATED_AT);
@@ -0,0 +1,46 @@
+-- ========================================
+-- LIVE OCCUPANCY
+-- Museum Management System
+-- ========================================
+-- How many visitors are inside right now, without counting open visits:
+-- check-in adds one and check-out removes one in the same transaction as
+-- the visit (backend/occupancy.py), and a scheduler reconciles the counts
+-- against VISIT_HISTORY every few minutes.
+--
+-- OCCUPANCY: one row per area; CONSTRUCTION_ID 0 is the whole museum,
+-- other rows are visits checked in at that CONSTRUCTION (e.g. 1 = main
+-- building, 2 = statue area), created on the first check-in there.
+-- Visits without an area count only in 0.
+--
+-- OCCUPANCY_MINUTE: fixed-size ring of per-minute samples (24 hours =
+-- 1440 slots per area). SLOT = minutes since the epoch mod 1440; MINUTE
+-- says which minute the slot currently holds, so an old slot is simply
+-- overwritten. INSIDE is the count at the end of the minute, PEAK the
+-- highest count during it. Times are UTC.
+
+-- 1. Area a visit was checked in at (optional)
+ALTER TABLE VISIT_HISTORY ADD COLUMN CONSTRUCTION_ID INTEGER REFERENCES CONSTRUCTION(CONSTRUCTION_ID);
+
+-- 2. Current counts
+CREATE TABLE IF NOT EXISTS OCCUPANCY (
+    CONSTRUCTION_ID INTEGER PRIMARY KEY,
+    INSIDE INTEGER NOT NULL DEFAULT 0,
+    UPDATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP,
+    RECONCILED_AT DATETIME
+);
+
+-- 3. Per-minute history
+CREATE TABLE IF NOT EXISTS OCCUPANCY_MINUTE (
+    CONSTRUCTION_ID INTEGER NOT NULL,
+    SLOT INTEGER NOT NULL,
+    MINUTE TEXT NOT NULL,
+    INSIDE INTEGER NOT NULL,
+    PEAK INTEGER NOT NULL,
+    PRIMARY KEY (CONSTRUCTION_ID, SLOT)
+) WITHOUT ROWID;
+
+-- 4. Seed from visits that are still open
+INSERT OR REPLACE INTO OCCUPANCY (CONSTRUCTION_ID, INSIDE, RECONCILED_AT)
+SELECT 0, COUNT(*), CURRENT_TIMESTAMP
+FROM VISIT_HISTORY
+WHERE CHECK_OUT_TIME IS NULL;
@@ -0,0 +1,55 @@
+-- ========================================
+-- PARTIAL INDEXES FOR HOT STATUS PREDICATES
+-- Museum Management System
+-- ========================================
+-- The gate and admin screens only ever look at a small live subset:
+-- open visits (CHECK_OUT_TIME IS NULL), orders waiting for approval and
+-- valid tickets. Partial indexes keep exactly those rows, so they stay
+-- small as history grows. SQLite uses a partial index only when the
+-- query repeats the predicate literally (not as a bound parameter).
+
+-- 1. Close duplicate open visits (keep the newest per ticket) so the
+--    unique index below can be built
+UPDATE VISIT_HISTORY
+SET CHECK_OUT_TIME = CHECK_IN_TIME,
+    NOTES = COALESCE(NOTES || ' | ', '') || 'Tự động đóng: check-in trùng'
+WHERE CHECK_OUT_TIME IS NULL
+  AND HISTORY_ID < (
+      SELECT MAX(v2.HISTORY_ID) FROM VISIT_HISTORY v2
+      WHERE v2.TICKET_ID = VISIT_HISTORY.TICKET_ID AND v2.CHECK_OUT_TIME IS NULL
+  );
+
+-- 2. VISIT_HISTORY: at most one open visit per ticket
+--    (check-in duplicate check, check-out lookup)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_visit_history_open_ticket
+    ON VISIT_HISTORY(TICKET_ID) WHERE CHECK_OUT_TIME IS NULL;
+
+-- 3. VISIT_HISTORY: open visits by check-in time
+--    (active visits list, active check-out list)
+CREATE INDEX IF NOT EXISTS idx_visit_history_open_checkin
+    ON VISIT_HISTORY(CHECK_IN_TIME, CUSTOMER_ID, TICKET_ID, GUIDE_ID)
+    WHERE CHECK_OUT_TIME IS NULL;
+
+-- 4. ORDER: waiting for admin confirmation, newest first
+CREATE INDEX IF NOT EXISTS idx_order_waiting_created_at
+    ON "ORDER"(CREATED_AT) WHERE STATUS = 'waiting_confirmation';
+
+-- 5. TICKET: valid (not yet used) tickets per customer (check-in list)
+CREATE INDEX IF NOT EXISTS idx_ticket_valid_customer
+    ON TICKET(CUSTOMER_ID, TICKET_CODE, QUANTITY, VALID_DATE) WHERE STATUS = 'valid';
+
+-- 6. VISIT_HISTORY: every visit of a ticket (ticket detail and ticket
+--    lists LEFT JOIN visits on TICKET_ID, open or not); the partial
+--    index above only covers open visits
+CREATE INDEX IF NOT EXISTS idx_visit_history_ticket_id
+    ON VISIT_HISTORY(TICKET_ID);
+
+-- 7. Drop the full indexes from add_advised_indexes.sql that these
+--    replace (the planner would otherwise keep picking them); the
+--    (TICKET_ID, CHECK_OUT_TIME, CHECK_IN_TIME) one only served the
+--    open-visit lookup, plain TICKET_ID joins use the index in step 6
+DROP INDEX IF EXISTS idx_visit_history_ticket_id_check_out_time_check_in_time;
+DROP INDEX IF EXISTS idx_visit_history_check_out_time_check_in_time;
+DROP INDEX IF EXISTS idx_order_status_created_at;
+
+PRAGMA optimize;
@@ -0,0 +1,152 @@
+-- ========================================
+-- RATING ROLLUP
+-- Museum Management System
+-- ========================================
+-- Rating and feedback aggregates for /api/analytics/ratings, kept current
+-- by triggers instead of scanning VISIT_HISTORY:
+--   RATING_DAILY  one row per (DAY, GUIDE_ID, TICKET_TYPE_ID)
+--                 DAY = DATE(CHECK_IN_TIME), ticket type from TICKET
+-- RATINGS / RATING_SUM / RATING_SUM_SQ give count, average and standard
+-- deviation for any set of rows; STARS_1..STARS_5 the distribution;
+-- FEEDBACKS counts visits with written feedback. Only ratings 1-5 count
+-- (api_checkout stores whatever the client sends). Missing keys are
+-- stored as '' / 0 so the primary key stays unique.
+--
+-- The triggers apply every rating written by api_checkout and
+-- api_add_rating (and any other update) in the writer's transaction.
+-- A ticket whose TICKET_TYPE_ID changes afterwards is not re-bucketed;
+--     python backend/rating_rollup.py [--rebuild]
+-- compares the rollup with VISIT_HISTORY (and rebuilds it).
+
+CREATE TABLE IF NOT EXISTS RATING_DAILY (
+    DAY TEXT NOT NULL,
+    GUIDE_ID INTEGER NOT NULL,
+    TICKET_TYPE_ID INTEGER NOT NULL,
+    RATINGS INTEGER NOT NULL DEFAULT 0,
+    RATING_SUM INTEGER NOT NULL DEFAULT 0,
+    RATING_SUM_SQ INTEGER NOT NULL DEFAULT 0,
+    STARS_1 INTEGER NOT NULL DEFAULT 0,
+    STARS_2 INTEGER NOT NULL DEFAULT 0,
+    STARS_3 INTEGER NOT NULL DEFAULT 0,
+    STARS_4 INTEGER NOT NULL DEFAULT 0,
+    STARS_5 INTEGER NOT NULL DEFAULT 0,
+    FEEDBACKS INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (DAY, GUIDE_ID, TICKET_TYPE_ID)
+) WITHOUT ROWID;
+
+-- Per-guide reports read by guide first
+CREATE INDEX IF NOT EXISTS idx_rating_daily_guide ON RATING_DAILY(GUIDE_ID, DAY);
+
+-- Seed from existing visits (rating_rollup.py --rebuild does the same)
+DELETE FROM RATING_DAILY;
+INSERT INTO RATING_DAILY (DAY, GUIDE_ID, TICKET_TYPE_ID, RATINGS, RATING_SUM, RATING_SUM_SQ,
+                          STARS_1, STARS_2, STARS_3, STARS_4, STARS_5, FEEDBACKS)
+SELECT COALESCE(DATE(vh.CHECK_IN_TIME), ''), COALESCE(vh.GUIDE_ID, 0), COALESCE(t.TICKET_TYPE_ID, 0),
+       SUM(COALESCE(vh.RATING IN (1, 2, 3, 4, 5), 0)),
+       SUM(CASE WHEN vh.RATING IN (1, 2, 3, 4, 5) THEN vh.RATING ELSE 0 END),
+       SUM(CASE WHEN vh.RATING IN (1, 2, 3, 4, 5) THEN vh.RATING * vh.RATING ELSE 0 END),
+       SUM(vh.RATING IS 1), SUM(vh.RATING IS 2), SUM(vh.RATING IS 3),
+       SUM(vh.RATING IS 4), SUM(vh.RATING IS 5),
+       SUM(COALESCE(TRIM(vh.FEEDBACK), '') <> '')
+FROM VISIT_HISTORY vh
+LEFT JOIN TICKET t ON vh.TICKET_ID = t.TICKET_ID
+WHERE vh.RATING IN (1, 2, 3, 4, 5) OR COALESCE(TRIM(vh.FEEDBACK), '') <> ''
+GROUP BY 1, 2, 3;
+
+-- ----------------------------------------
+-- VISIT_HISTORY
+-- ----------------------------------------
+DROP TRIGGER IF EXISTS rating_visit_insert;
+CREATE TRIGGER rating_visit_insert
+AFTER INSERT ON VISIT_HISTORY
+WHEN NEW.RATING IN (1, 2, 3, 4, 5) OR COALESCE(TRIM(NEW.FEEDBACK), '') <> ''
+BEGIN
+    INSERT INTO RATING_DAILY (DAY, GUIDE_ID, TICKET_TYPE_ID, RATINGS, RATING_SUM, RATING_SUM_SQ,
+                              STARS_1, STARS_2, STARS_3, STARS_4, STARS_5, FEEDBACKS)
+    VALUES (COALESCE(DATE(NEW.CHECK_IN_TIME), ''), COALESCE(NEW.GUIDE_ID, 0),
+            COALESCE((SELECT TICKET_TYPE_ID FROM TICKET WHERE TICKET_ID = NEW.TICKET_ID), 0),
+            COALESCE(NEW.RATING IN (1, 2, 3, 4, 5), 0),
+            CASE WHEN NEW.RATING IN (1, 2, 3, 4, 5) THEN NEW.RATING ELSE 0 END,
+            CASE WHEN NEW.RATING IN (1, 2, 3, 4, 5) THEN NEW.RATING * NEW.RATING ELSE 0 END,
+            NEW.RATING IS 1, NEW.RATING IS 2, NEW.RATING IS 3, NEW.RATING IS 4, NEW.RATING IS 5,
+            COALESCE(TRIM(NEW.FEEDBACK), '') <> '')
+    ON CONFLICT (DAY, GUIDE_ID, TICKET_TYPE_ID) DO UPDATE
+    SET RATINGS = RATINGS + excluded.RATINGS,
+        RATING_SUM = RATING_SUM + excluded.RATING_SUM,
+        RATING_SUM_SQ = RATING_SUM_SQ + excluded.RATING_SUM_SQ,
+        STARS_1 = STARS_1 + excluded.STARS_1,
+        STARS_2 = STARS_2 + excluded.STARS_2,
+        STARS_3 = STARS_3 + excluded.STARS_3,
+        STARS_4 = STARS_4 + excluded.STARS_4,
+        STARS_5 = STARS_5 + excluded.STARS_5,
+        FEEDBACKS = FEEDBACKS + excluded.FEEDBACKS;
+END;
+
+-- Old row out of its bucket, new row into its bucket (check-out, re-rating)
+DROP TRIGGER IF EXISTS rating_visit_update;
+CREATE TRIGGER rating_visit_update
+AFTER UPDATE OF RATING, FEEDBACK, GUIDE_ID, CHECK_IN_TIME, TICKET_ID ON VISIT_HISTORY
+WHEN (OLD.RATING IS NOT NEW.RATING OR OLD.FEEDBACK IS NOT NEW.FEEDBACK
+      OR OLD.GUIDE_ID IS NOT NEW.GUIDE_ID OR OLD.CHECK_IN_TIME IS NOT NEW.CHECK_IN_TIME
+      OR OLD.TICKET_ID IS NOT NEW.TICKET_ID)
+ AND (OLD.RATING IN (1, 2, 3, 4, 5) OR COALESCE(TRIM(OLD.FEEDBACK), '') <> ''
+      OR NEW.RATING IN (1, 2, 3, 4, 5) OR COALESCE(TRIM(NEW.FEEDBACK), '') <> '')
+BEGIN
+    UPDATE RATING_DAILY
+    SET RATINGS = RATINGS - COALESCE(OLD.RATING IN (1, 2, 3, 4, 5), 0),
+        RATING_SUM = RATING_SUM - CASE WHEN OLD.RATING IN (1, 2, 3, 4, 5) THEN OLD.RATING ELSE 0 END,
+        RATING_SUM_SQ = RATING_SUM_SQ
+            - CASE WHEN OLD.RATING IN (1, 2, 3, 4, 5) THEN OLD.RATING * OLD.RATING ELSE 0 END,
+        STARS_1 = STARS_1 - (OLD.RATING IS 1),
+        STARS_2 = STARS_2 - (OLD.RATING IS 2),
+        STARS_3 = STARS_3 - (OLD.RATING IS 3),
+        STARS_4 = STARS_4 - (OLD.RATING IS 4),
+        STARS_5 = STARS_5 - (OLD.RATING IS 5),
+        FEEDBACKS = FEEDBACKS - (COALESCE(TRIM(OLD.FEEDBACK), '') <> '')
+    WHERE DAY = COALESCE(DATE(OLD.CHECK_IN_TIME), '')
+      AND GUIDE_ID = COALESCE(OLD.GUIDE_ID, 0)
+      AND TICKET_TYPE_ID = COALESCE((SELECT TICKET_TYPE_ID FROM TICKET WHERE TICKET_ID = OLD.TICKET_ID), 0)
+      AND (OLD.RATING IN (1, 2, 3, 4, 5) OR COALESCE(TRIM(OLD.FEEDBACK), '') <> '');
+
+    INSERT INTO RATING_DAILY (DAY, GUIDE_ID, TICKET_TYPE_ID, RATINGS, RATING_SUM, RATING_SUM_SQ,
+                              STARS_1, STARS_2, STARS_3, STARS_4, STARS_5, FEEDBACKS)
+    SELECT COALESCE(DATE(NEW.CHECK_IN_TIME), ''), COALESCE(NEW.GUIDE_ID, 0),
+           COALESCE((SELECT TICKET_TYPE_ID FROM TICKET WHERE TICKET_ID = NEW.TICKET_ID), 0),
+           COALESCE(NEW.RATING IN (1, 2, 3, 4, 5), 0),
+           CASE WHEN NEW.RATING IN (1, 2, 3, 4, 5) THEN NEW.RATING ELSE 0 END,
+           CASE WHEN NEW.RATING IN (1, 2, 3, 4, 5) THEN NEW.RATING * NEW.RATING ELSE 0 END,
+           NEW.RATING IS 1, NEW.RATING IS 2, NEW.RATING IS 3, NEW.RATING IS 4, NEW.RATING IS 5,
+           COALESCE(TRIM(NEW.FEEDBACK), '') <> ''
+    WHERE NEW.RATING IN (1, 2, 3, 4, 5) OR COALESCE(TRIM(NEW.FEEDBACK), '') <> ''
+    ON CONFLICT (DAY, GUIDE_ID, TICKET_TYPE_ID) DO UPDATE
+    SET RATINGS = RATINGS + excluded.RATINGS,
+        RATING_SUM = RATING_SUM + excluded.RATING_SUM,
+        RATING_SUM_SQ = RATING_SUM_SQ + excluded.RATING_SUM_SQ,
+        STARS_1 = STARS_1 + excluded.STARS_1,
+        STARS_2 = STARS_2 + excluded.STARS_2,
+        STARS_3 = STARS_3 + excluded.STARS_3,
+        STARS_4 = STARS_4 + excluded.STARS_4,
+        STARS_5 = STARS_5 + excluded.STARS_5,
+        FEEDBACKS = FEEDBACKS + excluded.FEEDBACKS;
+END;
+
+DROP TRIGGER IF EXISTS rating_visit_delete;
+CREATE TRIGGER rating_visit_delete
+AFTER DELETE ON VISIT_HISTORY
+WHEN OLD.RATING IN (1, 2, 3, 4, 5) OR COALESCE(TRIM(OLD.FEEDBACK), '') <> ''
+BEGIN
+    UPDATE RATING_DAILY
+    SET RATINGS = RATINGS - COALESCE(OLD.RATING IN (1, 2, 3, 4, 5), 0),
+        RATING_SUM = RATING_SUM - CASE WHEN OLD.RATING IN (1, 2, 3, 4, 5) THEN OLD.RATING ELSE 0 END,
+        RATING_SUM_SQ = RATING_SUM_SQ
+            - CASE WHEN OLD.RATING IN (1, 2, 3, 4, 5) THEN OLD.RATING * OLD.RATING ELSE 0 END,
+        STARS_1 = STARS_1 - (OLD.RATING IS 1),
+        STARS_2 = STARS_2 - (OLD.RATING IS 2),
+        STARS_3 = STARS_3 - (OLD.RATING IS 3),
+        STARS_4 = STARS_4 - (OLD.RATING IS 4),
+        STARS_5 = STARS_5 - (OLD.RATING IS 5),
+        FEEDBACKS = FEEDBACKS - (COALESCE(TRIM(OLD.FEEDBACK), '') <> '')
+    WHERE DAY = COALESCE(DATE(OLD.CHECK_IN_TIME), '')
+      AND GUIDE_ID = COALESCE(OLD.GUIDE_ID, 0)
+      AND TICKET_TYPE_ID = COALESCE((SELECT TICKET_TYPE_ID FROM TICKET WHERE TICKET_ID = OLD.TICKET_ID), 0);
+END;
@@ -0,0 +1,33 @@
+-- ========================================
+-- UNIQUE INDEXES FOR REGISTRATION
+-- Museum Management System
+-- ========================================
+-- AuthManager.register_customer and the bulk customer import rely on these
+-- constraints instead of pre-check SELECTs (USER.USERNAME is already
+-- UNIQUE). Violations are mapped back to the usual messages.
+--
+-- Phones are stored normalized: digits only, +84 prefix as 0 (the same
+-- rule as AuthManager.normalize_phone). If the UNIQUE index below fails,
+-- list the clashing customers with:
+--   SELECT PHONE, GROUP_CONCAT(CUSTOMER_ID) FROM CUSTOMER
+--   WHERE PHONE <> '' GROUP BY PHONE HAVING COUNT(*) > 1;
+
+UPDATE CUSTOMER
+SET PHONE = replace(replace(replace(replace(replace(PHONE, ' ', ''), '.', ''), '-', ''), '(', ''), ')', '')
+WHERE PHONE GLOB '*[-. ()]*';
+
+UPDATE CUSTOMER SET PHONE = '0' || substr(PHONE, 4) WHERE PHONE LIKE '+84%';
+
+UPDATE USER
+SET PHONE = replace(replace(replace(replace(replace(PHONE, ' ', ''), '.', ''), '-', ''), '(', ''), ')', '')
+WHERE PHONE GLOB '*[-. ()]*';
+
+UPDATE USER SET PHONE = '0' || substr(PHONE, 4) WHERE PHONE LIKE '+84%';
+
+-- One customer per phone (walk-in customers without a phone are exempt)
+CREATE UNIQUE INDEX IF NOT EXISTS ux_customer_phone
+ON CUSTOMER(PHONE) WHERE PHONE IS NOT NULL AND PHONE <> '';
+
+-- One account per email (accounts without an email are exempt)
+CREATE UNIQUE INDEX IF NOT EXISTS ux_user_email
+ON USER(EMAIL) WHERE EMAIL IS NOT NULL AND EMAIL <> '';
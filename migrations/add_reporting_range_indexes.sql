@@ -0,0 +1,27 @@
+-- ========================================
+-- REPORTING DATE-RANGE INDEXES
+-- Museum Management System
+-- ========================================
+-- Reports filter TICKET.PURCHASE_DATE and "ORDER".CREATED_AT with
+-- half-open ranges:
+--     PURCHASE_DATE >= DATE(:start) AND PURCHASE_DATE < DATE(:end, '+1 day')
+-- instead of DATE(PURCHASE_DATE) >= ?, so a plain index on the column
+-- is usable and a report reads only the rows inside its range.
+-- Both date formats stored in the column ('YYYY-MM-DD' and
+-- 'YYYY-MM-DD HH:MM:SS') sort correctly against these bounds.
+
+-- 1. TICKET: revenue by day / by ticket type, ticket export, dashboard
+--    (TOTAL_PRICE and TICKET_TYPE_ID make the revenue queries index-only)
+CREATE INDEX IF NOT EXISTS idx_ticket_purchase_date
+    ON TICKET(PURCHASE_DATE, TOTAL_PRICE, TICKET_TYPE_ID);
+
+-- 2. ORDER: today / this-month order statistics
+CREATE INDEX IF NOT EXISTS idx_order_created_at
+    ON "ORDER"(CREATED_AT, TOTAL_PRICE);
+
+-- idx_order_created (CREATED_AT DESC, migration_online_booking.sql) has
+-- the same leading column; the new index serves its lookups and newest-
+-- first listings (scanned in reverse), so drop it rather than keep both
+DROP INDEX IF EXISTS idx_order_created;
+
+PRAGMA optimize;
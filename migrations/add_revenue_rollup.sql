@@ -0,0 +1,194 @@
+-- ========================================
+-- REVENUE ROLLUP TABLES
+-- Museum Management System
+-- ========================================
+-- Revenue reports (get_revenue_by_date, the revenue Excel export, the
+-- today / this-month order statistics, top customers) read these rollups
+-- instead of re-aggregating TICKET and "ORDER":
+--   REVENUE_DAILY     one row per (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL)
+--                     tickets by DATE(PURCHASE_DATE), orders by DATE(CREATED_AT)
+--   CUSTOMER_REVENUE  one row per customer with tickets
+-- CHANNEL is 'online' for booking orders and tickets issued from them,
+-- 'counter' for tickets sold at the desk. Missing keys are stored as
+-- '' / 0 so the primary key stays unique.
+--
+-- The triggers below apply every ticket sale, approval, cancellation,
+-- price change and delete in the writer's own transaction. Existing rows
+-- are loaded month by month afterwards (safe while the app is running):
+--     python backend/revenue_rollup.py --backfill
+-- and compared against the base tables with:
+--     python backend/revenue_rollup.py
+
+CREATE TABLE IF NOT EXISTS REVENUE_DAILY (
+    DAY TEXT NOT NULL,
+    TICKET_TYPE_ID INTEGER NOT NULL,
+    PAYMENT_METHOD TEXT NOT NULL,
+    CHANNEL TEXT NOT NULL,
+    TICKETS INTEGER NOT NULL DEFAULT 0,
+    TICKET_AMOUNT REAL NOT NULL DEFAULT 0,
+    CANCELLED_TICKETS INTEGER NOT NULL DEFAULT 0,
+    CANCELLED_AMOUNT REAL NOT NULL DEFAULT 0,
+    ORDERS INTEGER NOT NULL DEFAULT 0,
+    ORDER_AMOUNT REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS CUSTOMER_REVENUE (
+    CUSTOMER_ID INTEGER PRIMARY KEY,
+    TICKETS INTEGER NOT NULL DEFAULT 0,
+    TICKET_AMOUNT REAL NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_customer_revenue_amount
+    ON CUSTOMER_REVENUE(TICKET_AMOUNT DESC);
+
+-- ----------------------------------------
+-- TICKET
+-- ----------------------------------------
+DROP TRIGGER IF EXISTS revenue_ticket_insert;
+CREATE TRIGGER revenue_ticket_insert
+AFTER INSERT ON TICKET
+BEGIN
+    INSERT INTO REVENUE_DAILY (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL,
+                               TICKETS, TICKET_AMOUNT, CANCELLED_TICKETS, CANCELLED_AMOUNT)
+    VALUES (COALESCE(DATE(NEW.PURCHASE_DATE), ''), COALESCE(NEW.TICKET_TYPE_ID, 0),
+            COALESCE(NEW.PAYMENT_METHOD, ''),
+            CASE WHEN NEW.ORDER_ID IS NULL THEN 'counter' ELSE 'online' END,
+            1, COALESCE(NEW.TOTAL_PRICE, 0),
+            NEW.STATUS IS 'cancelled',
+            CASE WHEN NEW.STATUS IS 'cancelled' THEN COALESCE(NEW.TOTAL_PRICE, 0) ELSE 0 END)
+    ON CONFLICT (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL) DO UPDATE
+    SET TICKETS = TICKETS + excluded.TICKETS,
+        TICKET_AMOUNT = TICKET_AMOUNT + excluded.TICKET_AMOUNT,
+        CANCELLED_TICKETS = CANCELLED_TICKETS + excluded.CANCELLED_TICKETS,
+        CANCELLED_AMOUNT = CANCELLED_AMOUNT + excluded.CANCELLED_AMOUNT;
+
+    INSERT INTO CUSTOMER_REVENUE (CUSTOMER_ID, TICKETS, TICKET_AMOUNT)
+    SELECT NEW.CUSTOMER_ID, 1, COALESCE(NEW.TOTAL_PRICE, 0)
+    WHERE NEW.CUSTOMER_ID IS NOT NULL
+    ON CONFLICT (CUSTOMER_ID) DO UPDATE
+    SET TICKETS = TICKETS + excluded.TICKETS,
+        TICKET_AMOUNT = TICKET_AMOUNT + excluded.TICKET_AMOUNT;
+END;
+
+-- Old row out of its bucket, new row into its bucket
+DROP TRIGGER IF EXISTS revenue_ticket_update;
+CREATE TRIGGER revenue_ticket_update
+AFTER UPDATE OF STATUS, TOTAL_PRICE, PURCHASE_DATE, TICKET_TYPE_ID, PAYMENT_METHOD,
+                ORDER_ID, CUSTOMER_ID ON TICKET
+WHEN OLD.STATUS IS NOT NEW.STATUS OR OLD.TOTAL_PRICE IS NOT NEW.TOTAL_PRICE
+  OR OLD.PURCHASE_DATE IS NOT NEW.PURCHASE_DATE OR OLD.TICKET_TYPE_ID IS NOT NEW.TICKET_TYPE_ID
+  OR OLD.PAYMENT_METHOD IS NOT NEW.PAYMENT_METHOD OR OLD.ORDER_ID IS NOT NEW.ORDER_ID
+  OR OLD.CUSTOMER_ID IS NOT NEW.CUSTOMER_ID
+BEGIN
+    INSERT INTO REVENUE_DAILY (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL,
+                               TICKETS, TICKET_AMOUNT, CANCELLED_TICKETS, CANCELLED_AMOUNT)
+    VALUES (COALESCE(DATE(OLD.PURCHASE_DATE), ''), COALESCE(OLD.TICKET_TYPE_ID, 0),
+            COALESCE(OLD.PAYMENT_METHOD, ''),
+            CASE WHEN OLD.ORDER_ID IS NULL THEN 'counter' ELSE 'online' END,
+            -1, -COALESCE(OLD.TOTAL_PRICE, 0),
+            -(OLD.STATUS IS 'cancelled'),
+            CASE WHEN OLD.STATUS IS 'cancelled' THEN -COALESCE(OLD.TOTAL_PRICE, 0) ELSE 0 END)
+    ON CONFLICT (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL) DO UPDATE
+    SET TICKETS = TICKETS + excluded.TICKETS,
+        TICKET_AMOUNT = TICKET_AMOUNT + excluded.TICKET_AMOUNT,
+        CANCELLED_TICKETS = CANCELLED_TICKETS + excluded.CANCELLED_TICKETS,
+        CANCELLED_AMOUNT = CANCELLED_AMOUNT + excluded.CANCELLED_AMOUNT;
+
+    INSERT INTO REVENUE_DAILY (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL,
+                               TICKETS, TICKET_AMOUNT, CANCELLED_TICKETS, CANCELLED_AMOUNT)
+    VALUES (COALESCE(DATE(NEW.PURCHASE_DATE), ''), COALESCE(NEW.TICKET_TYPE_ID, 0),
+            COALESCE(NEW.PAYMENT_METHOD, ''),
+            CASE WHEN NEW.ORDER_ID IS NULL THEN 'counter' ELSE 'online' END,
+            1, COALESCE(NEW.TOTAL_PRICE, 0),
+            NEW.STATUS IS 'cancelled',
+            CASE WHEN NEW.STATUS IS 'cancelled' THEN COALESCE(NEW.TOTAL_PRICE, 0) ELSE 0 END)
+    ON CONFLICT (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL) DO UPDATE
+    SET TICKETS = TICKETS + excluded.TICKETS,
+        TICKET_AMOUNT = TICKET_AMOUNT + excluded.TICKET_AMOUNT,
+        CANCELLED_TICKETS = CANCELLED_TICKETS + excluded.CANCELLED_TICKETS,
+        CANCELLED_AMOUNT = CANCELLED_AMOUNT + excluded.CANCELLED_AMOUNT;
+
+    UPDATE CUSTOMER_REVENUE
+    SET TICKETS = TICKETS - 1,
+        TICKET_AMOUNT = TICKET_AMOUNT - COALESCE(OLD.TOTAL_PRICE, 0)
+    WHERE CUSTOMER_ID = OLD.CUSTOMER_ID;
+
+    INSERT INTO CUSTOMER_REVENUE (CUSTOMER_ID, TICKETS, TICKET_AMOUNT)
+    SELECT NEW.CUSTOMER_ID, 1, COALESCE(NEW.TOTAL_PRICE, 0)
+    WHERE NEW.CUSTOMER_ID IS NOT NULL
+    ON CONFLICT (CUSTOMER_ID) DO UPDATE
+    SET TICKETS = TICKETS + excluded.TICKETS,
+        TICKET_AMOUNT = TICKET_AMOUNT + excluded.TICKET_AMOUNT;
+END;
+
+DROP TRIGGER IF EXISTS revenue_ticket_delete;
+CREATE TRIGGER revenue_ticket_delete
+AFTER DELETE ON TICKET
+BEGIN
+    UPDATE REVENUE_DAILY
+    SET TICKETS = TICKETS - 1,
+        TICKET_AMOUNT = TICKET_AMOUNT - COALESCE(OLD.TOTAL_PRICE, 0),
+        CANCELLED_TICKETS = CANCELLED_TICKETS - (OLD.STATUS IS 'cancelled'),
+        CANCELLED_AMOUNT = CANCELLED_AMOUNT
+            - CASE WHEN OLD.STATUS IS 'cancelled' THEN COALESCE(OLD.TOTAL_PRICE, 0) ELSE 0 END
+    WHERE DAY = COALESCE(DATE(OLD.PURCHASE_DATE), '')
+      AND TICKET_TYPE_ID = COALESCE(OLD.TICKET_TYPE_ID, 0)
+      AND PAYMENT_METHOD = COALESCE(OLD.PAYMENT_METHOD, '')
+      AND CHANNEL = CASE WHEN OLD.ORDER_ID IS NULL THEN 'counter' ELSE 'online' END;
+
+    UPDATE CUSTOMER_REVENUE
+    SET TICKETS = TICKETS - 1,
+        TICKET_AMOUNT = TICKET_AMOUNT - COALESCE(OLD.TOTAL_PRICE, 0)
+    WHERE CUSTOMER_ID = OLD.CUSTOMER_ID;
+END;
+
+-- ----------------------------------------
+-- ORDER (by creation day, all statuses)
+-- ----------------------------------------
+DROP TRIGGER IF EXISTS revenue_order_insert;
+CREATE TRIGGER revenue_order_insert
+AFTER INSERT ON "ORDER"
+BEGIN
+    INSERT INTO REVENUE_DAILY (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL, ORDERS, ORDER_AMOUNT)
+    VALUES (COALESCE(DATE(NEW.CREATED_AT), ''), COALESCE(NEW.TICKET_TYPE_ID, 0),
+            COALESCE(NEW.PAYMENT_METHOD, ''), 'online', 1, COALESCE(NEW.TOTAL_PRICE, 0))
+    ON CONFLICT (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL) DO UPDATE
+    SET ORDERS = ORDERS + excluded.ORDERS,
+        ORDER_AMOUNT = ORDER_AMOUNT + excluded.ORDER_AMOUNT;
+END;
+
+DROP TRIGGER IF EXISTS revenue_order_update;
+CREATE TRIGGER revenue_order_update
+AFTER UPDATE OF CREATED_AT, TOTAL_PRICE, TICKET_TYPE_ID, PAYMENT_METHOD ON "ORDER"
+WHEN OLD.CREATED_AT IS NOT NEW.CREATED_AT OR OLD.TOTAL_PRICE IS NOT NEW.TOTAL_PRICE
+  OR OLD.TICKET_TYPE_ID IS NOT NEW.TICKET_TYPE_ID OR OLD.PAYMENT_METHOD IS NOT NEW.PAYMENT_METHOD
+BEGIN
+    UPDATE REVENUE_DAILY
+    SET ORDERS = ORDERS - 1,
+        ORDER_AMOUNT = ORDER_AMOUNT - COALESCE(OLD.TOTAL_PRICE, 0)
+    WHERE DAY = COALESCE(DATE(OLD.CREATED_AT), '')
+      AND TICKET_TYPE_ID = COALESCE(OLD.TICKET_TYPE_ID, 0)
+      AND PAYMENT_METHOD = COALESCE(OLD.PAYMENT_METHOD, '')
+      AND CHANNEL = 'online';
+
+    INSERT INTO REVENUE_DAILY (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL, ORDERS, ORDER_AMOUNT)
+    VALUES (COALESCE(DATE(NEW.CREATED_AT), ''), COALESCE(NEW.TICKET_TYPE_ID, 0),
+            COALESCE(NEW.PAYMENT_METHOD, ''), 'online', 1, COALESCE(NEW.TOTAL_PRICE, 0))
+    ON CONFLICT (DAY, TICKET_TYPE_ID, PAYMENT_METHOD, CHANNEL) DO UPDATE
+    SET ORDERS = ORDERS + excluded.ORDERS,
+        ORDER_AMOUNT = ORDER_AMOUNT + excluded.ORDER_AMOUNT;
+END;
+
+DROP TRIGGER IF EXISTS revenue_order_delete;
+CREATE TRIGGER revenue_order_delete
+AFTER DELETE ON "ORDER"
+BEGIN
+    UPDATE REVENUE_DAILY
+    SET ORDERS = ORDERS - 1,
+        ORDER_AMOUNT = ORDER_AMOUNT - COALESCE(OLD.TOTAL_PRICE, 0)
+    WHERE DAY = COALESCE(DATE(OLD.CREATED_AT), '')
+      AND TICKET_TYPE_ID = COALESCE(OLD.TICKET_TYPE_ID, 0)
+      AND PAYMENT_METHOD = COALESCE(OLD.PAYMENT_METHOD, '')
+      AND CHANNEL = 'online';
+END;
@@ -0,0 +1,25 @@
+-- ========================================
+-- USER_PRESENCE TABLE
+-- Museum Management System
+-- ========================================
+-- One row per user, kept current by login, logout and (batched) request
+-- activity in backend/presence.py. Online = LAST_SEEN within the last
+-- 30 minutes and not logged out since. The admin user list joins this
+-- table instead of running an EXISTS over USER_SESSION for every user.
+-- Timestamps are UTC ('YYYY-MM-DD HH:MM:SS', like CURRENT_TIMESTAMP).
+
+CREATE TABLE IF NOT EXISTS USER_PRESENCE (
+    USER_ID INTEGER PRIMARY KEY,
+    LAST_SEEN TEXT NOT NULL,
+    LOGOUT_AT TEXT,
+    FOREIGN KEY (USER_ID) REFERENCES USER(USER_ID)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_presence_last_seen ON USER_PRESENCE(LAST_SEEN);
+
+-- Seed from sessions that are still open
+INSERT OR IGNORE INTO USER_PRESENCE (USER_ID, LAST_SEEN)
+SELECT USER_ID, MAX(LAST_ACTIVITY)
+FROM USER_SESSION
+WHERE IS_ACTIVE = 1 AND LAST_ACTIVITY IS NOT NULL
+GROUP BY USER_ID;
@@ -0,0 +1,27 @@
+-- ========================================
+-- VISIT ANALYTICS
+-- Museum Management System
+-- ========================================
+-- backend/visit_analytics.py reads (CHECK_IN_TIME, CHECK_OUT_TIME) for
+-- every visit in a date range. A covering index on the pair serves those
+-- scans without touching the table rows (FEEDBACK / NOTES text); it also
+-- serves every lookup the single-column CHECK_IN_TIME index did, which is
+-- dropped.
+--
+-- api_checkout now fills DURATION_MINUTES; visits checked out before
+-- that (and visits closed by add_partial_indexes.sql) are backfilled here.
+
+-- 1. Covering index for range scans
+CREATE INDEX IF NOT EXISTS idx_visit_history_check_in_out
+    ON VISIT_HISTORY(CHECK_IN_TIME, CHECK_OUT_TIME);
+
+DROP INDEX IF EXISTS idx_visit_history_check_in_time;
+
+-- 2. Backfill DURATION_MINUTES (whole minutes, as api_checkout writes them)
+UPDATE VISIT_HISTORY
+SET DURATION_MINUTES = CAST((julianday(CHECK_OUT_TIME) - julianday(CHECK_IN_TIME)) * 1440 AS INTEGER)
+WHERE DURATION_MINUTES IS NULL
+  AND CHECK_OUT_TIME IS NOT NULL
+  AND julianday(CHECK_OUT_TIME) >= julianday(CHECK_IN_TIME);
+
+PRAGMA optimize;
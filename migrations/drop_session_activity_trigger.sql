@@ -0,0 +1,10 @@
+-- ========================================
+-- RETIRE update_session_activity TRIGGER
+-- Museum Management System
+-- ========================================
+-- The trigger re-ran an UPDATE on USER_SESSION after every update that
+-- left LAST_ACTIVITY unchanged, doubling the writes per request. The
+-- backend now sets LAST_ACTIVITY itself, buffered and flushed in one
+-- batch every SESSION_ACTIVITY_FLUSH_INTERVAL seconds.
+
+DROP TRIGGER IF EXISTS update_session_activity;